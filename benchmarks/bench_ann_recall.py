@@ -0,0 +1,70 @@
+"""
+Measures recall@k and query latency of the IVF approximate nearest-neighbour index against
+exact search over the same VectorStore, for several n_probe settings.
+
+The corpus is synthetic: clustered unit vectors, which resemble real embedding distributions
+more closely than uniform noise.
+
+Usage: python benchmarks/bench_ann_recall.py --rows 200000 --dimension 256
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project", "starter", "phase_1"))
+from workflow_agents.vector_store import VectorStore  # noqa: E402
+
+
+def make_corpus(rows, dimension, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=rows)] + rng.standard_normal((rows, dimension)).astype(np.float32)
+    queries = centers[rng.integers(clusters, size=100)] + rng.standard_normal((100, dimension)).astype(np.float32)
+    return vectors, queries
+
+
+def timed_search(store, queries, top_k, **kwargs):
+    start = time.perf_counter()
+    indices = [store.search(query, top_k, **kwargs)[0] for query in queries]
+    return indices, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def run(rows, dimension, clusters, top_k, n_lists, probes):
+    vectors, queries = make_corpus(rows, dimension, clusters)
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = os.path.join(directory, "store")
+        VectorStore.write(store_path, vectors, [{"text": str(i)} for i in range(rows)])
+        store = VectorStore(store_path)
+
+        exact, exact_ms = timed_search(store, queries, top_k, exact=True)
+        start = time.perf_counter()
+        index = store.build_ann_index(n_lists=n_lists)
+        results = {
+            "rows": rows, "dimension": dimension, "top_k": top_k, "n_lists": index.n_lists,
+            "build_seconds": time.perf_counter() - start,
+            "exact_ms_per_query": exact_ms,
+            "ann": [],
+        }
+        for n_probe in probes:
+            approximate, ann_ms = timed_search(store, queries, top_k, n_probe=n_probe)
+            recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approximate, exact)])
+            results["ann"].append({"n_probe": n_probe, f"recall@{top_k}": float(recall), "ms_per_query": ann_ms})
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.rows, args.dimension, args.clusters, args.top_k, args.n_lists, args.probes), indent=2))
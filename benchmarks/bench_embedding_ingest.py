@@ -0,0 +1,60 @@
+"""
+Measures RAG ingestion throughput against the local fake embeddings server: one request per
+chunk (the original calculate_embeddings behavior) versus the batched, concurrent
+EmbeddingPipeline.
+
+Usage: python benchmarks/bench_embedding_ingest.py --chunks 2000 --latency 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project", "starter", "phase_1"))
+from workflow_agents.clients import ClientProvider  # noqa: E402
+from workflow_agents.embedding_pipeline import EmbeddingPipeline  # noqa: E402
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+
+def make_chunks(count, chunk_size):
+    return [f"chunk {i} " + "lorem ipsum " * (chunk_size // 12) for i in range(count)]
+
+
+def run(chunks, latency, sequential_limit, batch_tokens, concurrency):
+    with FakeLLMServer(latency=latency) as fake_server:
+        provider = ClientProvider(api_key="fake", base_url=fake_server.base_url)
+        results = {"chunks": len(chunks), "latency": latency}
+
+        sample = chunks[:sequential_limit]
+        start = time.perf_counter()
+        for text in sample:
+            provider.embeddings(model="text-embedding-3-large", input=text)
+        elapsed = time.perf_counter() - start
+        results["sequential_chunks_per_second"] = len(sample) / elapsed
+
+        pipeline = EmbeddingPipeline(provider, max_tokens_per_request=batch_tokens, max_concurrency=concurrency)
+        requests_before = fake_server.request_count
+        start = time.perf_counter()
+        pipeline.embed(chunks)
+        elapsed = time.perf_counter() - start
+        results["pipeline_chunks_per_second"] = len(chunks) / elapsed
+        results["pipeline_requests"] = fake_server.request_count - requests_before
+        results["speedup"] = results["pipeline_chunks_per_second"] / results["sequential_chunks_per_second"]
+        provider.close()
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--sequential-limit", type=int, default=100,
+                        help="Chunks embedded one request at a time to measure the baseline")
+    parser.add_argument("--batch-tokens", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    print(json.dumps(run(make_chunks(args.chunks, args.chunk_size), args.latency,
+                         args.sequential_limit, args.batch_tokens, args.concurrency), indent=2))
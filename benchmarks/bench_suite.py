@@ -0,0 +1,376 @@
+"""
+Benchmark suite for the agent library and the lesson workflows, run against the local fake
+model server so results do not depend on network conditions or API quota:
+
+- rag: RAG ingestion throughput and query latency as the corpus grows
+- routing: routing latency as the number of routes grows
+- evaluation: EvaluationAgent iterations-to-accept, one and several candidates per round
+- workflows: end-to-end wall time of the phase 2 workflow (planned, routed and run through the
+  library's WorkflowExecutor), lesson 7 analyze_contract and lesson 9 Orchestrator.process
+
+Agents still left as exercises in base_agents.py are benchmarked through the library functions
+they delegate to; the "implementation" field of each result says which was measured.
+
+Results are printed as one JSON document (and written to --output), so runs can be compared
+over time.
+
+Usage: python benchmarks/bench_suite.py --output results.json --sections rag routing
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project", "starter", "phase_1"))
+from workflow_agents import base_agents  # noqa: E402
+from workflow_agents.clients import ClientProvider  # noqa: E402
+from workflow_agents.embedding_cache import EmbeddingCache  # noqa: E402
+from workflow_agents.evaluation import parse_verdict, run_parallel_evaluation  # noqa: E402
+from workflow_agents.route_index import RouteIndex  # noqa: E402
+from workflow_agents.workflow_executor import WorkflowExecutor, build_step_graph  # noqa: E402
+from fake_llm_server import WORDS, FakeLLMServer, default_reply  # noqa: E402
+
+SECTIONS = ("rag", "routing", "evaluation", "workflows")
+
+LAB_REPORT = """
+Patient Lab Report:
+- Panel: Complete Blood Count (CBC)
+  - White Blood Cell (WBC): 11.5 x10^9/L (Normal: 4.5-11.0)
+  - Platelets: 140 x10^9/L (Normal: 150-450)
+- Panel: Renal Function Panel
+  - Creatinine: 1.4 mg/dL (Normal: 0.6-1.2)
+- Panel: Liver Function Panel
+  - AST: 60 U/L (Normal: 10-40)
+"""
+
+
+def workflow_responder(body, rng, completion_tokens):
+    """
+    Fake replies in the formats the lesson workflows parse: orchestrator plans with <analysis>
+    and <task> tags, worker answers in <response> tags and action plans as one step per line.
+    """
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    filler = default_reply({"messages": []}, rng, completion_tokens)
+    if "<tasks>" in prompt:
+        tasks = "".join(f"<task>\n<type>{kind}</type>\n<description>Analyze the {kind} panel.</description>\n</task>\n"
+                        for kind in ("hematology", "renal", "liver"))
+        return f"<analysis>\n{filler}\n</analysis>\n<tasks>\n{tasks}</tasks>"
+    if "<response>" in prompt:
+        return f"<response>\n{filler}\n</response>"
+    if "action planning agent" in prompt.lower():
+        return "\n".join(f"{i}. Define the {kind} for the product"
+                         for i, kind in enumerate(("user stories", "features", "development tasks"), 1))
+    return default_reply(body, rng, completion_tokens)
+
+
+def summarize(samples):
+    """Mean, median and 95th percentile of latency samples in seconds, in milliseconds."""
+    values = np.asarray(samples) * 1000
+    return {"mean_ms": float(values.mean()), "p50_ms": float(np.percentile(values, 50)),
+            "p95_ms": float(np.percentile(values, 95))}
+
+
+def make_text(words, seed):
+    rng = np.random.default_rng(seed)
+    return " ".join(WORDS[i] for i in rng.integers(0, len(WORDS), size=words))
+
+
+def load_module(name, path):
+    """Imports a lesson script by path, without running its __main__ block."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+    return module
+
+
+def bench_rag(provider, fake_server, chunk_counts, chunk_size, queries):
+    rag_agent_class = base_agents.RAGKnowledgePromptAgent
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            for count in chunk_counts:
+                agent = rag_agent_class("fake", "a knowledge assistant", chunk_size=chunk_size, chunk_overlap=50,
+                                        embedding_cache=EmbeddingCache(), client_provider=provider)
+                corpus = make_text(count * chunk_size // 6, seed=count)
+                requests_before = fake_server.request_count
+                start = time.perf_counter()
+                store = agent.ingest(corpus)
+                ingest_seconds = time.perf_counter() - start
+                ingest_requests = fake_server.request_count - requests_before
+
+                query_latency, search_latency = [], []
+                for i in range(queries):
+                    prompt = make_text(12, seed=10000 + i)
+                    start = time.perf_counter()
+                    agent.search_knowledge(prompt, top_k=5)
+                    query_latency.append(time.perf_counter() - start)
+                    embedding = agent.get_embedding(prompt)
+                    start = time.perf_counter()
+                    store.search([embedding], 5)
+                    search_latency.append(time.perf_counter() - start)
+
+                results.append({
+                    "chunks": len(store),
+                    "ingest_seconds": ingest_seconds,
+                    "ingest_chunks_per_second": len(store) / ingest_seconds,
+                    "ingest_requests": ingest_requests,
+                    "query": summarize(query_latency),
+                    "search_only": summarize(search_latency),
+                })
+        finally:
+            os.chdir(cwd)
+    return {"implementation": "RAGKnowledgePromptAgent", "runs": results}
+
+
+def bench_routing(provider, route_counts, queries):
+    routing_agent_class = getattr(base_agents, "RoutingAgent", None)
+    results = []
+    for count in route_counts:
+        routes = [{"name": f"route-{i}", "description": make_text(20, seed=i), "func": lambda prompt: prompt}
+                  for i in range(count)]
+        start = time.perf_counter()
+        if routing_agent_class is not None:
+            agent = routing_agent_class("fake", [], embedding_cache=EmbeddingCache(), client_provider=provider)
+            agent.agents = routes
+            route = agent.route
+        else:
+            def embed(text):
+                return provider.embeddings(model="text-embedding-3-large", input=text).data[0].embedding
+            index = RouteIndex(embed)
+            index.set_routes(routes)
+
+            def route(prompt):
+                return index.rank(embed(prompt))[0][0]["func"](prompt)
+        build_seconds = time.perf_counter() - start
+
+        latency = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(queries):
+                prompt = make_text(12, seed=20000 + i)
+                start = time.perf_counter()
+                route(prompt)
+                latency.append(time.perf_counter() - start)
+        results.append({"routes": count, "build_seconds": build_seconds, "route": summarize(latency)})
+    return {"implementation": "RoutingAgent" if routing_agent_class else "RouteIndex", "runs": results}
+
+
+class BenchmarkWorker:
+    """Worker agent answering prompts with one chat call."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def arespond(self, prompt):
+        response = await self.provider.achat(model="gpt-3.5-turbo", cache=False, temperature=0,
+                                             messages=[{"role": "user", "content": prompt}])
+        return response.choices[0].message.content
+
+
+def library_evaluation(provider, worker, criteria, max_rounds):
+    """The evaluation loop of EvaluationAgent, built from the library functions it delegates to."""
+    async def chat(prompt):
+        response = await provider.achat(model="gpt-3.5-turbo", cache=False, temperature=0,
+                                        messages=[{"role": "user", "content": prompt}])
+        return response.choices[0].message.content.strip()
+
+    async def judge(response):
+        return parse_verdict(await chat(f"Does the following answer: {response}\nMeet this criteria: {criteria}"
+                                        "Respond Yes or No, and the reason why it does or doesn't meet the criteria."))
+
+    async def instruct(verdict):
+        return await chat(f"Provide instructions to fix an answer based on these reasons why it is incorrect: "
+                          f"{verdict['evaluation']}")
+
+    def refine(initial_prompt, response, instructions):
+        return (f"The original prompt was: {initial_prompt}\nThe response to that prompt was: {response}\n"
+                f"It has been evaluated as incorrect.\nMake only these corrections: {instructions}")
+
+    def evaluate(prompt, candidates):
+        return provider.run(run_parallel_evaluation(prompt, worker.arespond, judge, instruct, refine,
+                                                    candidates=candidates, max_rounds=max_rounds))
+    return evaluate
+
+
+def bench_evaluation(provider, fake_server, pass_rates, trials, max_rounds):
+    evaluation_agent_class = getattr(base_agents, "EvaluationAgent", None)
+    worker = BenchmarkWorker(provider)
+    criteria = "The answer should be a list of user stories."
+    if evaluation_agent_class is not None:
+        agent = evaluation_agent_class("fake", "an evaluation agent", criteria, worker, max_rounds,
+                                       client_provider=provider, use_response_cache=False)
+        evaluate = agent.evaluate_parallel
+    else:
+        evaluate = library_evaluation(provider, worker, criteria, max_rounds)
+
+    results = []
+    for pass_rate in pass_rates:
+        fake_server.pass_rate = pass_rate
+        for candidates in (1, 3):
+            runs = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                for trial in range(trials):
+                    runs.append(evaluate(f"Write user stories for product {trial}.", candidates))
+            results.append({
+                "pass_rate": pass_rate,
+                "candidates": candidates,
+                "trials": trials,
+                "mean_iterations": float(np.mean([r["iterations"] for r in runs])),
+                "accept_rate": float(np.mean([r["accepted"] for r in runs])),
+                "mean_calls": float(np.mean([r["calls"]["total"] for r in runs])),
+                "mean_wall_seconds": float(np.mean([r["wall_seconds"] for r in runs])),
+            })
+    return {"implementation": "EvaluationAgent" if evaluation_agent_class else "run_parallel_evaluation",
+            "runs": results}
+
+
+def timed_runs(fake_server, repeat, run):
+    """Runs a workflow several times and reports its wall time and model requests per run."""
+    seconds = []
+    requests_before = fake_server.request_count
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        seconds.append(time.perf_counter() - start)
+    return {"repeat": repeat, "wall": summarize(seconds),
+            "requests_per_run": (fake_server.request_count - requests_before) / repeat}
+
+
+PHASE_2_ROLES = {
+    "Product Manager": ("You are a Product Manager, you are responsible for defining the user stories for a product.",
+                        "user stories"),
+    "Program Manager": ("You are a Program Manager, you are responsible for defining the features for a product.",
+                        "features"),
+    "Development Engineer": ("You are a Development Engineer, you are responsible for defining the development "
+                             "tasks for a product.", "development tasks"),
+}
+
+
+def phase_2_workflow(provider):
+    """
+    The phase 2 agentic workflow, built from the library functions the finished
+    agentic_workflow.py uses: an action planning call, one agent call per step and a
+    WorkflowExecutor running the steps in dependency order.
+    """
+    def chat(system, prompt):
+        response = provider.chat(model="gpt-3.5-turbo", cache=False, temperature=0,
+                                 messages=[{"role": "system", "content": system},
+                                           {"role": "user", "content": prompt}])
+        return response.choices[0].message.content.strip()
+
+    def role_of(step):
+        # The routing agent's choice, made deterministic so every run has the same graph
+        return next((role for role, (_, topic) in PHASE_2_ROLES.items() if topic in step.lower()),
+                    "Product Manager")
+
+    def run_step(prompt):
+        persona = PHASE_2_ROLES[role_of(prompt.splitlines()[0])][0]
+        return chat(persona, prompt)
+
+    def run():
+        plan = chat("You are an action planning agent. Extract the steps the user asks for, one per line.",
+                    "What would the development tasks for this product be? Product: an email router.")
+        steps = [line for line in plan.splitlines() if line.strip()]
+        graph = build_step_graph(steps, role_of=role_of,
+                                 role_dependencies={"Program Manager": ["Product Manager"],
+                                                    "Development Engineer": ["Product Manager"]})
+        return WorkflowExecutor(run_step, max_workers=4).run(graph)
+    return run
+
+
+def bench_workflows(provider, fake_server, repeat):
+    results = {}
+
+    results["agentic_workflow"] = timed_runs(fake_server, repeat, phase_2_workflow(provider))
+    if results["agentic_workflow"]["requests_per_run"] == 0:
+        raise RuntimeError("The phase 2 workflow made no model requests, so there is nothing to measure.")
+
+    lesson_7 = load_module("lesson_7_solution", os.path.join(
+        ROOT, "lesson-7-Agentic_Workflow_Patterns_Parallelization", "exercises", "solution", "solution.py"))
+    results["analyze_contract"] = timed_runs(fake_server, repeat,
+                                             lambda: lesson_7.analyze_contract(lesson_7.contract_text))
+
+    lesson_9 = load_module("lesson_9_solution", os.path.join(
+        ROOT, "lesson-9-Agentic_Workflow_Orchestrator-Workers", "exercises", "solution", "solution.py"))
+    orchestrator = lesson_9.Orchestrator(lesson_9.orchestrator_prompt)
+    task = f"Please interpret the following lab results and provide a summary: {LAB_REPORT}"
+    results["orchestrator_process"] = timed_runs(fake_server, repeat, lambda: orchestrator.process(task))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    # Every request must reach the fake server, so the response cache stays off
+    os.environ["WORKFLOW_AGENTS_RESPONSE_CACHE"] = "0"
+    report = {
+        "suite": "workflow_agents",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": {},
+    }
+    with FakeLLMServer(latency=args.latency, latency_per_token=args.latency_per_token,
+                       completion_tokens=(20, 120), responder=workflow_responder, seed=args.seed) as fake_server:
+        os.environ["OPENAI_BASE_URL"] = fake_server.base_url
+        os.environ["OPENAI_API_KEY"] = "fake"
+        provider = ClientProvider(api_key="fake", base_url=fake_server.base_url)
+        try:
+            if "rag" in args.sections:
+                report["results"]["rag"] = bench_rag(provider, fake_server, args.rag_chunks,
+                                                     args.chunk_size, args.queries)
+            if "routing" in args.sections:
+                report["results"]["routing"] = bench_routing(provider, args.routes, args.queries)
+            if "evaluation" in args.sections:
+                report["results"]["evaluation"] = bench_evaluation(provider, fake_server, args.pass_rates,
+                                                                   args.trials, args.max_rounds)
+            if "workflows" in args.sections:
+                report["results"]["workflows"] = bench_workflows(provider, fake_server, args.repeat)
+        finally:
+            provider.close()
+        report["server"] = fake_server.stats()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--latency", default="0.05", help="Fake server latency spec, e.g. lognormal:0.3:0.4")
+    parser.add_argument("--latency-per-token", type=float, default=0.0005)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rag-chunks", type=int, nargs="+", default=[250, 1000, 4000])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--routes", type=int, nargs="+", default=[4, 16, 64, 256])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--pass-rates", type=float, nargs="+", default=[0.3, 0.6, 0.9])
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+    print(report)
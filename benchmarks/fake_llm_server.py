@@ -0,0 +1,343 @@
+"""
+A local, deterministic stand-in for the OpenAI chat completions and embeddings endpoints, used to
+benchmark and load-test the agents and workflows without network access or API quota.
+
+Point any OpenAI client at FakeLLMServer.base_url with any API key. The agents and lesson
+scripts read the OPENAI_BASE_URL environment variable, so running
+
+    python benchmarks/fake_llm_server.py --port 8765 --latency lognormal:0.4:0.5
+    export OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+
+points all of them at the fake.
+
+Latency specs: a number of seconds, or "fixed:S", "uniform:LOW:HIGH", "normal:MEAN:STD" or
+"lognormal:MEDIAN:SIGMA". Replies, token counts, latencies and injected failures depend only on
+the request body, the number of identical requests seen before and the seed, so runs are
+repeatable.
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+WORDS = ("agent", "workflow", "product", "feature", "story", "task", "route", "plan", "value",
+         "user", "system", "data", "model", "result", "review", "step", "design", "test")
+
+
+def fake_embedding(text, dimension):
+    """Returns a deterministic unit-length vector derived from the text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def estimate_tokens(text):
+    """Rough token count of a text, about four characters per token."""
+    return len(text) // 4 + 1
+
+
+def parse_latency(spec):
+    """
+    Turns a latency spec into a sampling function.
+
+    Parameters:
+    spec (float, str or tuple): Seconds, or a distribution such as "uniform:0.1:0.3" or
+        ("lognormal", 0.4, 0.5).
+
+    Returns:
+    callable: Takes a numpy random generator and returns a latency in seconds.
+    """
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    if isinstance(spec, str):
+        parts = spec.split(":")
+        spec = (parts[0],) + tuple(float(p) for p in parts[1:]) if len(parts) > 1 else float(parts[0])
+        if isinstance(spec, float):
+            return parse_latency(spec)
+    kind, *args = spec
+    if kind == "fixed":
+        return lambda rng: args[0]
+    if kind == "uniform":
+        return lambda rng: float(rng.uniform(args[0], args[1]))
+    if kind == "normal":
+        return lambda rng: max(0.0, float(rng.normal(args[0], args[1])))
+    if kind == "lognormal":
+        return lambda rng: float(args[0] * np.exp(rng.normal(0.0, args[1])))
+    raise ValueError(f"Unknown latency distribution '{kind}'.")
+
+
+def default_reply(body, rng, completion_tokens):
+    """
+    Builds a plausible reply for the agents' prompts: a JSON verdict when JSON output is
+    requested, a Yes/No verdict for evaluation prompts, and otherwise filler text of the
+    requested length. Evaluations pass with probability body["_pass_rate"].
+    """
+    messages = body.get("messages", [])
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    passed = rng.random() < body.get("_pass_rate", 0.5)
+    if body.get("response_format", {}).get("type") in ("json_schema", "json_object"):
+        return json.dumps({
+            "passed": passed,
+            "criteria": [{"criterion": "criteria", "passed": passed, "reason": "Fake verdict."}],
+            "instructions": "" if passed else "Follow the criteria more closely.",
+        })
+    if re.search(r"Respond Yes or No", prompt, re.IGNORECASE):
+        return "Yes, the answer meets the criteria." if passed else "No, the answer does not meet the criteria."
+    return " ".join(WORDS[i] for i in rng.integers(0, len(WORDS), size=max(1, completion_tokens)))
+
+
+class FakeLLMServer:
+    """
+    Serves POST /v1/chat/completions and POST /v1/embeddings on a background thread, with
+    HTTP/1.1 keep-alive so clients can reuse pooled connections.
+
+    Chat replies come from a responder function; the default one understands the evaluation
+    prompts of the agents. Latency is sampled per request, and chat requests additionally take
+    latency_per_token seconds per completion token. Chat requests with stream=true are answered
+    with server-sent events, one chunk per word, after the sampled latency (the time to first
+    token). A fraction of requests can be made to fail.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, dimension=256, latency_per_token=0.0,
+                 completion_tokens=(20, 200), failure_rate=0.0, failure_status=500, fail_first=0,
+                 retry_after=None, pass_rate=0.5, responder=None, seed=0):
+        """
+        Parameters:
+        host (str): Interface to bind. Defaults to 127.0.0.1.
+        port (int): Port to bind; 0 picks a free port.
+        latency (float, str or tuple): Latency spec of each request, see parse_latency. Defaults to 0.05.
+        dimension (int): Size of the returned embedding vectors. Defaults to 256.
+        latency_per_token (float): Extra seconds per completion token of a chat reply. Defaults to 0.
+        completion_tokens (int or tuple): Completion length, or a (low, high) range to sample from.
+            A request's max_tokens caps it.
+        failure_rate (float): Probability that a request fails. Defaults to 0.
+        failure_status (int): HTTP status of injected failures, e.g. 500 or 429. Defaults to 500.
+        fail_first (int): Number of initial requests that fail regardless of failure_rate.
+        retry_after (float): Seconds sent in the retry-after header of failures, if set.
+        pass_rate (float): Probability that the default responder accepts an evaluated answer.
+        responder (callable): Builds the reply text from the request body, a random generator
+            and the completion token count. Defaults to default_reply.
+        seed (int): Seed mixed into every request's random generator.
+        """
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.dimension = dimension
+        self.latency_per_token = latency_per_token
+        self.completion_tokens = completion_tokens
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.pass_rate = pass_rate
+        self.responder = responder or default_reply
+        self.seed = seed
+        self.request_count = 0
+        self.failure_count = 0
+        self.path_counts = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler(), bind_and_activate=False)
+        self._server.request_queue_size = 256
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def stats(self):
+        """
+        Reports the requests served so far.
+
+        Returns:
+        dict: Total requests, injected failures and requests per path.
+        """
+        with self._lock:
+            return {"requests": self.request_count, "failures": self.failure_count,
+                    "paths": dict(self.path_counts)}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                body = json.loads(raw or b"{}")
+                path = self.path.rstrip('/')
+                if path not in ("/v1/embeddings", "/v1/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                rng, request_number = server._request_rng(raw)
+                with server._lock:
+                    server.request_count += 1
+                    server.path_counts[path] = server.path_counts.get(path, 0) + 1
+                delay = server.sample_latency(rng)
+                failed = request_number <= server.fail_first or rng.random() < server.failure_rate
+
+                if failed:
+                    with server._lock:
+                        server.failure_count += 1
+                    time.sleep(delay)
+                    headers = {} if server.retry_after is None else {"retry-after": str(server.retry_after)}
+                    self._send(server.failure_status, {"error": {"message": "Injected failure",
+                                                                 "type": "server_error"}}, headers)
+                    return
+
+                if path == "/v1/embeddings":
+                    payload = server.embeddings_response(body)
+                else:
+                    payload = server.chat_response(body, rng)
+                    if body.get("stream"):
+                        time.sleep(delay)
+                        self._stream(payload, body)
+                        return
+                    delay += server.latency_per_token * payload["usage"]["completion_tokens"]
+                time.sleep(delay)
+                self._send(200, payload)
+
+            def _stream(self, payload, body):
+                # Server-sent events, one chunk per word, paced at latency_per_token per token
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                content = payload["choices"][0]["message"]["content"]
+                pieces = re.findall(r"\S+\s*|\s+", content) or [""]
+                base = {"id": payload["id"], "object": "chat.completion.chunk", "created": 0,
+                        "model": payload["model"]}
+                for i, piece in enumerate(pieces):
+                    delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+                    self._event(dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+                    time.sleep(server.latency_per_token * estimate_tokens(piece))
+                self._event(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self._event(dict(base, choices=[], usage=payload["usage"]))
+                self._event("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _event(self, data):
+                text = data if isinstance(data, str) else json.dumps(data)
+                event = f"data: {text}\n\n".encode('utf-8')
+                self.wfile.write(f"{len(event):x}\r\n".encode('ascii') + event + b"\r\n")
+                self.wfile.flush()
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _request_rng(self, raw):
+        """Random generator of a request, seeded by its body and how often that body was seen."""
+        digest = hashlib.sha256(raw).digest()
+        with self._lock:
+            self._seen[digest] = self._seen.get(digest, 0) + 1
+            occurrence = self._seen[digest]
+            request_number = self.request_count + 1
+        seed = [self.seed, occurrence, int.from_bytes(digest[:8], 'little')]
+        return np.random.default_rng(seed), request_number
+
+    def chat_response(self, body, rng):
+        """Builds a chat completions API response for a request body."""
+        if isinstance(self.completion_tokens, int):
+            completion_tokens = self.completion_tokens
+        else:
+            completion_tokens = int(rng.integers(self.completion_tokens[0], self.completion_tokens[1] + 1))
+        if body.get("max_tokens"):
+            completion_tokens = min(completion_tokens, body["max_tokens"])
+        content = self.responder(dict(body, _pass_rate=self.pass_rate), rng, completion_tokens)
+        completion_tokens = estimate_tokens(content)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in body.get("messages", []))
+        return {
+            "id": f"chatcmpl-fake-{rng.integers(1 << 62):x}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body.get("model", "fake-chat"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def embeddings_response(self, body):
+        """Builds an embeddings API response for a request body."""
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(text, self.dimension)}
+            for i, text in enumerate(texts)
+        ]
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI server in the foreground.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="0.05", help="Latency spec, e.g. 0.2 or lognormal:0.4:0.5")
+    parser.add_argument("--latency-per-token", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", default="20:200", help="N or LOW:HIGH")
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, default=500)
+    parser.add_argument("--pass-rate", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tokens = tuple(int(t) for t in args.completion_tokens.split(":"))
+    with FakeLLMServer(args.host, args.port, latency=args.latency, dimension=args.dimension,
+                       latency_per_token=args.latency_per_token,
+                       completion_tokens=tokens[0] if len(tokens) == 1 else tokens,
+                       failure_rate=args.failure_rate, failure_status=args.failure_status,
+                       pass_rate=args.pass_rate, seed=args.seed) as fake_server:
+        print(f"Fake LLM server listening on {fake_server.base_url}")
+        print(f"export OPENAI_BASE_URL={fake_server.base_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
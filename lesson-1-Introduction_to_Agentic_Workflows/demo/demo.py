@@ -16,7 +16,7 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 
 # Initialize the OpenAI client if key is available
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=openai_api_key)
 
 def traditional_generate_response(query):
@@ -19,7 +19,7 @@ print(openai_api_key)
 
 # Initialize the OpenAI client if key is available
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=openai_api_key)
 
 def get_hardcoded_answer(question):
@@ -8,7 +8,7 @@ from openai import OpenAI
 # Load API key from .env file
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
 class Task:
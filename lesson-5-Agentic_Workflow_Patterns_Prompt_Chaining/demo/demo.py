@@ -1,16 +1,25 @@
 import os
+import sys
+from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
 
+# The response cache is shared with the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[2] / "project" / "starter" / "phase_1"))
+from workflow_agents.response_cache import cached_chat_completion
+from workflow_agents.prompt_chain import PromptChain
+from workflow_agents.step_cache import get_default_step_cache
+
 # Load environment variables and initialize OpenAI client
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
 def call_openai(system_prompt, user_prompt, temp, model="gpt-3.5-turbo"):
-    """Simple wrapper for OpenAI API calls"""
-    response = client.chat.completions.create(
+    """Simple wrapper for OpenAI API calls, answered from the response cache when it is enabled and temp is 0"""
+    response = cached_chat_completion(
+        client,
         model=model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -32,7 +41,13 @@ def researcher_agent(topic):
     user_prompt = f"Research this topic thoroughly: {topic}"
     
     print(f"Researcher agent working on: {topic}")
-    return call_openai(system_prompt, user_prompt, temp = 0.7)
+    research = call_openai(system_prompt, user_prompt, temp = 0.7)
+    print("\nResearch complete!")
+    return research
+
+def print_delta(delta):
+    """Prints streamed text as it arrives"""
+    print(delta, end="", flush=True)
 
 def writer_agent(topic, research_results):
     """Writer agent that creates content based on research"""
@@ -48,26 +63,41 @@ def writer_agent(topic, research_results):
     print(f"Writer agent creating content for: {topic}")
     return call_openai(system_prompt, user_prompt, temp = 0.3)
 
+# The chain's steps and the inputs each one needs: the writer needs the topic and the research.
+# With WORKFLOW_AGENTS_STEP_CACHE=1, a re-run reuses the research unless the topic or the
+# researcher's prompt changed, so iterating on the writer's prompt costs one call per run.
+simple_chain = PromptChain(input_name="topic", step_cache=get_default_step_cache())
+simple_chain.add_step("research", researcher_agent, ["topic"])
+simple_chain.add_step("content", writer_agent, ["topic", "research"])
+
 def run_simple_chain(topic):
     """Run a minimal agent chain: Researcher → Writer"""
     print(f"\nStarting simple agent chain for: '{topic}'")
     
-    # Step 1: Get research from researcher agent
-    research = researcher_agent(topic)
-    print("\nResearch complete!")
+    # The article is shown from its first token
+    content_started = []
+    
+    def show_content(step, delta):
+        if step != "content":
+            return
+        if not content_started:
+            content_started.append(True)
+            print("\n===== FINAL CONTENT =====")
+        print_delta(delta)
     
-    # Step 2: Pass research to writer agent
-    content = writer_agent(topic, research)
-    print("\nContent creation complete!")
+    outputs = simple_chain.run(topic, on_delta=show_content)
+    print("\n\nContent creation complete!")
     
     # Print results
     print("\n===== RESEARCH OUTPUT =====")
-    print(research)
+    print(outputs["research"])
     
-    print("\n===== FINAL CONTENT =====")
-    print(content)
-    
-    return {"research": research, "content": content}
+    return {"research": outputs["research"], "content": outputs["content"]}
+
+def run_simple_chains(topics, max_concurrency=4):
+    """Run the chain for many topics as a pipeline: one topic's writer overlaps the next topic's research"""
+    records = simple_chain.run_many(topics, max_concurrency=max_concurrency)
+    return {record["input"]: record.get("outputs", record.get("error")) for record in records}
 
 # Run the example
 if __name__ == "__main__":
@@ -1,16 +1,25 @@
 import os
+import sys
+from pathlib import Path
 from openai import OpenAI # type: ignore
 from dotenv import load_dotenv # type: ignore
 
+# The response cache is shared with the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[3] / "project" / "starter" / "phase_1"))
+from workflow_agents.response_cache import cached_chat_completion
+from workflow_agents.prompt_chain import PromptChain, heading_section
+from workflow_agents.step_cache import get_default_step_cache
+
 # Load environment variables and initialize OpenAI client
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
 def call_openai(system_prompt, user_prompt, model="gpt-3.5-turbo"):
-    """Simple wrapper for OpenAI API calls"""
-    response = client.chat.completions.create(
+    """Simple wrapper for OpenAI API calls, answered from the response cache when it is enabled"""
+    response = cached_chat_completion(
+        client,
         model=model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -31,7 +40,9 @@ Always include these sections:
 """
     user_prompt = f"Analyze the feedstock: {feedstock_name}"
     print(f"Feedstock Analyst working on: {feedstock_name}")
-    return call_openai(system_prompt, user_prompt)
+    feedstock_report = call_openai(system_prompt, user_prompt)
+    print("\nFeedstock analysis complete.")
+    return feedstock_report
 
 def distillation_planner_agent(feedstock_report):
     """Plans the distillation based on feedstock analysis"""
@@ -44,7 +55,9 @@ Include:
 """
     user_prompt = f"Based on this feedstock report, plan the distillation:\n\n{feedstock_report}"
     print("Distillation Planner generating product allocation...")
-    return call_openai(system_prompt, user_prompt)
+    distillation_plan = call_openai(system_prompt, user_prompt)
+    print("\nDistillation planning complete.")
+    return distillation_plan
 
 def market_analyst_agent(product_list_text):
     """Analyzes market demand for refinery products"""
@@ -57,7 +70,13 @@ Format the response as:
 """
     user_prompt = f"Analyze market conditions for the following products:\n{product_list_text}"
     print("Market Analyst evaluating market demand...")
-    return call_openai(system_prompt, user_prompt)
+    market_analysis = call_openai(system_prompt, user_prompt)
+    print("\nMarket analysis complete.")
+    return market_analysis
+
+def print_delta(delta):
+    """Prints streamed text as it arrives"""
+    print(delta, end="", flush=True)
 
 def production_optimizer_agent(distillation_output, market_analysis):
     """Recommends production strategy based on operations and market"""
@@ -79,52 +98,75 @@ Market Analysis:
     print("Production Optimizer creating final plan...")
     return call_openai(system_prompt, user_prompt)
 
+def product_list_agent(product_allocation):
+    """Extracts the list of products from the distillation plan's product allocation"""
+    system_prompt = "List every product named in the product allocation above, one per line."
+    return call_openai(system_prompt, product_allocation)
+
+# Each step is declared with the inputs it really needs, so the chain runs as a graph:
+# the product allocation names every product the tower yields, so the product list needs only
+# the PRODUCT ALLOCATION section of the distillation plan. It (and the market analysis after it)
+# starts as soon as that section has streamed in, while the planner is still writing its
+# assumptions and notes. The optimizer starts once both the full plan and the analysis are done.
+# With WORKFLOW_AGENTS_STEP_CACHE=1, step outputs are saved as checkpoints: a re-run reuses every
+# step whose prompt and inputs did not change, e.g. after the optimizer failed or was edited.
+refinery_chain = PromptChain(input_name="feedstock_name", step_cache=get_default_step_cache())
+refinery_chain.add_step("feedstock", feedstock_analyst_agent, ["feedstock_name"])
+refinery_chain.add_step("distillation", distillation_planner_agent, ["feedstock"])
+refinery_chain.add_step("product_list", product_list_agent,
+                        [("distillation", heading_section("PRODUCT ALLOCATION"))])
+refinery_chain.add_step("market", market_analyst_agent, ["product_list"])
+refinery_chain.add_step("plan", production_optimizer_agent, ["distillation", "market"])
+
 def run_refinery_chain(feedstock_name):
     """Run the refinery agentic workflow"""
     print(f"\nStarting refinery optimization workflow for: '{feedstock_name}'")
 
-    # Step 1: Feedstock Analysis
-    feedstock_report = feedstock_analyst_agent(feedstock_name)
-    print("\nFeedstock analysis complete.")
-
-    # Step 2: Distillation Planning
-    distillation_plan = distillation_planner_agent(feedstock_report)
-    print("\nDistillation planning complete.")
-
-    # Step 3: Market Analysis
-    # We need to extract the list of products from the distillation plan
-    system_prompt = "List all products from the distillation plan above."
-    product_list = call_openai(system_prompt, distillation_plan)
+    # The final plan is shown from its first token
+    plan_started = []
 
-    # This list of products is then used to perform market analysis
-    market_analysis = market_analyst_agent(product_list)
-    print("\nMarket analysis complete.")
+    def show_plan(step, delta):
+        if step != "plan":
+            return
+        if not plan_started:
+            plan_started.append(True)
+            print("\n===== FINAL PRODUCTION PLAN =====")
+        print_delta(delta)
 
-    # Step 4: Production Optimization
-    production_plan = production_optimizer_agent(distillation_plan, market_analysis)
-    print("\nProduction optimization complete.")
+    outputs = refinery_chain.run(feedstock_name, on_delta=show_plan)
+    print("\n\nProduction optimization complete.")
 
     # Print results
     print("\n===== FEEDSTOCK REPORT =====")
-    print(feedstock_report)
+    print(outputs["feedstock"])
 
     print("\n===== DISTILLATION PLAN =====")
-    print(distillation_plan)
+    print(outputs["distillation"])
 
     print("\n===== MARKET ANALYSIS =====")
-    print(market_analysis)
-
-    print("\n===== FINAL PRODUCTION PLAN =====")
-    print(production_plan)
+    print(outputs["market"])
 
     return {
-        "feedstock": feedstock_report,
-        "distillation": distillation_plan,
-        "market": market_analysis,
-        "plan": production_plan
+        "feedstock": outputs["feedstock"],
+        "distillation": outputs["distillation"],
+        "market": outputs["market"],
+        "plan": outputs["plan"]
     }
 
+def run_refinery_chains(feedstock_names, max_concurrency=4):
+    """Run the refinery workflow for many feedstocks as a pipeline, several feedstocks at a time"""
+    def report(record):
+        status = "failed: " + record["error"] if "error" in record else "complete"
+        print(f"\n[{record['input']}] {status} ({record['seconds']:.1f}s)")
+
+    records = refinery_chain.run_many(feedstock_names, max_concurrency=max_concurrency, on_result=report)
+    return {record["input"]: record.get("outputs", record.get("error")) for record in records}
+
 # Run the example
 if __name__ == "__main__":
-    feedstock_input = "Light Sweet Crude"
-    results = run_refinery_chain(feedstock_input)
\ No newline at end of file
+    # Several feedstocks given on the command line flow through the chain together
+    if len(sys.argv) > 1:
+        results = run_refinery_chains(sys.argv[1:])
+    else:
+        feedstock_input = "Light Sweet Crude"
+        results = run_refinery_chain(feedstock_input)
\ No newline at end of file
@@ -1,16 +1,23 @@
 import os
+import sys
+from pathlib import Path
 from openai import OpenAI  # type: ignore
 from dotenv import load_dotenv  # type: ignore
 
+# The response cache is shared with the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[3] / "project" / "starter" / "phase_1"))
+from workflow_agents.response_cache import cached_chat_completion
+
 # Load environment variables and initialize OpenAI client
 load_dotenv()
 client = OpenAI(
-    base_url="https://openai.vocareum.com/v1",
+    base_url=os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
 def call_openai(system_prompt, user_prompt, model="gpt-3.5-turbo"):
-    """Simple wrapper for OpenAI API calls"""
-    response = client.chat.completions.create(
+    """Simple wrapper for OpenAI API calls, answered from the response cache when it is enabled"""
+    response = cached_chat_completion(
+        client,
         model=model,
         messages=[
             {"role": "system", "content": system_prompt},
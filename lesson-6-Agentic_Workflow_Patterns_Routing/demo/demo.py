@@ -1,20 +1,29 @@
 import os
+import sys
+from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
 
+# The response and embedding caches and the pre-router are shared with the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[2] / "project" / "starter" / "phase_1"))
+from workflow_agents.embedding_cache import cached_embeddings
+from workflow_agents.pre_router import EmbeddingPreRouter
+from workflow_agents.response_cache import cached_chat_completion
+
 # Load environment variables and initialize OpenAI client
 # Make sure you have a .env file with your OPENAI_API_KEY
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY")
 )
 
 # --- Helper Function for API Calls ---
 def call_openai(system_prompt, user_prompt, model="gpt-4o"):
-    """Simple wrapper for OpenAI API calls."""
+    """Simple wrapper for OpenAI API calls, answered from the response cache when it is enabled."""
     try:
-        response = client.chat.completions.create(
+        response = cached_chat_completion(
+            client,
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -27,6 +36,17 @@ def call_openai(system_prompt, user_prompt, model="gpt-4o"):
         return f"An error occurred: {e}"
 
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+# The LLM router is only asked when the best agent's description leads the runner-up by less than this
+ROUTING_MARGIN = 0.05
+# Share of the embedding decisions also checked against the LLM router, for the confusion report
+ROUTING_AUDIT_RATE = float(os.getenv("ROUTING_AUDIT_RATE", "0"))
+
+def embed(text):
+    """Embeds a text, answered from the embedding cache when it was embedded before."""
+    return cached_embeddings(client, EMBEDDING_MODEL, [text])[0]
+
+
 # --- Agent Class Implementations ---
 
 class CodeGenerationAgent:
@@ -87,9 +107,9 @@ class MathematicalProblemSolvingAgent:
 
 
 # --- Routing Agent with Dynamic Prompt Generation ---
-def routing_agent(task_prompt, agents):
+def choose_agent_with_llm(task_prompt, agents):
     """
-    Routing agent that uses an LLM to determine which agent to use based on the task prompt.
+    Uses an LLM to determine which agent to use based on the task prompt.
     
     Args:
         task_prompt (str): The user's request.
@@ -110,16 +130,41 @@ def routing_agent(task_prompt, agents):
     
     user_prompt = f"Given the task: '{task_prompt}', which agent should handle this task?"
     
-    # Use an LLM to choose the agent
-    agent_choice_name = call_openai(system_prompt, user_prompt).strip()
+    return call_openai(system_prompt, user_prompt).strip()
+
+
+# Pre-routers by set of agents, so each agent description is embedded only once
+routers = {}
+
+def get_router(agents):
+    """Returns the pre-router for a list of agents, scoring prompts against their descriptions."""
+    key = tuple((agent.name, agent.get_description()) for agent in agents)
+    if key not in routers:
+        router = EmbeddingPreRouter(
+            embed,
+            lambda task_prompt, routes: choose_agent_with_llm(task_prompt, [route["agent"] for route in routes]),
+            margin=ROUTING_MARGIN,
+            audit_rate=ROUTING_AUDIT_RATE
+        )
+        router.set_routes([{"name": agent.name, "description": agent.get_description(), "agent": agent}
+                           for agent in agents])
+        routers[key] = router
+    return routers[key]
+
+
+def routing_agent(task_prompt, agents):
+    """
+    Routing agent that picks the agent whose description best matches the task prompt, and asks
+    an LLM only when two agents match almost equally well.
     
-    # Find the chosen agent object and run it
-    for agent in agents:
-        if agent.name == agent_choice_name:
-            print(f"--- Routing task to {agent.name}... ---")
-            return agent.run(task_prompt)
-            
-    return f"Error: Could not find an agent named '{agent_choice_name}'. Please check the routing prompt."
+    Args:
+        task_prompt (str): The user's request.
+        agents (list): A list of agent objects to choose from.
+    """
+    decision = get_router(agents).route(task_prompt)
+    agent = decision["route"]["agent"]
+    print(f"--- Routing task to {agent.name} (chosen by {decision['path']}, lead {decision['lead']:.3f})... ---")
+    return agent.run(task_prompt)
 
 
 # --- Example Usage ---
@@ -149,4 +194,8 @@ if __name__ == "__main__":
     task3_prompt = "Calculate the derivative of f(x) = 5x^4 + 3x^2 - 2x + 7."
     print(f"User Task: \"{task3_prompt}\"")
     result3 = routing_agent(task3_prompt, all_agents)
-    print("\nAgent Output:\n", result3)
\ No newline at end of file
+    print("\nAgent Output:\n", result3)
+    print("\n" + "="*50 + "\n")
+
+    # --- Routing report: how often the embedding fast path agreed with the LLM router ---
+    print("Routing report:", get_router(all_agents).report())
\ No newline at end of file
@@ -1,17 +1,26 @@
 import os
+import sys
+from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
 
+# The response and embedding caches and the pre-router are shared with the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[3] / "project" / "starter" / "phase_1"))
+from workflow_agents.embedding_cache import cached_embeddings
+from workflow_agents.pre_router import EmbeddingPreRouter
+from workflow_agents.response_cache import cached_chat_completion
+
 # Load environment variables and initialize OpenAI client
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
 # --- Helper Function for API Calls ---
 def call_openai(system_prompt, user_prompt, model="gpt-3.5-turbo"):
-    """Simple wrapper for OpenAI API calls."""
-    response = client.chat.completions.create(
+    """Simple wrapper for OpenAI API calls, answered from the response cache when it is enabled."""
+    response = cached_chat_completion(
+        client,
         model=model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -22,6 +31,17 @@ def call_openai(system_prompt, user_prompt, model="gpt-3.5-turbo"):
     return response.choices[0].message.content
 
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+# The LLM router is only asked when the best agent's description leads the runner-up by less than this
+ROUTING_MARGIN = 0.05
+# Share of the embedding decisions also checked against the LLM router, for the confusion report
+ROUTING_AUDIT_RATE = float(os.getenv("ROUTING_AUDIT_RATE", "0"))
+
+def embed(text):
+    """Embeds a text, answered from the embedding cache when it was embedded before."""
+    return cached_embeddings(client, EMBEDDING_MODEL, [text])[0]
+
+
 # --- Agents for Different Retail Tasks ---
 
 def product_researcher_agent(query):
@@ -56,35 +76,59 @@ def pricing_strategist_agent(query, product_data=None, customer_data=None):
     return call_openai(system_prompt, user_prompt)
 
 
-# --- Routing Agent with LLM-Based Task Determination ---
-def routing_agent(query, context=None):
-    """Routing agent that determines which agent to use based on the query."""
-    
-    # Use LLM to analyze the query and determine the correct task type
-    system_prompt = """You are an AI assistant that can route retail queries to the right agents. 
+# --- Routing Agent with Embedding Pre-Routing and LLM-Based Task Determination ---
+AGENT_DESCRIPTIONS = {
+    "Product Researcher Agent": "Researches product specifications, market trends, and competitor pricing.",
+    "Customer Analyzer Agent": "Analyzes customer feedback, preferences, and purchasing patterns.",
+    "Pricing Strategist Agent": "Recommends optimal pricing strategies based on research and analysis.",
+}
+
+def choose_agent_with_llm(query):
+    """Uses an LLM to analyze the query and name the agent that should handle it."""
+    agent_list = "\n".join(f"    - {name}: {description}" for name, description in AGENT_DESCRIPTIONS.items())
+    system_prompt = f"""You are an AI assistant that can route retail queries to the right agents. 
     You will be given a query, and your job is to determine the appropriate agent to handle it.
     Agents available:
-    - Product Researcher Agent: Researches product specifications, market trends, and competitor pricing.
-    - Customer Analyzer Agent: Analyzes customer feedback, preferences, and purchasing patterns.
-    - Pricing Strategist Agent: Recommends optimal pricing strategies based on research and analysis.
+{agent_list}
     
     Respond only with the agent's name, nothing else."""
     
     user_prompt = f"Given the query: '{query}', which agent should handle this task?"
     
-    agent_choice = call_openai(system_prompt, user_prompt)
-    print(f"Selected agent: {agent_choice}")
+    return call_openai(system_prompt, user_prompt)
+
+
+router = None
+
+def get_router():
+    """Returns the pre-router, embedding the agent descriptions on first use."""
+    global router
+    if router is None:
+        router = EmbeddingPreRouter(embed, lambda query, routes: choose_agent_with_llm(query),
+                                    margin=ROUTING_MARGIN, audit_rate=ROUTING_AUDIT_RATE)
+        router.set_routes([{"name": name, "description": f"{name}: {description}"}
+                           for name, description in AGENT_DESCRIPTIONS.items()])
+    return router
+
+
+def routing_agent(query, context=None):
+    """Routing agent that determines which agent to use based on the query."""
     
-    # Route the query to the correct agent based on the choice
-    if "Product Researcher" in agent_choice:
+    # Score the query against the agent descriptions; the LLM is asked only for close calls
+    decision = get_router().route(query)
+    agent_choice = decision["route"]["name"]
+    print(f"Selected agent: {agent_choice} (chosen by {decision['path']}, lead {decision['lead']:.3f})")
+    
+    # Route the query to the chosen agent
+    if agent_choice == "Product Researcher Agent":
         print("Routing query to Product Researcher Agent...")
         return product_researcher_agent(query)
     
-    elif "Customer Analyzer" in agent_choice:
+    elif agent_choice == "Customer Analyzer Agent":
         print("Routing query to Customer Analyzer Agent...")
         return customer_analyzer_agent(query)
     
-    elif "Pricing Strategist" in agent_choice:
+    else:
         print("Routing query to Pricing Strategist Agent...")
         
         # For pricing strategy, we might need additional information
@@ -106,9 +150,6 @@ def routing_agent(query, context=None):
         
         # Finally, determine pricing strategy using both inputs
         return pricing_strategist_agent(query, product_data, customer_data)
-    
-    else:
-        return f"Couldn't route query. Agent decision was: {agent_choice}"
 
 
 # --- Example Usage ---
@@ -128,4 +169,7 @@ if __name__ == "__main__":
         result = routing_agent(query)
         print("\nResult:")
         print(result)
-        print("\n" + "-"*80)
\ No newline at end of file
+        print("\n" + "-"*80)
+
+    # How often the embedding fast path agreed with the LLM router
+    print("Routing report:", get_router().report())
\ No newline at end of file
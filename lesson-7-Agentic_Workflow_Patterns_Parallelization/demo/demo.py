@@ -1,18 +1,19 @@
 import os
+import sys
+from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
 
-import threading
+# The fan-out/fan-in component comes from the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[2] / "project" / "starter" / "phase_1"))
+from workflow_agents.fan_out import FanOut
 
 # Load environment variables and initialize OpenAI client
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
-# Shared dict for thread-safe collection
-agent_outputs = {}
-
 # The shared user prompt
 user_prompt = "What are current trends shaping the future of the energy industry?"
 print(f"Using parallel agents to answer prompt: {user_prompt}")
@@ -29,7 +30,7 @@ class PolicyAgent:
             ],
             temperature=0.7
         )
-        agent_outputs["policy"] = response.choices[0].message.content
+        return response.choices[0].message.content
 
 class TechnologyAgent:
     def run(self, prompt):
@@ -42,7 +43,7 @@ class TechnologyAgent:
             ],
             temperature=0.7
         )
-        agent_outputs["tech"] = response.choices[0].message.content
+        return response.choices[0].message.content
 
 class MarketAgent:
     def run(self, prompt):
@@ -55,16 +56,16 @@ class MarketAgent:
             ],
             temperature=0.7
         )
-        agent_outputs["market"] = response.choices[0].message.content
+        return response.choices[0].message.content
 
 class SummaryAgent:
     def run(self, prompt, inputs):
         combined_prompt = (
             f"The user asked: '{prompt}'\n\n"
             f"Here are the expert responses:\n"
-            f"- Policy Expert: {inputs['policy']}\n\n"
-            f"- Technology Expert: {inputs['tech']}\n\n"
-            f"- Market Expert: {inputs['market']}\n\n"
+            f"- Policy Expert: {inputs.get('policy', 'Not available.')}\n\n"
+            f"- Technology Expert: {inputs.get('tech', 'Not available.')}\n\n"
+            f"- Market Expert: {inputs.get('market', 'Not available.')}\n\n"
             "Please summarize the combined insights into a single clear and concise response."
         )
         print(f"Summary Agent resolving prompt: {combined_prompt}")
@@ -86,18 +87,17 @@ def main():
     market_agent = MarketAgent()
     summary_agent = SummaryAgent()
 
-    threads = [
-        threading.Thread(target=policy_agent.run, args=(user_prompt,)),
-        threading.Thread(target=tech_agent.run, args=(user_prompt,)),
-        threading.Thread(target=market_agent.run, args=(user_prompt,))
-    ]
-
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join()
+    # Fan out: the three experts answer concurrently, each for at most 120 seconds
+    experts = FanOut(
+        {"policy": policy_agent.run, "tech": tech_agent.run, "market": market_agent.run},
+        timeout=120
+    )
+    # Fan in: the answers come back keyed by expert, along with any expert that failed
+    outcome = experts.run(user_prompt)
+    for name, error in outcome["errors"].items():
+        print(f"The {name} expert did not answer: {error}")
 
-    final_summary = summary_agent.run(user_prompt, agent_outputs)
+    final_summary = summary_agent.run(user_prompt, outcome["results"])
 
     print("\n=== FINAL SUMMARY ===\n")
     print(final_summary)
@@ -1,16 +1,32 @@
 import os
+import sys
+import json
+import argparse
+import threading
+from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
-import threading
+
+# The fan-out/fan-in component comes from the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[3] / "project" / "starter" / "phase_1"))
+from workflow_agents.batch import BatchRunner
+from workflow_agents.fan_out import FanOut
 
 # Load environment variables and initialize OpenAI client
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
-# Shared dict for thread-safe collection of agent outputs
-agent_outputs = {}
+# Bounds the LLM requests in flight across every contract being analyzed, so a batch runs at the
+# provider's rate limit instead of tripping it
+MAX_IN_FLIGHT_REQUESTS = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", "8"))
+llm_slots = threading.BoundedSemaphore(MAX_IN_FLIGHT_REQUESTS)
+
+def chat_completion(**params):
+    """Creates a chat completion once one of the global request slots is free."""
+    with llm_slots:
+        return client.chat.completions.create(**params)
 
 # Example contract text (in a real application, this would be loaded from a file)
 contract_text = """
@@ -45,7 +61,7 @@ class LegalTermsChecker:
     """Agent that checks for problematic legal terms and clauses in contracts."""
     def run(self, contract_text):
         print("Legal Terms Checker analyzing contract...")
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are a legal expert specializing in contract law. Analyze the contract for potentially problematic legal terms, clauses, or language that could create legal issues or disputes. Focus on liability, rights, obligations, and ambiguous language."},
@@ -53,14 +69,14 @@ class LegalTermsChecker:
             ],
             temperature=0.3
         )
-        agent_outputs["legal"] = response.choices[0].message.content
         print("Legal Terms Checker completed analysis.")
+        return response.choices[0].message.content
 
 class ComplianceValidator:
     """Agent that validates regulatory and industry compliance of contracts."""
     def run(self, contract_text):
         print("Compliance Validator analyzing contract...")
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are a compliance expert specializing in regulatory requirements across industries. Analyze the contract for potential compliance issues related to data privacy, labor laws, industry-specific regulations, and standard business practices."},
@@ -68,14 +84,14 @@ class ComplianceValidator:
             ],
             temperature=0.3
         )
-        agent_outputs["compliance"] = response.choices[0].message.content
         print("Compliance Validator completed analysis.")
+        return response.choices[0].message.content
 
 class FinancialRiskAssessor:
     """Agent that assesses financial risks and liabilities in contracts."""
     def run(self, contract_text):
         print("Financial Risk Assessor analyzing contract...")
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are a financial analyst specializing in contract risk assessment. Analyze the contract for financial risks, liability exposure, payment terms issues, and potential financial implications that could negatively impact a business."},
@@ -83,8 +99,8 @@ class FinancialRiskAssessor:
             ],
             temperature=0.3
         )
-        agent_outputs["financial"] = response.choices[0].message.content
         print("Financial Risk Assessor completed analysis.")
+        return response.choices[0].message.content
 
 class SummaryAgent:
     """Agent that synthesizes findings from all specialized agents."""
@@ -93,9 +109,9 @@ class SummaryAgent:
         combined_prompt = (
             f"Contract:\n{contract_text}\n\n"
             f"Here are the expert analyses:\n\n"
-            f"LEGAL ANALYSIS:\n{inputs['legal']}\n\n"
-            f"COMPLIANCE ANALYSIS:\n{inputs['compliance']}\n\n"
-            f"FINANCIAL ANALYSIS:\n{inputs['financial']}\n\n"
+            f"LEGAL ANALYSIS:\n{inputs.get('legal', MISSING_ANALYSIS)}\n\n"
+            f"COMPLIANCE ANALYSIS:\n{inputs.get('compliance', MISSING_ANALYSIS)}\n\n"
+            f"FINANCIAL ANALYSIS:\n{inputs.get('financial', MISSING_ANALYSIS)}\n\n"
             "Please synthesize these analyses into a comprehensive contract assessment report with the following sections:\n"
             "1. Executive Summary\n"
             "2. Key Legal Concerns\n"
@@ -105,7 +121,7 @@ class SummaryAgent:
             "The report should be concise, actionable, and highlight the most critical findings."
         )
         
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are a senior contract analyst skilled at synthesizing expert insights into clear, actionable business recommendations."},
@@ -115,39 +131,91 @@ class SummaryAgent:
         )
         return response.choices[0].message.content
 
+# Seconds each specialist agent may take before the summary goes ahead without it
+BRANCH_TIMEOUT = 120
+
+# Stands in for an analysis that failed or timed out, so the summary still covers the others
+MISSING_ANALYSIS = "Not available: this analysis did not complete."
+
+# The specialist agents run concurrently on each contract. Every analysis gets its own results,
+# so several contracts can be analyzed at once without mixing up their outputs.
+contract_review = FanOut(
+    {
+        "legal": LegalTermsChecker().run,
+        "compliance": ComplianceValidator().run,
+        "financial": FinancialRiskAssessor().run,
+    },
+    timeout=BRANCH_TIMEOUT
+)
+
+def review_contract(contract_text):
+    """Run all agents in parallel on one contract and return the summary with the individual analyses."""
+    outcome = contract_review.run(contract_text)
+    for name, error in outcome["errors"].items():
+        print(f"The {name} analysis did not complete: {error}")
+
+    # Generate summary from the analyses that completed
+    summary_agent = SummaryAgent()
+    return {
+        "summary": summary_agent.run(contract_text, outcome["results"]),
+        "analyses": outcome["results"],
+        "errors": outcome["errors"],
+    }
+
 # Main function to run all agents in parallel
 def analyze_contract(contract_text):
     """Run all agents in parallel and summarize their findings."""
-    # Create agent instances
-    legal_agent = LegalTermsChecker()
-    compliance_agent = ComplianceValidator()
-    financial_agent = FinancialRiskAssessor()
-    summary_agent = SummaryAgent()
-    
-    # Run agents in parallel
-    threads = [
-        threading.Thread(target=legal_agent.run, args=(contract_text,)),
-        threading.Thread(target=compliance_agent.run, args=(contract_text,)),
-        threading.Thread(target=financial_agent.run, args=(contract_text,))
-    ]
-    
-    # Start all threads
-    for t in threads:
-        t.start()
-    
-    # Wait for all threads to complete
-    for t in threads:
-        t.join()
-    
-    # Generate summary from all agent outputs
-    final_analysis = summary_agent.run(contract_text, agent_outputs)
-    
-    return final_analysis
+    return review_contract(contract_text)["summary"]
+
+def iter_contracts(source):
+    """Yields (contract id, contract text) pairs from a directory of .txt files, a JSONL file or
+    stream of {"id": ..., "text": ...} lines, or an iterable of such pairs."""
+    if isinstance(source, (str, Path)) and Path(source).is_dir():
+        for path in sorted(Path(source).rglob("*.txt")):
+            yield str(path.relative_to(source)), path.read_text(encoding="utf-8")
+        return
+    if isinstance(source, (str, Path)):
+        with open(source, encoding="utf-8") as stream:
+            yield from iter_contracts(stream)
+        return
+    for entry in source:
+        if isinstance(entry, str):
+            if not entry.strip():
+                continue
+            entry = json.loads(entry)
+        if isinstance(entry, dict):
+            yield entry["id"], entry["text"]
+        else:
+            yield entry
+
+def analyze_contracts(source, output_path="contract_analyses.jsonl", max_concurrent_contracts=8):
+    """Analyzes many contracts concurrently and appends one JSON line per contract to output_path.
+
+    Contracts already in output_path are skipped, so an interrupted batch resumes where it
+    stopped. The LLM requests of all contracts share the MAX_IN_FLIGHT_REQUESTS slots.
+    """
+    runner = BatchRunner(review_contract, output_path, max_concurrency=max_concurrent_contracts)
+    stats = runner.run(
+        iter_contracts(source),
+        on_record=lambda record: print(f"[{'failed' if 'error' in record else 'done'}] {record['id']} "
+                                       f"({record['seconds']:.1f}s)")
+    )
+    print(f"Analyzed {stats['processed']} contracts ({stats['failed']} failed, {stats['skipped']} already done) "
+          f"in {stats['seconds']:.1f}s. Results: {output_path}")
+    return stats
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enterprise Contract Analysis System")
+    parser.add_argument("source", nargs="?", help="Directory of .txt contracts, or JSONL file (- for stdin) to analyze as a batch")
+    parser.add_argument("--output", default="contract_analyses.jsonl", help="JSONL file the batch results are appended to")
+    parser.add_argument("--concurrency", type=int, default=8, help="Contracts analyzed at once")
+    args = parser.parse_args()
+
     print("Enterprise Contract Analysis System")
-    print("Analyzing contract...")
-    
-    final_analysis = analyze_contract(contract_text)
-    print("\n=== FINAL CONTRACT ANALYSIS ===\n")
-    print(final_analysis)
\ No newline at end of file
+    if args.source:
+        analyze_contracts(sys.stdin if args.source == "-" else args.source, args.output, args.concurrency)
+    else:
+        print("Analyzing contract...")
+        final_analysis = analyze_contract(contract_text)
+        print("\n=== FINAL CONTRACT ANALYSIS ===\n")
+        print(final_analysis)
@@ -1,17 +1,19 @@
 import os
+import sys
+from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
-import threading
+
+# The fan-out/fan-in component comes from the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[3] / "project" / "starter" / "phase_1"))
+# TODO: Import FanOut from workflow_agents.fan_out, to run the agents in parallel in analyze_contract
 
 # Load environment variables and initialize OpenAI client
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
-# Shared dict for thread-safe collection of agent outputs
-agent_outputs = {}
-
 # Example contract text (in a real application, this would be loaded from a file)
 contract_text = """
 CONSULTING AGREEMENT
@@ -46,25 +48,26 @@ IN WITNESS WHEREOF, the parties have executed this Agreement as of the date firs
 class LegalTermsChecker:
     """Agent that checks for problematic legal terms and clauses in contracts."""
     def run(self, contract_text):
-        # TODO: Implement this method to analyze legal terms
+        # TODO: Implement this method to analyze legal terms and return the analysis text
         pass
 
 class ComplianceValidator:
     """Agent that validates regulatory and industry compliance of contracts."""
     def run(self, contract_text):
-        # TODO: Implement this method to check compliance
+        # TODO: Implement this method to check compliance and return the analysis text
         pass
 
 class FinancialRiskAssessor:
     """Agent that assesses financial risks and liabilities in contracts."""
     def run(self, contract_text):
-        # TODO: Implement this method to evaluate financial risks
+        # TODO: Implement this method to evaluate financial risks and return the analysis text
         pass
 
 class SummaryAgent:
     """Agent that synthesizes findings from all specialized agents."""
     def run(self, contract_text, inputs):
         # TODO: Implement this method to create a comprehensive summary
+        # inputs holds the analyses that completed, keyed by name; any of them may be missing
         pass
 
 # Main function to run all agents in parallel
@@ -72,8 +75,9 @@ def analyze_contract(contract_text):
     """Run all agents in parallel and summarize their findings."""
     # TODO: Implement parallel execution of agents
     # 1. Create agent instances
-    # 2. Run them in parallel using threading
-    # 3. Collect their outputs
+    # 2. Run them in parallel with FanOut({"legal": ..., "compliance": ..., "financial": ...}, timeout=120).run(contract_text)
+    #    (each agent's run method is a branch; no shared global state is needed)
+    # 3. Collect their outputs from outcome["results"], and report the branches in outcome["errors"]
     # 4. Generate a summary using the SummaryAgent
     # 5. Return the final analysis
     pass
@@ -1,56 +1,51 @@
 import os
+import sys
+from pathlib import Path
 import re
-from typing import List, Dict, Optional
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from openai import OpenAI
 from dotenv import load_dotenv
 
+# The response cache, the plan parser and the worker dispatcher are shared with the project's workflow_agents library
+sys.path.append(str(Path(__file__).resolve().parents[2] / "project" / "starter" / "phase_1"))
+from workflow_agents.response_cache import cached_chat_completion
+from workflow_agents.orchestration import TaskStreamParser, WorkerDispatcher
+from workflow_agents.streaming import iter_response
+
 # === Setup ===
 load_dotenv()
 client = OpenAI(
-    base_url = "https://openai.vocareum.com/v1",
+    base_url = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
     api_key=os.getenv("OPENAI_API_KEY"))
 
 # === Utility Functions ===
 
+TEMPERATURE = 0.3
+
 def llm_call(prompt: str, model: str = "gpt-4") -> str:
-    """Basic LLM call wrapper"""
-    response = client.chat.completions.create(
+    """Basic LLM call wrapper, answered from the response cache when it is enabled and TEMPERATURE is 0"""
+    response = cached_chat_completion(
+        client,
         model=model,
         messages=[
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
         ],
-        temperature=0.3
+        temperature=TEMPERATURE
     )
     return response.choices[0].message.content.strip()
 
+def llm_stream(prompt: str, model: str = "gpt-4") -> Iterator[str]:
+    """Streams an LLM reply, yielding its text as it is generated (the complete reply is cached like llm_call's)."""
+    return iter_response(llm_call, prompt, model)
+
 def extract_xml(text: str, tag: str) -> str:
     """Extract content between XML-style tags"""
     pattern = rf"<{tag}>(.*?)</{tag}>"
     match = re.search(pattern, text, re.DOTALL)
     return match.group(1).strip() if match else ""
 
-def parse_tasks(xml: str) -> List[Dict]:
-    """Parses <task> XML blocks into dictionaries"""
-    tasks = []
-    current_task = {}
-
-    for line in xml.splitlines():
-        line = line.strip()
-        if line.startswith("<task>"):
-            current_task = {}
-        elif line.startswith("<type>"):
-            current_task["type"] = line[6:-7].strip()
-        elif line.startswith("<description>"):
-            current_task["description"] = line[12:-13].strip()
-        elif line.startswith("</task>"):
-            if "description" in current_task:
-                if "type" not in current_task:
-                    current_task["type"] = "default"
-                tasks.append(current_task)
-
-    return tasks
-
 # === Worker Agent Base Class ===
 
 class WorkerAgent:
@@ -131,8 +126,15 @@ Subtask Description: {task_description}
 # === Orchestrator ===
 
 class Orchestrator:
-    def __init__(self, orchestrator_prompt: str):
+    def __init__(self, orchestrator_prompt: str, max_workers: int = 4, worker_timeout: Optional[float] = 120.0,
+                 stream_plan: bool = True):
         self.orchestrator_prompt = orchestrator_prompt
+        # At most max_workers subtasks are sent to the LLM at once
+        self.max_workers = max_workers
+        # Seconds a worker may take before its subtask is reported as timed out (None waits forever)
+        self.worker_timeout = worker_timeout
+        # Stream the orchestrator's plan so workers start before it is complete
+        self.stream_plan = stream_plan
 
     def get_worker(self, task_type: str) -> WorkerAgent:
         type_lower = task_type.lower()
@@ -143,37 +145,62 @@ class Orchestrator:
         else:
             return GenericAgent(task_type)
 
-    def process(self, task: str) -> Dict:
-        # Step 1: Decompose task using orchestrator LLM
+    def process(self, task: str, on_result: Optional[Callable[[Dict], None]] = None,
+                on_delta: Optional[Callable[[Dict, str], None]] = None) -> Dict:
+        # Step 1: Decompose task using orchestrator LLM. The plan is parsed while it streams in.
         orchestrator_input = self.orchestrator_prompt.format(task=task)
-        response = llm_call(orchestrator_input)
-        print("\n[Raw Orchestrator Output]\n", response)
+        parser = TaskStreamParser()
+        chunks = llm_stream(orchestrator_input) if self.stream_plan else [llm_call(orchestrator_input)]
+
+        def planned_assignments():
+            for chunk in chunks:
+                for task_info in parser.feed(chunk):
+                    yield from self.assign(task_info)
+            for task_info in parser.close():
+                yield from self.assign(task_info)
 
-        analysis = extract_xml(response, "analysis")
-        tasks_xml = extract_xml(response, "tasks")
-        tasks = parse_tasks(tasks_xml)
+        # Step 2: Dispatch tasks to worker agents concurrently, each as soon as it is planned
+        results = self.dispatch(task, planned_assignments(), on_result, on_delta)
 
+        print("\n[Raw Orchestrator Output]\n", parser.text)
         print("\n=== ORCHESTRATOR ===")
-        print("Analysis:", analysis)
-        print("Parsed Tasks:", tasks)
-
-        # Step 2: Dispatch tasks to worker agents
-        results = []
-        for task_info in tasks:
-            agent = self.get_worker(task_info["type"])
-            result = agent.run(task, task_info["description"])
-            print(f"\n=== {task_info['type'].upper()} RESULT ===\n{result}")
-            results.append({
-                "type": task_info["type"],
-                "description": task_info["description"],
-                "result": result
-            })
+        print("Analysis:", parser.analysis)
+        print("Parsed Tasks:", [{"type": r["type"], "description": r["description"]} for r in results])
 
         return {
-            "analysis": analysis,
+            "analysis": parser.analysis,
             "worker_results": results
         }
 
+    def assign(self, task_info: Dict) -> List[Tuple[WorkerAgent, Dict]]:
+        """Pairs a planned task with its worker agent."""
+        print(f"\n[Orchestrator] Planned {task_info['type']} task: {task_info['description']}")
+        return [(self.get_worker(task_info["type"]), task_info)]
+
+    def dispatch(self, task: str, assignments: Iterable[Tuple[WorkerAgent, Dict]],
+                 on_result: Optional[Callable[[Dict], None]] = None,
+                 on_delta: Optional[Callable[[Dict, str], None]] = None) -> List[Dict]:
+        """Runs the workers concurrently and returns their results in subtask order.
+
+        Assignments are read as they become available, so workers start while the plan is still
+        streaming in. Results are printed (and passed to on_result) as soon as each worker
+        finishes, and each worker's reply is passed to on_delta(task_info, text) while it is
+        still being generated. A worker that fails or times out is reported in its result
+        without stopping the others.
+        """
+        start = time.perf_counter()
+        finished = []
+
+        def report(entry):
+            finished.append(entry)
+            print(f"\n=== {entry['type'].upper()} RESULT ({len(finished)} done, "
+                  f"{time.perf_counter() - start:.1f}s) ===\n{entry['result']}")
+            if on_result is not None:
+                on_result(entry)
+
+        dispatcher = WorkerDispatcher(max_workers=self.max_workers, worker_timeout=self.worker_timeout)
+        return dispatcher.dispatch(task, assignments, report, on_delta)
+
 # === Prompt Template for Orchestrator ===
 
 orchestrator_prompt = """
@@ -9,7 +9,9 @@ load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
 persona = "You are a college professor, yous answer always starts with: Dear students,"
-RAG_knowledge_prompt_agent = RAGKnowledgePromptAgent(openai_api_key, persona, 500, 200)
+# The knowledge base is stored under knowledge_bases/clara and reused across runs:
+# only chunks whose text changed since the last run are embedded again.
+RAG_knowledge_prompt_agent = RAGKnowledgePromptAgent(openai_api_key, persona, 500, 200, knowledge_base="clara")
 
 knowledge_text = """
 In the historic city of Boston, Clara, a marine biologist and science communicator, began each morning analyzing sonar data to track whale migration patterns along the Atlantic coast.
@@ -42,8 +44,8 @@ To Clara, knowledge was a living system—retrieved from the past, generated in
 Her life and work were testaments to the power of connecting across disciplines, borders, and generations—exactly the kind of story that RAG models were born to find.
 """
 
-chunks = RAG_knowledge_prompt_agent.chunk_text(knowledge_text)
-embbedings = RAG_knowledge_prompt_agent.calculate_embeddings()
+update_stats = RAG_knowledge_prompt_agent.update_knowledge({"clara": knowledge_text}, remove_missing=True)
+print(update_stats)
 
 prompt = "What is the podcast that Clara hosts about?"
 print(prompt)
@@ -0,0 +1,155 @@
+import numpy as np
+
+
+class IVFIndex:
+    """
+    An inverted-file (IVF) approximate nearest-neighbour index over unit-length vectors.
+
+    Spherical k-means splits the vectors into n_lists clusters. A query is compared with the
+    cluster centroids first, and only the vectors in the n_probe closest clusters are scored
+    exactly. Raising n_probe improves recall at the cost of latency; n_probe == n_lists is an
+    exact search.
+    """
+
+    FILE_NAME = "ivf_index.npz"
+
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, sample_size=100000, seed=0):
+        """
+        Initializes an empty index.
+
+        Parameters:
+        n_lists (int): Number of clusters. Defaults to the square root of the number of vectors.
+        n_probe (int): Number of clusters scanned per query. Defaults to 8.
+        n_iter (int): Number of k-means iterations. Defaults to 10.
+        sample_size (int): Number of vectors k-means is trained on. Defaults to 100000.
+        seed (int): Random seed for the training sample and initial centroids.
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.sample_size = sample_size
+        self.seed = seed
+        self.centroids = None
+        self.order = None
+        self.offsets = None
+
+    @property
+    def count(self):
+        """int: Number of indexed vectors."""
+        return 0 if self.order is None else len(self.order)
+
+    def build(self, vectors, batch_size=65536):
+        """
+        Trains the centroids and assigns every vector to its closest cluster.
+
+        Parameters:
+        vectors (numpy.ndarray): (count, dimension) matrix of unit-length rows.
+        batch_size (int): Number of vectors assigned at a time.
+
+        Returns:
+        IVFIndex: The index itself.
+        """
+        count = len(vectors)
+        if count == 0:
+            raise ValueError("Cannot build an index over an empty matrix.")
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(count))), count)
+        rng = np.random.default_rng(self.seed)
+
+        sample_rows = np.sort(rng.choice(count, size=min(self.sample_size, count), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = _cluster_sums(sample, assignment, n_lists)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, batch_size):
+            batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            assignment[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+
+        self.centroids = centroids.astype(np.float32)
+        self.order = np.argsort(assignment, kind='stable')
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+        self.n_lists = n_lists
+        return self
+
+    def search(self, vectors, query_vectors, top_k=1, n_probe=None):
+        """
+        Finds the approximate top_k most similar rows for each query.
+
+        Parameters:
+        vectors (numpy.ndarray): The unit-length matrix the index was built over.
+        query_vectors (numpy.ndarray): (queries, dimension) matrix of unit-length queries.
+        top_k (int): Number of rows to return per query.
+        n_probe (int): Clusters to scan per query. Defaults to the index's n_probe.
+
+        Returns:
+        tuple: (indices, scores) arrays of shape (queries, top_k), best match first. Rows with
+        fewer than top_k candidates are padded with index -1 and score -inf.
+        """
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        indices = np.full((len(query_vectors), top_k), -1, dtype=np.int64)
+        scores = np.full((len(query_vectors), top_k), -np.inf, dtype=np.float32)
+
+        centroid_scores = query_vectors @ self.centroids.T
+        for q, query in enumerate(query_vectors):
+            if n_probe < self.n_lists:
+                lists = np.argpartition(-centroid_scores[q], n_probe - 1)[:n_probe]
+            else:
+                lists = np.arange(self.n_lists)
+            candidates = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+            if len(candidates) == 0:
+                continue
+            candidates.sort()
+            candidate_scores = np.asarray(vectors[candidates], dtype=np.float32) @ query
+            k = min(top_k, len(candidates))
+            best = np.argpartition(-candidate_scores, k - 1)[:k] if k < len(candidates) else np.arange(k)
+            best = best[np.argsort(-candidate_scores[best])]
+            indices[q, :k] = candidates[best]
+            scores[q, :k] = candidate_scores[best]
+        return indices, scores
+
+    def save(self, path):
+        """
+        Writes the index to a .npz file.
+
+        Parameters:
+        path (str): File path.
+        """
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 params=np.array([self.n_lists, self.n_probe, self.n_iter, self.sample_size, self.seed]))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads an index written by save.
+
+        Parameters:
+        path (str): File path.
+
+        Returns:
+        IVFIndex: The loaded index.
+        """
+        with np.load(path) as data:
+            n_lists, n_probe, n_iter, sample_size, seed = (int(v) for v in data["params"])
+            index = cls(n_lists, n_probe, n_iter, sample_size, seed)
+            index.centroids = data["centroids"]
+            index.order = data["order"]
+            index.offsets = data["offsets"]
+        return index
+
+
+def _cluster_sums(vectors, assignment, n_lists, batch_size=16384):
+    """Sums the vectors of each cluster, as one-hot matrix products over batches of rows."""
+    sums = np.zeros((n_lists, vectors.shape[1]), dtype=np.float32)
+    for start in range(0, len(vectors), batch_size):
+        batch_assignment = assignment[start:start + batch_size]
+        one_hot = np.zeros((n_lists, len(batch_assignment)), dtype=np.float32)
+        one_hot[batch_assignment, np.arange(len(batch_assignment))] = 1.0
+        sums += one_hot @ vectors[start:start + batch_size]
+    return sums
@@ -0,0 +1,65 @@
+import asyncio
+import inspect
+
+
+async def call_function(func, *args):
+    """
+    Calls a sync or async function from async code without blocking the event loop.
+
+    Coroutine functions are awaited directly. Plain functions run in a worker thread, and an
+    awaitable they return (e.g. from a lambda wrapping an async agent method) is awaited too.
+
+    Parameters:
+    func (callable): The function to call.
+    *args: Positional arguments for the function.
+
+    Returns:
+    object: The function's result.
+    """
+    if inspect.iscoroutinefunction(func):
+        return await func(*args)
+    result = await asyncio.to_thread(func, *args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def agent_respond(agent, prompt):
+    """
+    Gets an agent's response from async code, using the agent's arespond method when it has one.
+
+    Parameters:
+    agent (object): An agent with an arespond or respond method.
+    prompt (str): The prompt to respond to.
+
+    Returns:
+    str: The agent's response.
+    """
+    if hasattr(agent, "arespond"):
+        return await agent.arespond(prompt)
+    return await call_function(agent.respond, prompt)
+
+
+def run_sync(coroutine):
+    """
+    Runs a coroutine from sync code and returns its result. This is how the sync run methods of
+    the workflow components wrap their async counterparts.
+
+    asyncio.run cannot be called from a thread that is already running an event loop, which is
+    the case in a Jupyter notebook cell. There the coroutine runs on the default client
+    provider's background event loop instead, and the calling thread waits for it. Code that is
+    itself async should await the arun methods rather than call run.
+
+    Parameters:
+    coroutine (coroutine): The coroutine to run.
+
+    Returns:
+    object: The coroutine's result.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # Imported here because the clients module itself depends on this one
+    from .clients import get_default_provider
+    return get_default_provider().run(coroutine)
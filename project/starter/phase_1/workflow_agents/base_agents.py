@@ -1,28 +1,58 @@
-# TODO: 1 - import the OpenAI class from the openai library
+# TODO: 1 - No OpenAI import is needed: every agent calls the API through its self.client_provider (see get_default_provider below)
 import numpy as np
 import pandas as pd
-import re
+import os
 import csv
+import time
 import uuid
 from datetime import datetime
+import asyncio
+from .async_utils import agent_respond, call_function
+from .chunking import iter_chunks
+from .clients import get_default_provider
+from .embedding_cache import get_default_cache
+from .embedding_pipeline import EmbeddingPipeline
+from .evaluation import request_verdict, run_parallel_evaluation, verdict_messages
+from .instrumentation import instrumented_agent
+from .knowledge_base import KnowledgeBase
+from .route_index import RouteIndex
+from .streaming import aiter_response, iter_response
+from .vector_store import VectorStore
 
 '''
 # DirectPromptAgent class definition
 class DirectPromptAgent:
     
-    def __init__(self, openai_api_key):
+    def __init__(self, openai_api_key, client_provider=None, use_response_cache=True):
         # Initialize the agent
         # TODO: 2 - Define an attribute named openai_api_key to store the OpenAI API key provided to this class.
+        # All agents share one pooled OpenAI client through the client provider
+        self.client_provider = client_provider or get_default_provider(openai_api_key)
+        # Identical temperature-0 requests are answered from the provider's response cache unless bypassed
+        self.use_response_cache = use_response_cache
 
     def respond(self, prompt):
-        # Generate a response using the OpenAI API
-        client = OpenAI(api_key=self.openai_api_key)
-        response = client.chat.completions.create(
+        # Synchronous wrapper: runs arespond on the client provider's event loop
+        return self.client_provider.run(self.arespond(prompt))
+
+    def respond_stream(self, prompt):
+        # Yields the response in pieces as it is generated, so it can be shown from the first token
+        return iter_response(self.respond, prompt)
+
+    def arespond_stream(self, prompt):
+        # Async variant of respond_stream, for use with async for
+        return aiter_response(self.arespond, prompt)
+
+    @instrumented_agent
+    async def arespond(self, prompt):
+        # Generate a response using the OpenAI API without blocking the event loop
+        response = await self.client_provider.achat(
             model=# TODO: 3 - Specify the model to use (gpt-3.5-turbo)
             messages=[
                 # TODO: 4 - Provide the user's prompt here. Do not add a system prompt.
             ],
-            temperature=0
+            temperature=0,
+            cache=self.use_response_cache
         )
         # TODO: 5 - Return only the textual content of the response (not the full JSON response).
 '''
@@ -30,23 +60,39 @@ class DirectPromptAgent:
 '''
 # AugmentedPromptAgent class definition
 class AugmentedPromptAgent:
-    def __init__(self, openai_api_key, persona):
+    def __init__(self, openai_api_key, persona, client_provider=None, use_response_cache=True):
         """Initialize the agent with given attributes."""
         # TODO: 1 - Create an attribute for the agent's persona
         self.openai_api_key = openai_api_key
+        # All agents share one pooled OpenAI client through the client provider
+        self.client_provider = client_provider or get_default_provider(openai_api_key)
+        # Identical temperature-0 requests are answered from the provider's response cache unless bypassed
+        self.use_response_cache = use_response_cache
 
     def respond(self, input_text):
-        """Generate a response using OpenAI API."""
-        client = OpenAI(api_key=self.openai_api_key)
+        """Synchronous wrapper around arespond."""
+        return self.client_provider.run(self.arespond(input_text))
 
-        # TODO: 2 - Declare a variable 'response' that calls OpenAI's API for a chat completion.
-        response = client.chat.completions.create(
+    def respond_stream(self, input_text):
+        """Yields the response in pieces as it is generated."""
+        return iter_response(self.respond, input_text)
+
+    def arespond_stream(self, input_text):
+        """Async variant of respond_stream, for use with async for."""
+        return aiter_response(self.arespond, input_text)
+
+    @instrumented_agent
+    async def arespond(self, input_text):
+        """Generate a response using OpenAI API."""
+        # TODO: 2 - Declare a variable 'response' that awaits OpenAI's API for a chat completion.
+        response = await self.client_provider.achat(
             model="gpt-3.5-turbo",
             messages=[
                 # TODO: 3 - Add a system prompt instructing the agent to assume the defined persona and explicitly forget previous context.
                 {"role": "user", "content": input_text}
             ],
-            temperature=0
+            temperature=0,
+            cache=self.use_response_cache
         )
 
         return  # TODO: 4 - Return only the textual content of the response, not the full JSON payload.
@@ -55,16 +101,32 @@ class AugmentedPromptAgent:
 '''
 # KnowledgeAugmentedPromptAgent class definition
 class KnowledgeAugmentedPromptAgent:
-    def __init__(self, openai_api_key, persona, knowledge):
+    def __init__(self, openai_api_key, persona, knowledge, client_provider=None, use_response_cache=True):
         """Initialize the agent with provided attributes."""
         self.persona = persona
         # TODO: 1 - Create an attribute to store the agent's knowledge.
         self.openai_api_key = openai_api_key
+        # All agents share one pooled OpenAI client through the client provider
+        self.client_provider = client_provider or get_default_provider(openai_api_key)
+        # Identical temperature-0 requests are answered from the provider's response cache unless bypassed
+        self.use_response_cache = use_response_cache
 
     def respond(self, input_text):
+        """Synchronous wrapper around arespond."""
+        return self.client_provider.run(self.arespond(input_text))
+
+    def respond_stream(self, input_text):
+        """Yields the response in pieces as it is generated."""
+        return iter_response(self.respond, input_text)
+
+    def arespond_stream(self, input_text):
+        """Async variant of respond_stream, for use with async for."""
+        return aiter_response(self.arespond, input_text)
+
+    @instrumented_agent
+    async def arespond(self, input_text):
         """Generate a response using the OpenAI API."""
-        client = OpenAI(api_key=self.openai_api_key)
-        response = client.chat.completions.create(
+        response = await self.client_provider.achat(
             model="gpt-3.5-turbo",
             messages=[
                 # TODO: 2 - Construct a system message including:
@@ -77,7 +139,8 @@ class KnowledgeAugmentedPromptAgent:
                 
                 # TODO: 3 - Add the user's input prompt here as a user message.
             ],
-            temperature=0
+            temperature=0,
+            cache=self.use_response_cache
         )
         return response.choices[0].message.content
 '''
@@ -89,7 +152,9 @@ class RAGKnowledgePromptAgent:
     and leverages embeddings to respond to prompts based solely on retrieved information.
     """
 
-    def __init__(self, openai_api_key, persona, chunk_size=2000, chunk_overlap=100):
+    def __init__(self, openai_api_key, persona, chunk_size=2000, chunk_overlap=100,
+                 embedding_batch_tokens=50000, embedding_concurrency=4, embedding_cache=None,
+                 knowledge_base=None, client_provider=None, use_response_cache=True):
         """
         Initializes the RAGKnowledgePromptAgent with API credentials and configuration settings.
 
@@ -98,16 +163,55 @@ class RAGKnowledgePromptAgent:
         persona (str): Persona description for the agent.
         chunk_size (int): The size of text chunks for embedding. Defaults to 2000.
         chunk_overlap (int): Overlap between consecutive chunks. Defaults to 100.
+        embedding_batch_tokens (int): Token budget of one embeddings request. Defaults to 50000.
+        embedding_concurrency (int): Maximum embeddings requests in flight. Defaults to 4.
+        embedding_cache (EmbeddingCache): Cache of embeddings. Defaults to the shared process-wide cache.
+        knowledge_base (str): Name of a persistent knowledge base to use instead of per-run files.
+        client_provider (ClientProvider): Provider of the shared OpenAI client. Defaults to the
+            process-wide provider for openai_api_key.
+        use_response_cache (bool): Whether answers may come from the provider's response cache. Defaults to True.
         """
         self.persona = persona
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.openai_api_key = openai_api_key
-        self.unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.csv"
+        self.embedding_batch_tokens = embedding_batch_tokens
+        self.embedding_concurrency = embedding_concurrency
+        self.client_provider = client_provider or get_default_provider(openai_api_key)
+        self.use_response_cache = use_response_cache
+        self.embedding_cache = embedding_cache if embedding_cache is not None else get_default_cache()
+        self.vector_store = None
+        self.knowledge_base = None
+        if knowledge_base is None:
+            self.unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.csv"
+            self.vector_store_path = f"embeddings-{os.path.splitext(self.unique_filename)[0]}"
+        else:
+            self.knowledge_base = KnowledgeBase(
+                knowledge_base,
+                lambda texts: self._embedding_pipeline().embed(texts),
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap
+            )
+            self.unique_filename = f"{knowledge_base}.csv"
+            self.vector_store_path = self.knowledge_base.store_path
 
     def get_embedding(self, text):
         """
         Fetches the embedding vector for given text using OpenAI's embedding API.
+        Embeddings are served from the agent's cache when the same text was embedded before.
+
+        Parameters:
+        text (str): Text to embed.
+
+        Returns:
+        list: The embedding vector.
+        """
+        return self.client_provider.run(self.aget_embedding(text))
+
+    @instrumented_agent
+    async def aget_embedding(self, text):
+        """
+        Async variant of get_embedding.
 
         Parameters:
         text (str): Text to embed.
@@ -115,13 +219,20 @@ class RAGKnowledgePromptAgent:
         Returns:
         list: The embedding vector.
         """
-        client = OpenAI(base_url="https://openai.vocareum.com/v1", api_key=self.openai_api_key)
-        response = client.embeddings.create(
+        start = time.perf_counter()
+        embedding = self.embedding_cache.get("text-embedding-3-large", text)
+        if embedding is not None:
+            # Reported like a response cache hit, so usage summaries count cached embeddings too
+            self.client_provider.instrumentation.record("embeddings", "text-embedding-3-large",
+                                                        time.perf_counter() - start, cache_hit=True)
+            return embedding
+        response = await self.client_provider.aembeddings(
             model="text-embedding-3-large",
-            input=text,
-            encoding_format="float"
+            input=text
         )
-        return response.data[0].embedding
+        embedding = response.data[0].embedding
+        self.embedding_cache.put("text-embedding-3-large", text, embedding)
+        return embedding
 
     def calculate_similarity(self, vector_one, vector_two):
         """
@@ -147,75 +258,260 @@ class RAGKnowledgePromptAgent:
         Returns:
         list: List of dictionaries containing chunk metadata.
         """
-        separator = "\n"
-        text = re.sub(r'\s+', ' ', text).strip()
-
-        if len(text) <= self.chunk_size:
-            return [{"chunk_id": 0, "text": text, "chunk_size": len(text)}]
-
-        chunks, start, chunk_id = [], 0, 0
-
-        while start < len(text):
-            end = min(start + self.chunk_size, len(text))
-            if separator in text[start:end]:
-                end = start + text[start:end].rindex(separator) + len(separator)
-
-            chunks.append({
-                "chunk_id": chunk_id,
-                "text": text[start:end],
-                "chunk_size": end - start,
-                "start_char": start,
-                "end_char": end
-            })
-
-            start = end - self.chunk_overlap
-            chunk_id += 1
+        chunks = list(iter_chunks(text, self.chunk_size, self.chunk_overlap))
+        self._write_chunks_csv(chunks)
+        return chunks
 
+    def _write_chunks_csv(self, chunks):
+        """Writes chunk text, size and offsets to the agent's chunks CSV file."""
         with open(f"chunks-{self.unique_filename}", 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=["text", "chunk_size"])
+            fieldnames = ["text", "chunk_size", "start_char", "end_char"]
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             for chunk in chunks:
-                writer.writerow({k: chunk[k] for k in ["text", "chunk_size"]})
-
-        return chunks
+                writer.writerow({k: chunk[k] for k in fieldnames})
 
+    @instrumented_agent
     def calculate_embeddings(self):
         """
-        Calculates embeddings for each chunk and stores them in a CSV file.
+        Calculates embeddings for each chunk and stores them in a memory-mapped vector store.
+        Chunks are embedded in batches, with several requests in flight at once.
 
         Returns:
         DataFrame: DataFrame containing text chunks and their embeddings.
         """
+        if self.knowledge_base is not None:
+            raise ValueError("calculate_embeddings would overwrite the knowledge base's store; use update_knowledge or ingest.")
         df = pd.read_csv(f"chunks-{self.unique_filename}", encoding='utf-8')
-        df['embeddings'] = df['text'].apply(self.get_embedding)
-        df.to_csv(f"embeddings-{self.unique_filename}", encoding='utf-8', index=False)
+        df['embeddings'] = self._embedding_pipeline().embed(df['text'].tolist())
+        self.vector_store = VectorStore.write(
+            self.vector_store_path,
+            df['embeddings'].tolist(),
+            df.to_dict('records'),
+            model="text-embedding-3-large"
+        )
         return df
 
-    def find_prompt_in_knowledge(self, prompt):
+    @instrumented_agent
+    def ingest(self, source, batch_chunks=1024, doc_id=None):
+        """
+        Chunks and embeds a corpus as a stream and writes it to the agent's vector store.
+
+        Chunks go to the embedding pipeline in groups of batch_chunks as they are produced, and
+        each group is appended to the store, so memory stays bounded by the group size rather
+        than the corpus size.
+
+        With a knowledge base, the corpus is added to it as one document instead, through
+        update_knowledge, so the knowledge base's manifest stays in step with its store and
+        unchanged chunks are not embedded again.
+
+        Parameters:
+        source (str, file or iterable): The corpus text, an open text file or an iterable of strings.
+        batch_chunks (int): Number of chunks embedded and written at a time. Defaults to 1024.
+        doc_id (str): ID of the corpus document in the knowledge base. Defaults to the knowledge
+            base name. Ignored without a knowledge base.
+
+        Returns:
+        VectorStore: The store holding the corpus embeddings.
+        """
+        if self.knowledge_base is not None:
+            self.update_knowledge({doc_id or self.knowledge_base.name: source})
+            return self.load_vector_store()
+        pipeline = self._embedding_pipeline()
+        with VectorStore.writer(self.vector_store_path, model="text-embedding-3-large") as writer:
+            batch = []
+            for chunk in iter_chunks(source, self.chunk_size, self.chunk_overlap):
+                batch.append(chunk)
+                if len(batch) == batch_chunks:
+                    writer.add(pipeline.embed([c["text"] for c in batch]), batch)
+                    batch = []
+            if batch:
+                writer.add(pipeline.embed([c["text"] for c in batch]), batch)
+        self.vector_store = VectorStore(self.vector_store_path)
+        return self.vector_store
+
+    @instrumented_agent
+    def update_knowledge(self, documents, remove_missing=False):
+        """
+        Indexes documents into the agent's knowledge base, re-embedding only changed chunks.
+
+        Parameters:
+        documents (dict): Document texts (or open text files) keyed by document ID.
+        remove_missing (bool): If True, documents not listed are removed from the knowledge base.
+
+        Returns:
+        dict: Statistics of the update (documents updated or unchanged, chunks embedded or reused).
+        """
+        if self.knowledge_base is None:
+            raise ValueError("update_knowledge requires the agent to be created with a knowledge_base name.")
+        if remove_missing:
+            stats = self.knowledge_base.sync(documents)
+        else:
+            stats = self.knowledge_base.update(documents)
+        self.vector_store = None
+        return stats
+
+    def _embedding_pipeline(self):
+        """Builds the batched, cached embedding pipeline used for ingestion."""
+        return EmbeddingPipeline(
+            self.client_provider,
+            model="text-embedding-3-large",
+            max_tokens_per_request=self.embedding_batch_tokens,
+            max_concurrency=self.embedding_concurrency,
+            cache=self.embedding_cache
+        )
+
+    def load_vector_store(self):
+        """
+        Opens the agent's vector store once and reuses it for every later query.
+
+        Returns:
+        VectorStore: The store holding the chunk embeddings.
+        """
+        if self.vector_store is None:
+            self.vector_store = VectorStore(self.vector_store_path)
+        return self.vector_store
+
+    def build_ann_index(self, n_lists=None, n_probe=8):
+        """
+        Builds an approximate nearest-neighbour index over the agent's vector store, so searches
+        of large corpora scan only the clusters closest to the prompt.
+
+        Parameters:
+        n_lists (int): Number of clusters. Defaults to the square root of the number of chunks.
+        n_probe (int): Clusters scanned per query; higher means better recall and slower queries.
+
+        Returns:
+        IVFIndex: The built index, saved alongside the vector store.
+        """
+        return self.load_vector_store().build_ann_index(n_lists=n_lists, n_probe=n_probe)
+
+    def import_embeddings_csv(self, csv_path):
+        """
+        Imports an embeddings CSV written by earlier versions of this agent into its vector store.
+
+        Parameters:
+        csv_path (str): Path of the embeddings-*.csv file.
+
+        Returns:
+        VectorStore: The store holding the imported embeddings.
+        """
+        if self.knowledge_base is not None:
+            raise ValueError("import_embeddings_csv would overwrite the knowledge base's store; use update_knowledge or ingest.")
+        self.vector_store = VectorStore.from_csv(csv_path, self.vector_store_path, model="text-embedding-3-large")
+        return self.vector_store
+
+    def search_knowledge(self, prompts, top_k=5):
+        """
+        Retrieves the chunks most similar to one or more prompts.
+
+        Every prompt is embedded and the whole batch is scored against the vector store in a
+        single matrix product.
+
+        Parameters:
+        prompts (str or list): A prompt or a list of prompts.
+        top_k (int): Number of chunks to return per prompt. Defaults to 5.
+
+        Returns:
+        list: For a single prompt, a list of chunk dictionaries (text, offsets and similarity
+        score), best match first. For a list of prompts, one such list per prompt.
+        """
+        return self.client_provider.run(self.asearch_knowledge(prompts, top_k))
+
+    @instrumented_agent
+    async def asearch_knowledge(self, prompts, top_k=5):
+        """
+        Async variant of search_knowledge. The prompts are embedded concurrently, and the search
+        itself runs in a worker thread so the event loop stays responsive on large stores.
+
+        Parameters:
+        prompts (str or list): A prompt or a list of prompts.
+        top_k (int): Number of chunks to return per prompt. Defaults to 5.
+
+        Returns:
+        list: The matching chunks, as returned by search_knowledge.
+        """
+        single = isinstance(prompts, str)
+        prompt_list = [prompts] if single else list(prompts)
+        store = self.load_vector_store()
+        embeddings = await asyncio.gather(*(self.aget_embedding(p) for p in prompt_list))
+        indices, scores = await asyncio.to_thread(store.search, embeddings, top_k)
+
+        results = []
+        for row_indices, row_scores in zip(indices, scores):
+            matches = []
+            for index, score in zip(row_indices, row_scores):
+                if index < 0:
+                    continue
+                chunk = dict(store.chunks[index])
+                chunk["score"] = float(score)
+                matches.append(chunk)
+            results.append(matches)
+        return results[0] if single else results
+
+    def find_prompt_in_knowledge(self, prompt, top_k=1):
         """
         Finds and responds to a prompt based on similarity with embedded knowledge.
 
         Parameters:
         prompt (str): User input prompt.
+        top_k (int): Number of most similar chunks to answer from. Defaults to 1.
 
         Returns:
-        str: Response derived from the most similar chunk in knowledge.
+        str: Response derived from the most similar chunks in knowledge.
         """
-        prompt_embedding = self.get_embedding(prompt)
-        df = pd.read_csv(f"embeddings-{self.unique_filename}", encoding='utf-8')
-        df['embeddings'] = df['embeddings'].apply(lambda x: np.array(eval(x)))
-        df['similarity'] = df['embeddings'].apply(lambda emb: self.calculate_similarity(prompt_embedding, emb))
+        return self.client_provider.run(self.afind_prompt_in_knowledge(prompt, top_k))
 
-        best_chunk = df.loc[df['similarity'].idxmax(), 'text']
+    def find_prompt_in_knowledge_stream(self, prompt, top_k=1):
+        """
+        Streaming variant of find_prompt_in_knowledge: yields the response in pieces as it is
+        generated, so it can be shown from the first token.
+
+        Parameters:
+        prompt (str): User input prompt.
+        top_k (int): Number of most similar chunks to answer from. Defaults to 1.
+
+        Returns:
+        generator: Text deltas of the response.
+        """
+        return iter_response(self.find_prompt_in_knowledge, prompt, top_k)
+
+    def afind_prompt_in_knowledge_stream(self, prompt, top_k=1):
+        """
+        Async variant of find_prompt_in_knowledge_stream, for use with async for.
+
+        Parameters:
+        prompt (str): User input prompt.
+        top_k (int): Number of most similar chunks to answer from. Defaults to 1.
 
-        client = OpenAI(base_url="https://openai.vocareum.com/v1", api_key=self.openai_api_key)
-        response = client.chat.completions.create(
+        Returns:
+        async generator: Text deltas of the response.
+        """
+        return aiter_response(self.afind_prompt_in_knowledge, prompt, top_k)
+
+    @instrumented_agent
+    async def afind_prompt_in_knowledge(self, prompt, top_k=1):
+        """
+        Async variant of find_prompt_in_knowledge.
+
+        Parameters:
+        prompt (str): User input prompt.
+        top_k (int): Number of most similar chunks to answer from. Defaults to 1.
+
+        Returns:
+        str: Response derived from the most similar chunks in knowledge.
+        """
+        matches = await self.asearch_knowledge(prompt, top_k)
+        best_chunk = "\n".join(match["text"] for match in matches)
+
+        response = await self.client_provider.achat(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": f"You are {self.persona}, a knowledge-based assistant. Forget previous context."},
                 {"role": "user", "content": f"Answer based only on this information: {best_chunk}. Prompt: {prompt}"}
             ],
-            temperature=0
+            temperature=0,
+            cache=self.use_response_cache
         )
 
         return response.choices[0].message.content
@@ -223,13 +519,23 @@ class RAGKnowledgePromptAgent:
 '''
 class EvaluationAgent:
     
-    def __init__(self, openai_api_key, persona, evaluation_criteria, worker_agent, max_interactions):
+    def __init__(self, openai_api_key, persona, evaluation_criteria, worker_agent, max_interactions, client_provider=None, use_response_cache=True, structured_verdicts=False):
         # Initialize the EvaluationAgent with given attributes.
-        # TODO: 1 - Declare class attributes here
+        # TODO: 1 - Declare class attributes here (openai_api_key, persona, evaluation_criteria, worker_agent, max_interactions)
+        # All agents share one pooled OpenAI client through the client provider
+        self.client_provider = client_provider or get_default_provider(openai_api_key)
+        # Identical temperature-0 requests are answered from the provider's response cache unless bypassed
+        self.use_response_cache = use_response_cache
+        # With structured verdicts, one JSON call returns the pass flag, per-criterion results and instructions
+        self.structured_verdicts = structured_verdicts
 
     def evaluate(self, initial_prompt):
+        # Synchronous wrapper: runs aevaluate on the client provider's event loop
+        return self.client_provider.run(self.aevaluate(initial_prompt))
+
+    @instrumented_agent
+    async def aevaluate(self, initial_prompt):
         # This method manages interactions between agents to achieve a solution.
-        client = OpenAI(api_key=self.openai_api_key)
         prompt_to_evaluate = initial_prompt
 
         for i in # TODO: 2 - Set loop to iterate up to the maximum number of interactions:
@@ -237,99 +543,201 @@ class EvaluationAgent:
 
             print(" Step 1: Worker agent generates a response to the prompt")
             print(f"Prompt:\n{prompt_to_evaluate}")
-            response_from_worker = # TODO: 3 - Obtain a response from the worker agent
+            response_from_worker = # TODO: 3 - Obtain a response from the worker agent (await agent_respond(self.worker_agent, prompt_to_evaluate))
             print(f"Worker Agent Response:\n{response_from_worker}")
 
             print(" Step 2: Evaluator agent judges the response")
-            eval_prompt = (
-                f"Does the following answer: {response_from_worker}\n"
-                f"Meet this criteria: "  # TODO: 4 - Insert evaluation criteria here
-                f"Respond Yes or No, and the reason why it does or doesn't meet the criteria."
-            )
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=# TODO: 5 - Define the message structure sent to the LLM for evaluation (use temperature=0)
-            )
-            evaluation = response.choices[0].message.content.strip()
+            verdict = await self.ajudge(response_from_worker)
+            evaluation = verdict["evaluation"]
             print(f"Evaluator Agent Evaluation:\n{evaluation}")
 
             print(" Step 3: Check if evaluation is positive")
-            if evaluation.lower().startswith("yes"):
+            if verdict["passed"]:
                 print("✅ Final solution accepted.")
                 break
             else:
                 print(" Step 4: Generate instructions to correct the response")
-                instruction_prompt = (
-                    f"Provide instructions to fix an answer based on these reasons why it is incorrect: {evaluation}"
-                )
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=# TODO: 6 - Define the message structure sent to the LLM to generate correction instructions (use temperature=0)
-                )
-                instructions = response.choices[0].message.content.strip()
+                instructions = await self.ainstructions_for(verdict)
                 print(f"Instructions to fix:\n{instructions}")
 
                 print(" Step 5: Send feedback to worker agent for refinement")
-                prompt_to_evaluate = (
-                    f"The original prompt was: {initial_prompt}\n"
-                    f"The response to that prompt was: {response_from_worker}\n"
-                    f"It has been evaluated as incorrect.\n"
-                    f"Make only these corrections, do not alter content validity: {instructions}"
-                )
+                prompt_to_evaluate = self.refine_prompt(initial_prompt, response_from_worker, instructions)
         return {
             # TODO: 7 - Return a dictionary containing the final response, evaluation, and number of iterations
         }   
+
+    async def ajudge(self, response_from_worker):
+        # Returns a verdict dict: passed, score, criteria, instructions and evaluation text
+        if self.structured_verdicts:
+            messages = verdict_messages(self.persona, self.evaluation_criteria, response_from_worker)
+            return await request_verdict(self.client_provider, "gpt-3.5-turbo", messages, cache=self.use_response_cache)
+        evaluation = await self.ajudge_response(response_from_worker)
+        passed = self.is_accepted(evaluation)
+        return {"passed": passed, "score": 1.0 if passed else 0.0, "criteria": [],
+                "instructions": "", "evaluation": evaluation}
+
+    async def ainstructions_for(self, verdict):
+        # Structured verdicts already carry instructions, which saves a round-trip per failed iteration
+        if verdict["instructions"]:
+            return verdict["instructions"]
+        return await self.acorrection_instructions(verdict["evaluation"])
+
+    async def ajudge_response(self, response_from_worker):
+        # Asks the evaluator LLM whether a worker response meets the evaluation criteria
+        eval_prompt = (
+            f"Does the following answer: {response_from_worker}\n"
+            f"Meet this criteria: "  # TODO: 4 - Insert evaluation criteria here
+            f"Respond Yes or No, and the reason why it does or doesn't meet the criteria."
+        )
+        response = await self.client_provider.achat(
+            model="gpt-3.5-turbo",
+            cache=self.use_response_cache,
+            messages=# TODO: 5 - Define the message structure sent to the LLM for evaluation (use temperature=0)
+        )
+        return response.choices[0].message.content.strip()
+
+    def is_accepted(self, evaluation):
+        return evaluation.lower().startswith("yes")
+
+    async def acorrection_instructions(self, evaluation):
+        # Turns the reasons a response was rejected into instructions for the worker agent
+        instruction_prompt = (
+            f"Provide instructions to fix an answer based on these reasons why it is incorrect: {evaluation}"
+        )
+        response = await self.client_provider.achat(
+            model="gpt-3.5-turbo",
+            cache=self.use_response_cache,
+            messages=# TODO: 6 - Define the message structure sent to the LLM to generate correction instructions (use temperature=0)
+        )
+        return response.choices[0].message.content.strip()
+
+    def refine_prompt(self, initial_prompt, response_from_worker, instructions):
+        return (
+            f"The original prompt was: {initial_prompt}\n"
+            f"The response to that prompt was: {response_from_worker}\n"
+            f"It has been evaluated as incorrect.\n"
+            f"Make only these corrections, do not alter content validity: {instructions}"
+        )
+
+    def evaluate_parallel(self, initial_prompt, candidates=3):
+        # Synchronous wrapper: runs aevaluate_parallel on the client provider's event loop
+        return self.client_provider.run(self.aevaluate_parallel(initial_prompt, candidates))
+
+    @instrumented_agent
+    async def aevaluate_parallel(self, initial_prompt, candidates=3):
+        # Generates several worker candidates per round and judges them concurrently. The first
+        # candidate that passes is accepted; otherwise only the best rejected candidate's feedback
+        # goes into the next round. The result also reports rounds, calls and latency per stage.
+        return await run_parallel_evaluation(
+            initial_prompt,
+            lambda prompt: agent_respond(self.worker_agent, prompt),
+            self.ajudge,
+            self.ainstructions_for,
+            self.refine_prompt,
+            candidates=candidates,
+            max_rounds=self.max_interactions
+        )
 '''
 
 '''
 class RoutingAgent():
 
-    def __init__(self, openai_api_key, agents):
+    def __init__(self, openai_api_key, agents, embedding_cache=None, client_provider=None):
         # Initialize the agent with given attributes
         self.openai_api_key = openai_api_key
+        # All agents share one pooled OpenAI client through the client provider
+        self.client_provider = client_provider or get_default_provider(openai_api_key)
+        # Agent descriptions and prompts are embedded once and then served from this cache
+        self.embedding_cache = embedding_cache if embedding_cache is not None else get_default_cache()
+        # Agent descriptions are embedded when agents are assigned, not on every routed prompt
+        self.route_index = RouteIndex(self.get_embedding)
         # TODO: 1 - Define an attribute to hold the agents, call it agents
 
+    @property
+    def agents(self):
+        return self.route_index.routes
+
+    @agents.setter
+    def agents(self, agents):
+        self.route_index.set_routes(agents)
+
+    def add_agent(self, agent):
+        # Only the new agent's description is embedded
+        self.route_index.add(agent)
+
+    def remove_agent(self, name):
+        return self.route_index.remove(name)
+
     def get_embedding(self, text):
-        client = OpenAI(api_key=self.openai_api_key)
+        # Synchronous wrapper, used by the route index when agents are assigned
+        return self.client_provider.run(self.aget_embedding(text))
+
+    @instrumented_agent
+    async def aget_embedding(self, text):
+        start = time.perf_counter()
+        embedding = self.embedding_cache.get("text-embedding-3-large", text)
+        if embedding is not None:
+            # Cached embeddings are reported as cache hits, like cached chat completions
+            self.client_provider.instrumentation.record("embeddings", "text-embedding-3-large",
+                                                        time.perf_counter() - start, cache_hit=True)
+            return embedding
+
         # TODO: 2 - Write code to calculate the embedding of the text using the text-embedding-3-large model
+        # by awaiting self.client_provider.aembeddings
         # Extract and return the embedding vector from the response
         embedding = response.data[0].embedding
+        self.embedding_cache.put("text-embedding-3-large", text, embedding)
         return embedding 
 
-    # TODO: 3 - Define a method to route user prompts to the appropriate agent
-        # TODO: 4 - Compute the embedding of the user input prompt
+    def route_scores(self, user_input):
+        # Full ranked list of (agent name, similarity score), useful to diagnose routing decisions
+        return [(agent["name"], score) for agent, score in self.route_index.rank(self.get_embedding(user_input))]
+
+    def route(self, user_input):
+        # Synchronous wrapper: runs aroute on the client provider's event loop
+        return self.client_provider.run(self.aroute(user_input))
+
+    # TODO: 3 - Define an async method named aroute to route user prompts to the appropriate agent
+        # TODO: 4 - Compute the embedding of the user input prompt (await self.aget_embedding)
         input_emb = 
         best_agent = None
         best_score = -1
 
-        for agent in self.agents:
-            # TODO: 5 - Compute the embedding of the agent description
-            if agent_emb is None:
-                continue
-
-            similarity = np.dot(input_emb, agent_emb) / (np.linalg.norm(input_emb) * np.linalg.norm(agent_emb))
-            print(similarity)
+        # TODO: 5 - Score the prompt against all agent descriptions at once with self.route_index.rank(input_emb)
+        ranked = 
+        for agent, similarity in ranked:
+            print(f"{agent['name']}: {similarity:.3f}")
 
-            # TODO: 6 - Add logic to select the best agent based on the similarity score between the user prompt and the agent descriptions
+        # TODO: 6 - Add logic to select the best agent based on the similarity score between the user prompt and the agent descriptions
 
         if best_agent is None:
             return "Sorry, no suitable agent could be selected."
 
         print(f"[Router] Best agent: {best_agent['name']} (score={best_score:.3f})")
-        return best_agent["func"](user_input)
+        # The agent's function may be sync or async; call_function runs it without blocking the event loop
+        return await call_function(best_agent["func"], user_input)
 
 '''
 
 '''
 class ActionPlanningAgent:
 
-    def __init__(self, openai_api_key, knowledge):
+    def __init__(self, openai_api_key, knowledge, client_provider=None, use_response_cache=True):
         # TODO: 1 - Initialize the agent attributes here
+        # All agents share one pooled OpenAI client through the client provider
+        self.client_provider = client_provider or get_default_provider(openai_api_key)
+        # Identical temperature-0 requests are answered from the provider's response cache unless bypassed
+        self.use_response_cache = use_response_cache
 
     def extract_steps_from_prompt(self, prompt):
+        # Synchronous wrapper: runs aextract_steps_from_prompt on the client provider's event loop
+        return self.client_provider.run(self.aextract_steps_from_prompt(prompt))
+
+    @instrumented_agent
+    async def aextract_steps_from_prompt(self, prompt):
 
-        # TODO: 2 - Instantiate the OpenAI client using the provided API key
-        # TODO: 3 - Call the OpenAI API to get a response from the "gpt-3.5-turbo" model.
+        # TODO: 2 - Use the shared client provider (self.client_provider) instead of creating a new OpenAI client
+        # TODO: 3 - Await self.client_provider.achat to get a response from the "gpt-3.5-turbo" model, passing cache=self.use_response_cache.
         # Provide the following system prompt along with the user's prompt:
         # "You are an action planning agent. Using your knowledge, you extract from the user prompt the steps requested to complete the action the user is asking for. You return the steps as a list. Only return the steps in your knowledge. Forget any previous context. This is your knowledge: {pass the knowledge here}"
 
@@ -0,0 +1,151 @@
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def incomplete_errors(result):
+    """
+    Describes the errors a result reports about itself, such as the branches of a FanOut that
+    failed or timed out.
+
+    Parameters:
+    result (object): A result returned by a BatchRunner's process function.
+
+    Returns:
+    str: The reported errors, or an empty string if the result is complete.
+    """
+    errors = result.get("errors") if isinstance(result, dict) else None
+    if not errors:
+        return ""
+    if isinstance(errors, dict):
+        return "; ".join(f"{name}: {error}" for name, error in errors.items())
+    if isinstance(errors, (list, tuple)):
+        return "; ".join(str(error) for error in errors)
+    return str(errors)
+
+
+class BatchRunner:
+    """
+    Processes a stream of items, e.g. documents for an agent workflow, with a bounded number of
+    items in flight, and appends one JSON line per finished item to an output file.
+
+    The output file doubles as the checkpoint: items whose id is already recorded there as
+    completed are skipped, so an interrupted batch resumes where it stopped. Items are read from
+    the stream only as capacity frees up, so arbitrarily long streams use bounded memory.
+    """
+
+    def __init__(self, process, output_path, max_concurrency=8, retry_failed=True):
+        """
+        Initializes the runner.
+
+        Parameters:
+        process (callable): Takes an item's payload and returns its JSON-serializable result. A
+            result dictionary with non-empty "errors" (e.g. the failed branches of a FanOut) counts
+            as a failed item.
+        output_path (str): JSONL file the records are appended to.
+        max_concurrency (int): Maximum number of items processed at once. Defaults to 8.
+        retry_failed (bool): Whether items recorded with an error are processed again on the
+            next run. Defaults to True.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.process = process
+        self.output_path = output_path
+        self.max_concurrency = max_concurrency
+        self.retry_failed = retry_failed
+
+    def completed_ids(self):
+        """
+        Reads the ids of the items already recorded in the output file.
+
+        Returns:
+        set: Ids of completed items (and of failed items too if retry_failed is False).
+        """
+        done = set()
+        if not os.path.exists(self.output_path):
+            return done
+        with open(self.output_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                if "error" not in record or not self.retry_failed:
+                    done.add(record["id"])
+        return done
+
+    def run(self, items, on_record=None):
+        """
+        Processes every item not completed yet.
+
+        Parameters:
+        items (iterable): (item id, payload) pairs. Ids must be JSON-serializable and unique.
+        on_record (callable): Called with each record once it is written, e.g. to show progress.
+
+        Returns:
+        dict: Numbers of items processed, failed and skipped (already completed), and the
+        seconds the run took.
+        """
+        done_ids = self.completed_ids()
+        stats = {"processed": 0, "failed": 0, "skipped": 0}
+        start = time.perf_counter()
+        self._end_partial_line()
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        pending = set()
+        try:
+            with open(self.output_path, 'a', encoding='utf-8') as out:
+                for item_id, payload in items:
+                    if item_id in done_ids:
+                        stats["skipped"] += 1
+                        continue
+                    done_ids.add(item_id)
+                    while len(pending) >= self.max_concurrency:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        self._write(out, finished, stats, on_record)
+                    context = contextvars.copy_context()
+                    pending.add(executor.submit(context.run, self._process_item, item_id, payload))
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._write(out, finished, stats, on_record)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def _process_item(self, item_id, payload):
+        """Processes one item and returns its record."""
+        start = time.perf_counter()
+        try:
+            record = {"id": item_id, "result": self.process(payload)}
+        except Exception as error:
+            record = {"id": item_id, "error": f"{type(error).__name__}: {error}"}
+        else:
+            errors = incomplete_errors(record["result"])
+            if errors:
+                # A partial result (e.g. a fan-out whose branches failed) is kept but recorded as
+                # failed, so it is retried instead of being checkpointed as complete
+                record["error"] = f"Incomplete result: {errors}"
+        record["seconds"] = time.perf_counter() - start
+        return record
+
+    def _write(self, out, futures, stats, on_record):
+        """Appends the records of finished items, flushing so a crash loses no completed item."""
+        for future in futures:
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            stats["failed" if "error" in record else "processed"] += 1
+            if on_record is not None:
+                on_record(record)
+
+    def _end_partial_line(self):
+        """Terminates a last line cut short by an interrupted run, so new records start on their own line."""
+        if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) == 0:
+            return
+        with open(self.output_path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
@@ -0,0 +1,85 @@
+def iter_text(source, read_size=1 << 16):
+    """
+    Yields the text of a source piece by piece.
+
+    Parameters:
+    source (str, file or iterable): A string, an open text file (anything with a read method)
+        or an iterable of strings such as a generator of lines.
+    read_size (int): Number of characters read from a file at a time.
+
+    Yields:
+    str: Consecutive pieces of the text.
+    """
+    if isinstance(source, str):
+        yield source
+    elif hasattr(source, "read"):
+        while True:
+            piece = source.read(read_size)
+            if not piece:
+                break
+            yield piece
+    else:
+        for piece in source:
+            yield piece
+
+
+def iter_chunks(source, chunk_size=2000, chunk_overlap=100, separator="\n", read_size=1 << 16):
+    """
+    Splits a text into overlapping chunks as it is read, preferring to break after a separator.
+
+    Only the unconsumed tail of the text is buffered, so memory stays bounded by chunk_size and
+    read_size no matter how large the source is. Each chunk's text is exactly
+    text[start_char:end_char] of the original text.
+
+    Parameters:
+    source (str, file or iterable): Text to split, see iter_text.
+    chunk_size (int): Maximum number of characters in a chunk. Defaults to 2000.
+    chunk_overlap (int): Characters shared by consecutive chunks. Defaults to 100.
+    separator (str): Preferred break point. Defaults to a newline.
+    read_size (int): Number of characters read from a file at a time.
+
+    Yields:
+    dict: Chunk with chunk_id, text, chunk_size, start_char and end_char.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size}).")
+
+    pieces = iter_text(source, read_size)
+    buffer, buffer_start, start, chunk_id = "", 0, 0, 0
+    exhausted = False
+
+    while True:
+        while not exhausted and len(buffer) - (start - buffer_start) < chunk_size:
+            piece = next(pieces, None)
+            if piece is None:
+                exhausted = True
+            else:
+                # The consumed text is dropped once per read rather than once per chunk, so a
+                # large source given as one string is not copied again for every chunk
+                buffer = buffer[start - buffer_start:] + piece
+                buffer_start = start
+
+        window = buffer[start - buffer_start:start - buffer_start + chunk_size]
+        if not window:
+            return
+
+        end = start + len(window)
+        at_end = exhausted and end == buffer_start + len(buffer)
+        if not at_end:
+            cut = window.rfind(separator)
+            if cut != -1 and cut + len(separator) > chunk_overlap:
+                end = start + cut + len(separator)
+                window = window[:cut + len(separator)]
+
+        yield {
+            "chunk_id": chunk_id,
+            "text": window,
+            "chunk_size": end - start,
+            "start_char": start,
+            "end_char": end
+        }
+        if at_end:
+            return
+
+        start = end - chunk_overlap
+        chunk_id += 1
@@ -0,0 +1,374 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from .instrumentation import bind_tags, current_tags, get_instrumentation
+from .response_cache import get_default_response_cache, is_cacheable
+from .streaming import StreamAssembler, current_delta_sink, stream_params
+
+DEFAULT_BASE_URL = "https://openai.vocareum.com/v1"
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+# HTTP attempts made for the current call, counted by an httpx event hook to report retries
+_attempts = contextvars.ContextVar("workflow_agents_attempts", default=None)
+
+# Sampling parameters that override the callers' for the chat completions made in the current context
+_sampling = contextvars.ContextVar("workflow_agents_sampling", default={})
+
+
+@contextmanager
+def sampling(**params):
+    """
+    Context manager that sets sampling parameters, such as temperature and seed, for every chat
+    completion a provider makes inside it, overriding the values the caller passes. This varies
+    the answers of agents that always ask at temperature 0 without changing their prompts. Requests
+    made at a non-zero temperature bypass the response cache, so each one gets a fresh answer.
+
+    Parameters:
+    **params: Chat completion parameters, e.g. temperature=0.7, seed=1.
+    """
+    token = _sampling.set({**_sampling.get(), **params})
+    try:
+        yield
+    finally:
+        _sampling.reset(token)
+
+
+class ClientProvider:
+    """
+    Owns a single OpenAI client with a pooled HTTP connection, shared by every agent that uses
+    the provider, so repeated calls reuse warm keep-alive and TLS connections.
+
+    Requests are made by an AsyncOpenAI client running on an event loop owned by the provider,
+    in a background thread. The async methods (achat, aembeddings) can be awaited from any event
+    loop, and the sync methods (chat, embeddings) block the calling thread on the same loop, so
+    sync and async callers share one connection pool and one set of per-model concurrency limits.
+
+    When the provider has a response cache, repeated chat completion requests made at temperature
+    0 are answered from it.
+    Inside workflow_agents.streaming.stream_deltas, chat completions are streamed and their text
+    is passed on as it arrives, while callers still receive the complete response.
+    Every call is reported to the provider's instrumentation, tagged with the caller's tags.
+    """
+
+    def __init__(self, api_key=None, base_url=None, timeout=60.0, max_connections=20, max_retries=2,
+                 model_concurrency=None, default_concurrency=None, response_cache=None, instrumentation=None):
+        """
+        Initializes the provider. The client itself is created on first use.
+
+        Parameters:
+        api_key (str): OpenAI API key. Defaults to the OPENAI_API_KEY environment variable.
+        base_url (str): API base URL. Defaults to the OPENAI_BASE_URL environment variable, then
+            to the Vocareum endpoint.
+        timeout (float): Request timeout in seconds. Defaults to 60.
+        max_connections (int): Size of the HTTP connection pool. Defaults to 20.
+        max_retries (int): Retries the OpenAI client makes on transient errors. Defaults to 2.
+        model_concurrency (dict): Maximum requests in flight per model name, e.g. {"gpt-4": 4}.
+        default_concurrency (int): Limit for models not listed in model_concurrency. None means no limit.
+        response_cache (ResponseCache): Cache of chat completions. None disables response caching.
+        instrumentation (Instrumentation): Receives a record of every call. Defaults to the
+            process-wide instrumentation.
+        """
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.model_concurrency = dict(model_concurrency or {})
+        self.default_concurrency = default_concurrency
+        self.response_cache = response_cache
+        self.instrumentation = instrumentation or get_instrumentation()
+        self._client = None
+        self._async_client = None
+        self._loop = None
+        self._loop_thread = None
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAI: A synchronous client sharing the provider's settings, for API features the provider does not wrap."""
+        with self._lock:
+            if self._client is None:
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_connections)
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=httpx.Client(limits=limits, timeout=self.timeout)
+                )
+            return self._client
+
+    def concurrency_limit(self, model):
+        """
+        Returns the maximum number of requests in flight for a model.
+
+        Parameters:
+        model (str): Model name.
+
+        Returns:
+        int: The limit, or None if the model is not limited.
+        """
+        return self.model_concurrency.get(model, self.default_concurrency)
+
+    @property
+    def loop(self):
+        """asyncio.AbstractEventLoop: The provider's event loop, started on first access."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name="client-provider-loop", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the provider's event loop and waits for its result. This is how the
+        synchronous agent methods wrap their async counterparts.
+
+        Parameters:
+        coroutine (coroutine): The coroutine to run.
+
+        Returns:
+        object: The coroutine's result.
+        """
+        if threading.current_thread() is self._loop_thread:
+            coroutine.close()
+            raise RuntimeError("Synchronous provider calls cannot be made from the provider's event loop; "
+                               "await the async variant instead.")
+        return asyncio.run_coroutine_threadsafe(bind_tags(coroutine, current_tags()), self.loop).result()
+
+    async def submit(self, coroutine):
+        """
+        Awaits a coroutine on the provider's event loop from any event loop.
+
+        Parameters:
+        coroutine (coroutine): The coroutine to run.
+
+        Returns:
+        object: The coroutine's result.
+        """
+        loop = self.loop
+        if asyncio.get_running_loop() is loop:
+            return await coroutine
+        future = asyncio.run_coroutine_threadsafe(bind_tags(coroutine, current_tags()), loop)
+        return await asyncio.wrap_future(future)
+
+    def chat(self, model, messages, cache=True, **params):
+        """
+        Creates a chat completion through the shared client.
+
+        Parameters:
+        model (str): Model name.
+        messages (list): Chat messages.
+        cache (bool): Whether the response cache may answer or store this request, if it is made
+            at temperature 0. Defaults to True.
+        **params: Further chat completion parameters, such as temperature.
+
+        Returns:
+        ChatCompletion: The API response.
+        """
+        return self.run(self._chat(model, messages, cache, **{**params, **_sampling.get()}))
+
+    async def achat(self, model, messages, cache=True, **params):
+        """
+        Async variant of chat.
+
+        Parameters:
+        model (str): Model name.
+        messages (list): Chat messages.
+        cache (bool): Whether the response cache may answer or store this request, if it is made
+            at temperature 0. Defaults to True.
+        **params: Further chat completion parameters, such as temperature.
+
+        Returns:
+        ChatCompletion: The API response.
+        """
+        return await self.submit(self._chat(model, messages, cache, **{**params, **_sampling.get()}))
+
+    def embeddings(self, model, input, max_retries=None, **params):
+        """
+        Creates embeddings through the shared client.
+
+        Parameters:
+        model (str): Embedding model name.
+        input (str or list): Text or texts to embed.
+        max_retries (int): Retries of this request on transient errors, e.g. 0 when the caller
+            retries on its own. None uses the provider's max_retries.
+        **params: Further embeddings parameters.
+
+        Returns:
+        CreateEmbeddingResponse: The API response.
+        """
+        return self.run(self._embeddings(model, input, max_retries, **params))
+
+    async def aembeddings(self, model, input, max_retries=None, **params):
+        """
+        Async variant of embeddings.
+
+        Parameters:
+        model (str): Embedding model name.
+        input (str or list): Text or texts to embed.
+        max_retries (int): Retries of this request on transient errors. None uses the provider's
+            max_retries.
+        **params: Further embeddings parameters.
+
+        Returns:
+        CreateEmbeddingResponse: The API response.
+        """
+        return await self.submit(self._embeddings(model, input, max_retries, **params))
+
+    def close(self):
+        """Closes the pooled connections and stops the provider's event loop."""
+        with self._lock:
+            client, self._client = self._client, None
+            loop, self._loop = self._loop, None
+            thread, self._loop_thread = self._loop_thread, None
+        if client is not None:
+            client.close()
+        if loop is not None:
+            if self._async_client is not None:
+                asyncio.run_coroutine_threadsafe(self._async_client.close(), loop).result()
+                self._async_client = None
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            self._semaphores = {}
+
+    async def _chat(self, model, messages, cache, **params):
+        """Makes a chat completion request unless it is cached; runs on the provider's event loop."""
+        start = time.perf_counter()
+        on_delta = current_delta_sink() if not params.get("stream") else None
+        response_cache = self.response_cache if cache and is_cacheable(params) else None
+        if response_cache is not None:
+            key = response_cache.key(model, messages, params)
+            response = response_cache.get(key)
+            if response is not None:
+                self.instrumentation.record("chat", model, time.perf_counter() - start, response, cache_hit=True)
+                if on_delta is not None and response.choices and response.choices[0].message.content:
+                    on_delta(response.choices[0].message.content)
+                return response
+        async with self._model_slot(model):
+            if on_delta is None:
+                response = await self._measured("chat", model, self._get_async_client().chat.completions.create(
+                    model=model, messages=messages, **params))
+            else:
+                assembler = StreamAssembler(on_delta)
+                response = await self._measured("chat", model, self._streamed(
+                    assembler, model=model, messages=messages, **stream_params(params)), assembler)
+        if response_cache is not None:
+            response_cache.put(key, model, response)
+        return response
+
+    async def _streamed(self, assembler, **request):
+        """Makes a streamed chat completion request and returns the assembled response."""
+        stream = await self._get_async_client().chat.completions.create(**request)
+        async with stream:
+            async for chunk in stream:
+                assembler.add(chunk)
+        return assembler.completion()
+
+    async def _embeddings(self, model, input, max_retries, **params):
+        """Makes an embeddings request; runs on the provider's event loop."""
+        params.setdefault("encoding_format", "float")
+        client = self._get_async_client()
+        if max_retries is not None:
+            # The copy shares the client's connection pool
+            client = client.with_options(max_retries=max_retries)
+        async with self._model_slot(model):
+            return await self._measured("embeddings", model, client.embeddings.create(
+                model=model, input=input, **params))
+
+    async def _measured(self, kind, model, request, assembler=None):
+        """Awaits a request and reports its latency, token usage, retries or error, and the time
+        to first token of a streamed request assembled by assembler."""
+        attempts = [0]
+        token = _attempts.set(attempts)
+        start = time.perf_counter()
+        try:
+            response = await request
+        except Exception as error:
+            self.instrumentation.record(kind, model, time.perf_counter() - start,
+                                        retries=max(attempts[0] - 1, 0), error=error,
+                                        time_to_first_token=getattr(assembler, "time_to_first_token", None))
+            raise
+        finally:
+            _attempts.reset(token)
+        self.instrumentation.record(kind, model, time.perf_counter() - start, response,
+                                    retries=max(attempts[0] - 1, 0),
+                                    time_to_first_token=getattr(assembler, "time_to_first_token", None))
+        return response
+
+    def _get_async_client(self):
+        """Returns the AsyncOpenAI client, creating it on the provider's event loop."""
+        if self._async_client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+                http_client=httpx.AsyncClient(limits=limits, timeout=self.timeout,
+                                              event_hooks={"request": [_count_attempt]})
+            )
+        return self._async_client
+
+    @asynccontextmanager
+    async def _model_slot(self, model):
+        """Waits for one of the model's concurrency slots; runs on the provider's event loop."""
+        limit = self.concurrency_limit(model)
+        if limit is None:
+            yield
+            return
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(limit)
+        async with self._semaphores[model]:
+            yield
+
+
+def get_default_provider(api_key=None):
+    """
+    Returns the process-wide provider for an API key, creating it on first use. Agents created
+    with the same key share one provider and therefore one connection pool. The provider uses
+    the default response cache, which is off unless WORKFLOW_AGENTS_RESPONSE_CACHE is set.
+
+    Parameters:
+    api_key (str): OpenAI API key. Defaults to the OPENAI_API_KEY environment variable.
+
+    Returns:
+    ClientProvider: The shared provider.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    with _providers_lock:
+        if api_key not in _providers:
+            _providers[api_key] = ClientProvider(api_key=api_key, response_cache=get_default_response_cache())
+        return _providers[api_key]
+
+
+def set_default_provider(provider):
+    """
+    Makes a configured provider the process-wide provider for its API key, e.g. to change the
+    base URL, timeouts or concurrency limits used by every agent.
+
+    Parameters:
+    provider (ClientProvider): The provider to share.
+    """
+    with _providers_lock:
+        _providers[provider.api_key] = provider
+
+
+async def _count_attempt(request):
+    """httpx request hook counting the HTTP attempts of the current call."""
+    attempts = _attempts.get()
+    if attempts is not None:
+        attempts[0] += 1
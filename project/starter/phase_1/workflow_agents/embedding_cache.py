@@ -0,0 +1,259 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from .instrumentation import get_instrumentation
+
+DEFAULT_CACHE_DIR = os.getenv("WORKFLOW_AGENTS_CACHE_DIR", ".workflow_agents_cache")
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+class EmbeddingCache:
+    """
+    A content-addressed cache of embedding vectors, keyed by embedding model and a hash of the text.
+
+    Lookups go to an in-memory LRU tier first and then to an optional SQLite file on disk, so
+    embeddings survive across runs. Both tiers store vectors as float32 (about 12 KB for a
+    3072-dimension embedding); the methods still take and return plain lists.
+    """
+
+    def __init__(self, path=None, max_memory_items=10000):
+        """
+        Initializes the cache.
+
+        Parameters:
+        path (str): SQLite file for the persistent tier. If None, only the memory tier is used.
+        max_memory_items (int): Number of vectors kept in memory. Defaults to 10000.
+        """
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(model, text):
+        """
+        Computes the cache key of a text embedded with a model.
+
+        Parameters:
+        model (str): Embedding model name.
+        text (str): Embedded text.
+
+        Returns:
+        str: Hex SHA-256 digest of the model name and text.
+        """
+        return hashlib.sha256(f"{model}\n{text}".encode('utf-8')).hexdigest()
+
+    def get(self, model, text):
+        """
+        Looks up the embedding of a text.
+
+        Parameters:
+        model (str): Embedding model name.
+        text (str): Embedded text.
+
+        Returns:
+        list: The embedding vector, or None on a miss.
+        """
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model, texts):
+        """
+        Looks up the embeddings of several texts.
+
+        Parameters:
+        model (str): Embedding model name.
+        texts (list): Embedded texts.
+
+        Returns:
+        list: One embedding vector per text, with None for each miss.
+        """
+        keys = [self.key(model, text) for text in texts]
+        results = [None] * len(keys)
+        with self._lock:
+            missing = []
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    results[i] = self._memory[key].tolist()
+                    self.memory_hits += 1
+                else:
+                    missing.append(i)
+
+            if missing and self._db is not None:
+                for i in missing:
+                    row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (keys[i],)).fetchone()
+                    if row is not None:
+                        vector = np.frombuffer(row[0], dtype=np.float32)
+                        self._remember(keys[i], vector)
+                        results[i] = vector.tolist()
+                        self.disk_hits += 1
+
+            self.misses += sum(1 for i in missing if results[i] is None)
+        return results
+
+    def put(self, model, text, embedding):
+        """
+        Stores the embedding of a text.
+
+        Parameters:
+        model (str): Embedding model name.
+        text (str): Embedded text.
+        embedding (list): The embedding vector.
+        """
+        self.put_many(model, [text], [embedding])
+
+    def put_many(self, model, texts, embeddings):
+        """
+        Stores the embeddings of several texts in a single disk transaction.
+
+        Parameters:
+        model (str): Embedding model name.
+        texts (list): Embedded texts.
+        embeddings (list): One embedding vector per text.
+        """
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.key(model, text)
+                vector = np.array(embedding, dtype=np.float32)
+                vector.flags.writeable = False
+                self._remember(key, vector)
+                rows.append((key, model, vector.tobytes()))
+            if self._db is not None and rows:
+                self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                self._db.commit()
+
+    def get_or_compute(self, model, texts, compute, on_hit=None, store=True):
+        """
+        Returns the embeddings of several texts, computing only the misses, each distinct text once.
+
+        Parameters:
+        model (str): Embedding model name.
+        texts (list): Texts to embed.
+        compute (callable): Called with the list of distinct missing texts; returns their embeddings.
+        on_hit (callable): Called with the lookup time in seconds when the cache answers any text,
+            e.g. to report the hits to instrumentation.
+        store (bool): Whether the computed embeddings are stored. Pass False when compute stores
+            them itself. Defaults to True.
+
+        Returns:
+        list: One embedding vector per text.
+        """
+        texts = list(texts)
+        start = time.perf_counter()
+        results = self.get_many(model, texts)
+        missing = [i for i, embedding in enumerate(results) if embedding is None]
+        if on_hit is not None and len(missing) < len(texts):
+            on_hit(time.perf_counter() - start)
+        if missing:
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            computed = dict(zip(unique_texts, compute(unique_texts)))
+            if store:
+                self.put_many(model, unique_texts, [computed[text] for text in unique_texts])
+            for i in missing:
+                results[i] = computed[texts[i]]
+        return results
+
+    def stats(self):
+        """
+        Reports cache effectiveness since the cache was created.
+
+        Returns:
+        dict: Memory hits, disk hits, misses, total hits and the hit rate.
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hits": hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+    def clear(self):
+        """Removes every entry from both tiers and resets the statistics."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def _remember(self, key, embedding):
+        """Adds a float32 vector to the memory tier, evicting the least recently used one if full."""
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+
+def get_default_cache():
+    """
+    Returns the process-wide embedding cache shared by all agents. Its disk tier lives in
+    DEFAULT_CACHE_DIR, which can be set with the WORKFLOW_AGENTS_CACHE_DIR environment variable.
+
+    Returns:
+    EmbeddingCache: The shared cache.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache(os.path.join(DEFAULT_CACHE_DIR, "embeddings.sqlite"))
+        return _default_cache
+
+
+def cached_embeddings(client, model, texts, cache=None):
+    """
+    Embeds texts with any OpenAI client, requesting only the texts missing from the embedding
+    cache, and reports the request and the cache hits to the process-wide instrumentation. This
+    is how the lesson scripts share the agents' embedding cache.
+
+    Parameters:
+    client (OpenAI): The client making the request for the misses.
+    model (str): Embedding model name.
+    texts (list): Texts to embed.
+    cache (EmbeddingCache): Cache to use. Defaults to get_default_cache().
+
+    Returns:
+    list: One embedding vector per text.
+    """
+    cache = cache if cache is not None else get_default_cache()
+    instrumentation = get_instrumentation()
+
+    def report_hit(seconds):
+        # The texts answered by the cache are reported as one cache hit, like a cached chat completion
+        instrumentation.record("embeddings", model, seconds, cache_hit=True)
+
+    def compute(missing):
+        start = time.perf_counter()
+        try:
+            response = client.embeddings.create(model=model, input=missing, encoding_format="float")
+        except Exception as error:
+            instrumentation.record("embeddings", model, time.perf_counter() - start, error=error)
+            raise
+        instrumentation.record("embeddings", model, time.perf_counter() - start, response)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    return cache.get_or_compute(model, texts, compute, on_hit=report_hit)
@@ -0,0 +1,133 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a text (about four characters per token for English).
+
+    Parameters:
+    text (str): Text to measure.
+
+    Returns:
+    int: Estimated token count.
+    """
+    return len(text) // 4 + 1
+
+
+class EmbeddingPipeline:
+    """
+    Embeds many texts by sending them to the embeddings API in batches, with a bounded number
+    of requests in flight and per-batch retries. With a cache, only texts that are not already
+    cached are sent.
+    """
+
+    def __init__(self, client_provider, model="text-embedding-3-large", max_tokens_per_request=50000,
+                 max_batch_size=2048, max_concurrency=4, max_retries=3, retry_backoff=1.0, cache=None):
+        """
+        Initializes the pipeline.
+
+        Parameters:
+        client_provider (ClientProvider): Provider whose shared client sends the embeddings requests.
+        model (str): Embedding model name. Defaults to text-embedding-3-large.
+        max_tokens_per_request (int): Estimated token budget of a single request. Defaults to 50000.
+        max_batch_size (int): Maximum number of texts in a single request. Defaults to 2048.
+        max_concurrency (int): Maximum number of requests in flight. Defaults to 4.
+        max_retries (int): Retries of a failed batch before giving up. Defaults to 3.
+        retry_backoff (float): Seconds to wait before the first retry, doubled on each retry.
+        cache (EmbeddingCache): Optional cache consulted before and filled after each request.
+        """
+        self.client_provider = client_provider
+        self.model = model
+        self.max_tokens_per_request = max_tokens_per_request
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.cache = cache
+
+    def make_batches(self, texts):
+        """
+        Groups consecutive texts into batches that respect the token budget and batch size.
+        A single text larger than the budget is sent on its own.
+
+        Parameters:
+        texts (list): Texts to embed.
+
+        Returns:
+        list: (start, end) index ranges into texts, one per batch.
+        """
+        batches, start, tokens = [], 0, 0
+        for i, text in enumerate(texts):
+            text_tokens = estimate_tokens(text)
+            batch_full = i - start >= self.max_batch_size or tokens + text_tokens > self.max_tokens_per_request
+            if i > start and batch_full:
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def embed_batch(self, texts):
+        """
+        Embeds one batch of texts, retrying with exponential backoff on failure. The retries are
+        the pipeline's alone: the request itself is made without the client's own retries.
+
+        Parameters:
+        texts (list): Texts sent in a single request.
+
+        Returns:
+        list: Embedding vectors in the same order as texts.
+        """
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client_provider.embeddings(model=self.model, input=texts, max_retries=0)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def embed(self, texts):
+        """
+        Embeds all texts. Batches are sent concurrently; a batch that fails is retried on its
+        own while the results of finished batches are kept.
+
+        Parameters:
+        texts (list): Texts to embed.
+
+        Returns:
+        list: Embedding vectors in the same order as texts.
+        """
+        texts = list(texts)
+        if self.cache is None:
+            return self._embed_all(texts)
+
+        def report_hit(seconds):
+            # The texts answered by the cache are reported as one cache hit, like a cached chat completion
+            self.client_provider.instrumentation.record("embeddings", self.model, seconds, cache_hit=True)
+
+        # _embed_all stores each batch as soon as it finishes
+        return self.cache.get_or_compute(self.model, texts, self._embed_all, on_hit=report_hit, store=False)
+
+    def _embed_all(self, texts):
+        """
+        Embeds texts through the API, batch by batch. Each finished batch is written to the
+        cache right away, so an interrupted run does not re-send it.
+        """
+        embeddings = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                executor.submit(contextvars.copy_context().run, self.embed_batch, texts[start:end]): (start, end)
+                for start, end in self.make_batches(texts)
+            }
+            for future in as_completed(futures):
+                start, end = futures[future]
+                embeddings[start:end] = future.result()
+                if self.cache is not None:
+                    self.cache.put_many(self.model, texts[start:end], embeddings[start:end])
+        return embeddings
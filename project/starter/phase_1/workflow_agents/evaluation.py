@@ -0,0 +1,324 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from openai import BadRequestError
+from .clients import sampling
+
+STAGES = ("worker", "evaluation", "instructions")
+
+# Temperature of the candidates after the first in run_parallel_evaluation
+CANDIDATE_TEMPERATURE = 0.8
+
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "passed": {"type": "boolean"},
+        "criteria": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "criterion": {"type": "string"},
+                    "passed": {"type": "boolean"},
+                    "reason": {"type": "string"},
+                },
+                "required": ["criterion", "passed", "reason"],
+                "additionalProperties": False,
+            },
+        },
+        "instructions": {"type": "string"},
+    },
+    "required": ["passed", "criteria", "instructions"],
+    "additionalProperties": False,
+}
+
+# Models that rejected json_schema output and are asked for plain JSON objects instead
+_json_object_models = set()
+_json_object_models_lock = threading.Lock()
+
+
+class EvaluationStats:
+    """
+    Counts the calls made in each stage of an evaluation and the time they took.
+
+    A call is counted when it starts, so calls cancelled after another candidate was accepted
+    are included in the count but not in the latency.
+    """
+
+    def __init__(self):
+        self.calls = {stage: 0 for stage in STAGES}
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.completed = {stage: 0 for stage in STAGES}
+        self.start = time.perf_counter()
+
+    async def measure(self, stage, coroutine):
+        """
+        Awaits a call and records it under a stage.
+
+        Parameters:
+        stage (str): One of STAGES.
+        coroutine (coroutine): The call.
+
+        Returns:
+        object: The call's result.
+        """
+        self.calls[stage] += 1
+        started = time.perf_counter()
+        result = await coroutine
+        self.seconds[stage] += time.perf_counter() - started
+        self.completed[stage] += 1
+        return result
+
+    def report(self):
+        """
+        Summarizes the calls and latency of every stage.
+
+        Returns:
+        dict: calls per stage and in total, latency per stage (total and mean seconds of the
+        completed calls) and the wall-clock seconds since the evaluation started.
+        """
+        latency = {}
+        for stage in STAGES:
+            done = self.completed[stage]
+            latency[stage] = {
+                "total_seconds": self.seconds[stage],
+                "mean_seconds": self.seconds[stage] / done if done else 0.0,
+            }
+        return {
+            "calls": dict(self.calls, total=sum(self.calls.values())),
+            "latency": latency,
+            "wall_seconds": time.perf_counter() - self.start,
+        }
+
+
+def candidate_sampling(index):
+    """
+    Default sampling parameters for the index-th of several concurrent candidates. The first
+    candidate keeps the agent's own settings; the others are sampled at CANDIDATE_TEMPERATURE
+    with their index as seed, so candidates differ while every one answers the same prompt.
+
+    Parameters:
+    index (int): Position of the candidate in the round.
+
+    Returns:
+    dict: Chat completion parameters for the candidate's requests.
+    """
+    if index == 0:
+        return {}
+    return {"temperature": CANDIDATE_TEMPERATURE, "seed": index}
+
+
+async def run_parallel_evaluation(initial_prompt, generate, judge, instruct, refine, candidates=3,
+                                  max_rounds=10, sampling_for_candidate=candidate_sampling):
+    """
+    Runs evaluation rounds in which several worker candidates are generated and judged
+    concurrently.
+
+    A round ends as soon as one candidate passes, and the remaining candidates are cancelled.
+    If none passes, correction instructions are requested only for the best rejected candidate
+    (highest verdict score, earliest finished on ties), and the next round refines that candidate.
+
+    Parameters:
+    initial_prompt (str): The original prompt.
+    generate (callable): Async function returning the worker's response to a prompt.
+    judge (callable): Async function returning the verdict on a response, a dict with at least
+        passed (bool), score (float) and evaluation (str).
+    instruct (callable): Async function returning correction instructions for a verdict.
+    refine (callable): Builds the next round's prompt from the initial prompt, the rejected
+        response and the instructions.
+    candidates (int): Candidates generated per round. Defaults to 3.
+    max_rounds (int): Maximum number of rounds. Defaults to 10.
+    sampling_for_candidate (callable): Returns the sampling parameters of a candidate's worker
+        requests from its index, applied with workflow_agents.clients.sampling. Defaults to
+        candidate_sampling; None leaves the worker's settings unchanged.
+
+    Returns:
+    dict: final_response, evaluation, accepted, iterations (rounds run), rounds (per-round
+    details), calls, latency per stage and wall_seconds.
+    """
+    if candidates < 1:
+        raise ValueError("candidates must be at least 1.")
+    stats = EvaluationStats()
+    prompt = initial_prompt
+    best = None
+    rounds = []
+
+    async def attempt(index, round_prompt):
+        params = sampling_for_candidate(index) if sampling_for_candidate is not None else {}
+        with sampling(**params):
+            response = await stats.measure("worker", generate(round_prompt))
+        verdict = await stats.measure("evaluation", judge(response))
+        return index, response, verdict
+
+    for round_number in range(1, max_rounds + 1):
+        round_start = time.perf_counter()
+        tasks = [asyncio.ensure_future(attempt(i, prompt)) for i in range(candidates)]
+        accepted, rejected = None, []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, response, verdict = await next_done
+                if verdict["passed"]:
+                    accepted = (index, response, verdict)
+                    break
+                rejected.append((index, response, verdict))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if accepted is not None:
+            best = accepted
+        else:
+            best = max(rejected, key=lambda r: r[2].get("score", 0.0))
+        rounds.append({
+            "round": round_number,
+            "accepted": accepted is not None,
+            "candidate": best[0],
+            "candidates_judged": len(rejected) + (accepted is not None),
+            "seconds": time.perf_counter() - round_start,
+        })
+        if accepted is not None or round_number == max_rounds:
+            break
+
+        instructions = await stats.measure("instructions", instruct(best[2]))
+        prompt = refine(initial_prompt, best[1], instructions)
+
+    result = {
+        "final_response": best[1],
+        "evaluation": best[2]["evaluation"],
+        "accepted": best[2]["passed"],
+        "iterations": len(rounds),
+        "rounds": rounds,
+    }
+    result.update(stats.report())
+    return result
+
+
+def verdict_messages(persona, evaluation_criteria, response):
+    """
+    Builds the messages asking for a structured verdict on a worker response in a single call.
+
+    Parameters:
+    persona (str): Persona of the evaluation agent.
+    evaluation_criteria (str): Criteria the response must meet.
+    response (str): The worker response to judge.
+
+    Returns:
+    list: Chat messages.
+    """
+    return [
+        {"role": "system", "content": (
+            f"{persona}\n"
+            "Judge whether an answer meets every evaluation criterion. Reply with a JSON object with "
+            "the keys: passed (true only if every criterion is met), criteria (a list with one object "
+            "per criterion, with the keys criterion, passed and reason) and instructions (concise "
+            "instructions to fix the answer, or an empty string if it passed)."
+        )},
+        {"role": "user", "content": f"Evaluation criteria: {evaluation_criteria}\n\nAnswer: {response}"},
+    ]
+
+
+def parse_verdict(text):
+    """
+    Parses an evaluator reply into a verdict, tolerating code fences, surrounding prose, string
+    booleans and plain "Yes"/"No" replies.
+
+    Parameters:
+    text (str): The evaluator's reply.
+
+    Returns:
+    dict: passed (bool), score (fraction of criteria met), criteria (list), instructions (str)
+    and evaluation (a readable summary of the verdict).
+    """
+    data = _load_json_object(text)
+    if data is None:
+        passed = text.strip().lower().startswith("yes")
+        return {"passed": passed, "score": 1.0 if passed else 0.0, "criteria": [],
+                "instructions": "", "evaluation": text.strip()}
+
+    criteria = []
+    for item in data.get("criteria") or []:
+        if isinstance(item, dict):
+            criteria.append({"criterion": str(item.get("criterion", "")),
+                             "passed": _as_bool(item.get("passed")),
+                             "reason": str(item.get("reason", ""))})
+    if "passed" in data:
+        passed = _as_bool(data["passed"])
+    else:
+        passed = bool(criteria) and all(c["passed"] for c in criteria)
+    if criteria:
+        score = sum(c["passed"] for c in criteria) / len(criteria)
+    else:
+        score = 1.0 if passed else 0.0
+
+    lines = ["Yes" if passed else "No"]
+    lines += [f"- {c['criterion']}: {'met' if c['passed'] else 'not met'}. {c['reason']}".rstrip() for c in criteria]
+    return {"passed": passed, "score": score, "criteria": criteria,
+            "instructions": str(data.get("instructions") or ""), "evaluation": "\n".join(lines)}
+
+
+async def request_verdict(client_provider, model, messages, cache=True):
+    """
+    Asks for a structured verdict with JSON-schema output. Models that reject the json_schema
+    response format are asked for a JSON object instead, and the reply is parsed with
+    parse_verdict. Other request errors are raised.
+
+    Parameters:
+    client_provider (ClientProvider): Provider making the request.
+    model (str): Model name.
+    messages (list): Messages from verdict_messages.
+    cache (bool): Whether the response cache may answer the request.
+
+    Returns:
+    dict: The verdict, see parse_verdict.
+    """
+    json_object = {"type": "json_object"}
+    if model not in _json_object_models:
+        json_schema = {"type": "json_schema",
+                       "json_schema": {"name": "evaluation_verdict", "strict": True, "schema": VERDICT_SCHEMA}}
+        try:
+            response = await client_provider.achat(model=model, messages=messages, temperature=0,
+                                                   response_format=json_schema, cache=cache)
+            return parse_verdict(response.choices[0].message.content)
+        except BadRequestError as error:
+            # Other bad requests, e.g. a prompt longer than the context window, would fail as a
+            # JSON object request too, so they are not a reason to downgrade the model
+            if not _rejects_json_schema(error):
+                raise
+            with _json_object_models_lock:
+                _json_object_models.add(model)
+    response = await client_provider.achat(model=model, messages=messages, temperature=0,
+                                           response_format=json_object, cache=cache)
+    return parse_verdict(response.choices[0].message.content)
+
+
+def _rejects_json_schema(error):
+    """Tells whether a bad request error is about the json_schema response format."""
+    if error.param == "response_format":
+        return True
+    message = str(error.message).lower()
+    return "response_format" in message or "json_schema" in message
+
+
+def _load_json_object(text):
+    """Finds and decodes the JSON object in a reply, or returns None."""
+    text = re.sub(r"^\s*```(?:json)?|```\s*$", "", text.strip())
+    start = text.find("{")
+    while start != -1:
+        try:
+            data, _ = json.JSONDecoder().raw_decode(text[start:])
+            if isinstance(data, dict):
+                return data
+        except ValueError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+def _as_bool(value):
+    """Reads booleans that models sometimes write as strings."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes", "pass", "passed", "1")
+    return bool(value)
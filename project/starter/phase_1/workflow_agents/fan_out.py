@@ -0,0 +1,128 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .async_utils import run_sync
+
+
+class FanOut:
+    """
+    Runs several independent branches (e.g. specialist agents) on the same input concurrently
+    and collects their results by name: the fan-out/fan-in step of the parallelization pattern.
+
+    Every run returns its own results instead of writing to shared state, so many inputs can be
+    processed at once in one process, from threads or with asyncio.gather over arun. Each branch
+    can be given a timeout; branches that fail or time out are reported next to the results of
+    the branches that finished.
+    """
+
+    def __init__(self, branches, timeout=None, max_workers=32, allow_partial=True):
+        """
+        Initializes the fan-out.
+
+        Parameters:
+        branches (dict): Sync or async callables keyed by branch name. Each is called with the
+            arguments given to run.
+        timeout (float or dict): Seconds each branch may take, or timeouts keyed by branch name.
+            None means no timeout.
+        max_workers (int): Threads shared by the sync branches of all runs. Defaults to 32.
+        allow_partial (bool): If False, run raises RuntimeError when any branch did not complete.
+        """
+        if not branches:
+            raise ValueError("FanOut needs at least one branch.")
+        self.branches = dict(branches)
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.allow_partial = allow_partial
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def run(self, *args, **kwargs):
+        """
+        Runs every branch and waits for all of them, or for their timeouts.
+
+        Parameters:
+        *args, **kwargs: Arguments passed to every branch.
+
+        Returns:
+        dict: results (values of the completed branches, by name), errors (error messages of
+        the branches that failed or timed out, by name), seconds (time each branch took, by
+        name) and complete (whether every branch completed).
+        """
+        return run_sync(self.arun(*args, **kwargs))
+
+    async def arun(self, *args, **kwargs):
+        """
+        Async variant of run.
+
+        Parameters:
+        *args, **kwargs: Arguments passed to every branch.
+
+        Returns:
+        dict: The outcome, see run.
+        """
+        names = list(self.branches)
+        outcomes = await asyncio.gather(*(self._run_branch(name, args, kwargs) for name in names))
+        outcome = {"results": {}, "errors": {}, "seconds": {}}
+        for name, (ok, value, seconds) in zip(names, outcomes):
+            outcome["results" if ok else "errors"][name] = value
+            outcome["seconds"][name] = seconds
+        outcome["complete"] = not outcome["errors"]
+        if not outcome["complete"] and not self.allow_partial:
+            details = "; ".join(f"{name}: {error}" for name, error in outcome["errors"].items())
+            raise RuntimeError(f"Branches did not complete: {details}")
+        return outcome
+
+    def close(self):
+        """Releases the threads of the sync branches. Branches still running finish in the background."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def branch_timeout(self, name):
+        """
+        Returns the timeout of a branch.
+
+        Parameters:
+        name (str): Branch name.
+
+        Returns:
+        float: Seconds, or None for no timeout.
+        """
+        if isinstance(self.timeout, dict):
+            return self.timeout.get(name)
+        return self.timeout
+
+    async def _run_branch(self, name, args, kwargs):
+        """Runs one branch and returns (completed, result or error message, seconds)."""
+        func = self.branches[name]
+        timeout = self.branch_timeout(name)
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(func):
+                result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+            else:
+                # Sync branches run on the shared pool rather than asyncio's default executor,
+                # which asyncio.run waits for: a timed-out branch must not hold up the caller
+                call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+                result = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(self._get_executor(), call), timeout
+                )
+                if inspect.isawaitable(result):
+                    result = await asyncio.wait_for(result, timeout)
+        except asyncio.TimeoutError:
+            return False, f"Timed out after {timeout} seconds", time.perf_counter() - start
+        except Exception as error:
+            return False, f"{type(error).__name__}: {error}", time.perf_counter() - start
+        return True, result, time.perf_counter() - start
+
+    def _get_executor(self):
+        """Creates the thread pool of the sync branches on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fan-out")
+            return self._executor
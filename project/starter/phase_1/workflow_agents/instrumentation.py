@@ -0,0 +1,305 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_tags = contextvars.ContextVar("workflow_agents_tags", default={})
+
+_default_instrumentation = None
+_default_instrumentation_lock = threading.Lock()
+
+
+@contextmanager
+def tags(**values):
+    """
+    Context manager that tags every call recorded inside it, e.g. with the workflow step.
+
+    Tags nest: inner values are added to, or replace, the outer ones.
+
+    Parameters:
+    **values: Tag names and values.
+    """
+    token = _tags.set({**_tags.get(), **values})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags():
+    """
+    Returns the tags in effect.
+
+    Returns:
+    dict: Tag names and values.
+    """
+    return dict(_tags.get())
+
+
+async def bind_tags(coroutine, values):
+    """
+    Awaits a coroutine with the given tags, so tags survive when the coroutine is handed to
+    another thread's event loop.
+
+    Parameters:
+    coroutine (coroutine): The coroutine to run.
+    values (dict): Tags captured with current_tags().
+
+    Returns:
+    object: The coroutine's result.
+    """
+    with tags(**values):
+        return await coroutine
+
+
+def instrumented_agent(method):
+    """
+    Decorator for agent methods (sync or async) that tags the calls they make with the agent's
+    class name and persona.
+
+    Parameters:
+    method (callable): The method to wrap.
+
+    Returns:
+    callable: The wrapped method.
+    """
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            with tags(agent=type(self).__name__, persona=getattr(self, "persona", None)):
+                return await method(self, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with tags(agent=type(self).__name__, persona=getattr(self, "persona", None)):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def usage_fields(response):
+    """
+    Extracts token counts from an API response.
+
+    Parameters:
+    response (object): A ChatCompletion or CreateEmbeddingResponse.
+
+    Returns:
+    dict: prompt_tokens, completion_tokens and total_tokens (0 when the response has no usage).
+    """
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    total_tokens = getattr(usage, "total_tokens", 0) or prompt_tokens + completion_tokens
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": total_tokens}
+
+
+class Instrumentation:
+    """
+    Sends a record of every model call to pluggable sinks.
+
+    A record holds the call kind (chat or embeddings), model, prompt and completion tokens,
+    latency in seconds, the time to first token of streamed calls, whether it was a cache hit,
+    the number of retries, the error if the call failed, and the tags in effect (agent, persona,
+    step, ...). A sink is any callable taking the record; Aggregator and JsonlTraceWriter are
+    provided.
+    """
+
+    def __init__(self, sinks=None):
+        """
+        Initializes the instrumentation.
+
+        Parameters:
+        sinks (list): Callables receiving each record.
+        """
+        self.sinks = list(sinks or [])
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """bool: Whether any sink is listening."""
+        return bool(self.sinks)
+
+    def add_sink(self, sink):
+        """
+        Adds a sink.
+
+        Parameters:
+        sink (callable): Receives each record.
+
+        Returns:
+        callable: The sink, for chaining.
+        """
+        with self._lock:
+            self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        """
+        Removes a sink.
+
+        Parameters:
+        sink (callable): A sink added before.
+        """
+        with self._lock:
+            self.sinks.remove(sink)
+
+    def record(self, kind, model, latency, response=None, cache_hit=False, retries=0, error=None,
+               time_to_first_token=None):
+        """
+        Records one call.
+
+        Parameters:
+        kind (str): chat or embeddings.
+        model (str): Model name.
+        latency (float): Seconds the call took.
+        response (object): The API response, for its token usage.
+        cache_hit (bool): Whether a cache answered the call.
+        retries (int): Retries the client made.
+        error (Exception): The error if the call failed.
+        time_to_first_token (float): Seconds until the first text of a streamed response arrived.
+            None for calls that were not streamed.
+        """
+        if not self.sinks:
+            return
+        record = {"timestamp": time.time(), "kind": kind, "model": model}
+        record.update(current_tags())
+        record.update(usage_fields(response))
+        record.update({"latency": latency, "time_to_first_token": time_to_first_token,
+                       "cache_hit": cache_hit, "retries": retries,
+                       "error": None if error is None else f"{type(error).__name__}: {error}"})
+        for sink in list(self.sinks):
+            sink(record)
+
+
+class Aggregator:
+    """
+    In-process sink summing calls, tokens, latency, time to first token, cache hits, retries and
+    errors per group of tags, e.g. per agent, persona and workflow step.
+    """
+
+    def __init__(self, group_by=("agent", "persona", "step", "model")):
+        """
+        Initializes an empty aggregator.
+
+        Parameters:
+        group_by (tuple): Record fields that identify a group.
+        """
+        self.group_by = tuple(group_by)
+        self.groups = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        key = tuple(record.get(field) for field in self.group_by)
+        with self._lock:
+            group = self.groups.get(key)
+            if group is None:
+                group = dict(zip(self.group_by, key))
+                group.update({"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+                              "cached_tokens": 0, "latency": 0.0, "streamed_calls": 0, "time_to_first_token": 0.0,
+                              "cache_hits": 0, "retries": 0, "errors": 0})
+                self.groups[key] = group
+            group["calls"] += 1
+            if record.get("cache_hit"):
+                group["cache_hits"] += 1
+                group["cached_tokens"] += record.get("total_tokens", 0)
+            else:
+                for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                    group[field] += record.get(field, 0)
+            group["latency"] += record.get("latency", 0.0)
+            if record.get("time_to_first_token") is not None:
+                group["streamed_calls"] += 1
+                group["time_to_first_token"] += record["time_to_first_token"]
+            group["retries"] += record.get("retries", 0)
+            group["errors"] += 1 if record.get("error") else 0
+
+    def summary(self, sort_by="total_tokens"):
+        """
+        Returns one row per group. Tokens served from a cache are counted in cached_tokens only.
+        time_to_first_token sums over the streamed_calls, so its mean is time_to_first_token / streamed_calls.
+
+        Parameters:
+        sort_by (str): Field the rows are sorted by, largest first. Defaults to total_tokens.
+
+        Returns:
+        list: Group dictionaries with the group fields and their totals.
+        """
+        with self._lock:
+            rows = [dict(group) for group in self.groups.values()]
+        return sorted(rows, key=lambda row: row[sort_by], reverse=True)
+
+    def reset(self):
+        """Forgets all groups."""
+        with self._lock:
+            self.groups = {}
+
+    @classmethod
+    def from_trace(cls, path, group_by=("agent", "persona", "step", "model")):
+        """
+        Aggregates a JSONL trace written by JsonlTraceWriter.
+
+        Parameters:
+        path (str): Trace file.
+        group_by (tuple): Record fields that identify a group.
+
+        Returns:
+        Aggregator: The aggregated trace.
+        """
+        aggregator = cls(group_by)
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    aggregator(json.loads(line))
+        return aggregator
+
+
+class JsonlTraceWriter:
+    """Sink appending each record to a JSONL file, one JSON object per line."""
+
+    def __init__(self, path):
+        """
+        Opens the trace file for appending.
+
+        Parameters:
+        path (str): Trace file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        """Closes the trace file."""
+        with self._lock:
+            self._file.close()
+
+
+def get_instrumentation():
+    """
+    Returns the process-wide instrumentation used by every client provider. If the
+    WORKFLOW_AGENTS_TRACE environment variable names a file, a JsonlTraceWriter for it is
+    added on first use.
+
+    Returns:
+    Instrumentation: The shared instrumentation.
+    """
+    global _default_instrumentation
+    with _default_instrumentation_lock:
+        if _default_instrumentation is None:
+            _default_instrumentation = Instrumentation()
+            trace_path = os.getenv("WORKFLOW_AGENTS_TRACE")
+            if trace_path:
+                _default_instrumentation.add_sink(JsonlTraceWriter(trace_path))
+        return _default_instrumentation
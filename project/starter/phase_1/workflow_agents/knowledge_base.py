@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import shutil
+import warnings
+from .chunking import iter_chunks, iter_text
+from .vector_store import VectorStore
+
+
+class KnowledgeBase:
+    """
+    A named, persistent collection of documents with their chunk embeddings.
+
+    The knowledge base remembers a fingerprint of every document and of every chunk. When
+    documents are updated, only chunks whose text is new are embedded; chunks that already
+    exist anywhere in the knowledge base reuse their stored vectors, and chunks of removed or
+    rewritten documents are dropped when the store is compacted.
+
+    On disk it is a directory holding a manifest.json and a VectorStore in store/.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    STORE_DIR = "store"
+
+    def __init__(self, name, embed, root="knowledge_bases", chunk_size=2000, chunk_overlap=100,
+                 model="text-embedding-3-large"):
+        """
+        Opens the knowledge base with the given name, creating it if needed.
+
+        Parameters:
+        name (str): Name of the knowledge base, used as its directory name.
+        embed (callable): Returns the embedding vectors of a list of texts.
+        root (str): Directory holding all knowledge bases. Defaults to knowledge_bases.
+        chunk_size (int): The size of text chunks for embedding. Defaults to 2000.
+        chunk_overlap (int): Overlap between consecutive chunks. Defaults to 100.
+        model (str): Name of the embedding model, recorded in the store.
+        """
+        self.name = name
+        self.embed = embed
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.model = model
+        self.path = os.path.join(root, name)
+        self.store_path = os.path.join(self.path, self.STORE_DIR)
+        self.manifest = self._load_manifest()
+
+    @property
+    def documents(self):
+        """list: IDs of the documents in the knowledge base."""
+        return list(self.manifest["documents"])
+
+    def load_store(self):
+        """
+        Opens the knowledge base's vector store.
+
+        Returns:
+        VectorStore: The store, or None if nothing has been indexed yet.
+        """
+        return VectorStore(self.store_path) if VectorStore.exists(self.store_path) else None
+
+    def update_document(self, doc_id, source):
+        """
+        Adds a document or replaces its text.
+
+        Parameters:
+        doc_id (str): Document ID.
+        source (str, file or iterable): The document text, see chunking.iter_text.
+
+        Returns:
+        dict: Statistics of the update, see update.
+        """
+        return self.update({doc_id: source})
+
+    def remove_document(self, doc_id):
+        """
+        Removes a document and its chunks.
+
+        Parameters:
+        doc_id (str): Document ID.
+
+        Returns:
+        dict: Statistics of the update, see update.
+        """
+        return self.update({}, remove=[doc_id])
+
+    def sync(self, documents):
+        """
+        Makes the knowledge base hold exactly the given documents.
+
+        Parameters:
+        documents (dict): Document sources keyed by document ID.
+
+        Returns:
+        dict: Statistics of the update, see update.
+        """
+        return self.update(documents, remove=[d for d in self.documents if d not in documents])
+
+    def update(self, documents, remove=()):
+        """
+        Adds or replaces documents, removes others, and compacts the store.
+
+        Documents whose fingerprint is unchanged are skipped. For changed documents, only chunks
+        whose text is not already stored are embedded.
+
+        Parameters:
+        documents (dict): Document sources keyed by document ID.
+        remove (list): IDs of documents to remove.
+
+        Returns:
+        dict: Counts of unchanged documents, updated documents, removed documents, reused
+        chunks and embedded chunks.
+        """
+        store = self.load_store()
+        rows_by_fingerprint, rows_by_document = {}, {}
+        if store is not None:
+            for i, chunk in enumerate(store.chunks):
+                rows_by_fingerprint.setdefault(chunk["fingerprint"], i)
+                rows_by_document.setdefault(chunk["doc_id"], []).append(i)
+
+        known = self.manifest["documents"]
+        stats = {"unchanged_documents": 0, "updated_documents": 0, "removed_documents": 0,
+                 "reused_chunks": 0, "embedded_chunks": 0}
+        changed = {}
+        for doc_id, source in documents.items():
+            fingerprint, chunks = self._chunk_document(doc_id, source)
+            if doc_id in known and known[doc_id]["fingerprint"] == fingerprint:
+                stats["unchanged_documents"] += 1
+            else:
+                changed[doc_id] = (fingerprint, chunks)
+        removed = [doc_id for doc_id in remove if doc_id in known and doc_id not in documents]
+
+        if not changed and not removed:
+            return stats
+
+        new_texts = {}
+        for _, chunks in changed.values():
+            for chunk in chunks:
+                if chunk["fingerprint"] not in rows_by_fingerprint:
+                    new_texts.setdefault(chunk["fingerprint"], chunk["text"])
+        new_vectors = dict(zip(new_texts, self.embed(list(new_texts.values())))) if new_texts else {}
+        stats["embedded_chunks"] = len(new_vectors)
+
+        order = [doc_id for doc_id in known if doc_id not in removed]
+        order += [doc_id for doc_id in changed if doc_id not in known]
+        staging_path = self.store_path + ".tmp"
+        with VectorStore.writer(staging_path, model=self.model) as writer:
+            for doc_id in order:
+                if doc_id in changed:
+                    chunks = changed[doc_id][1]
+                    vectors = []
+                    for chunk in chunks:
+                        row = rows_by_fingerprint.get(chunk["fingerprint"])
+                        if row is None:
+                            vectors.append(new_vectors[chunk["fingerprint"]])
+                        else:
+                            vectors.append(store.vectors[row])
+                            stats["reused_chunks"] += 1
+                else:
+                    rows = rows_by_document.get(doc_id, [])
+                    chunks = [store.chunks[i] for i in rows]
+                    vectors = [store.vectors[i] for i in rows]
+                writer.add(vectors, chunks)
+
+        store = None
+        self._replace_store(staging_path)
+        for doc_id in removed:
+            del known[doc_id]
+        for doc_id, (fingerprint, chunks) in changed.items():
+            known[doc_id] = {"fingerprint": fingerprint, "chunks": len(chunks)}
+        self._save_manifest()
+
+        stats["updated_documents"] = len(changed)
+        stats["removed_documents"] = len(removed)
+        return stats
+
+    def _chunk_document(self, doc_id, source):
+        """Chunks a document, fingerprinting the whole text and each chunk on the way."""
+        hasher = hashlib.sha256(f"{self.chunk_size}:{self.chunk_overlap}\n".encode('utf-8'))
+
+        def hashed_pieces():
+            for piece in iter_text(source):
+                hasher.update(piece.encode('utf-8'))
+                yield piece
+
+        chunks = []
+        for chunk in iter_chunks(hashed_pieces(), self.chunk_size, self.chunk_overlap):
+            chunk["doc_id"] = doc_id
+            chunk["fingerprint"] = hashlib.sha256(chunk["text"].encode('utf-8')).hexdigest()
+            chunks.append(chunk)
+        return hasher.hexdigest(), chunks
+
+    def _replace_store(self, staging_path):
+        """Swaps a freshly written store in place of the current one."""
+        old_path = self.store_path + ".old"
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        if os.path.exists(self.store_path):
+            os.rename(self.store_path, old_path)
+        os.rename(staging_path, self.store_path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+
+    def _load_manifest(self):
+        """Reads the manifest, starting a new one if the knowledge base does not exist yet."""
+        manifest_path = os.path.join(self.path, self.MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            if (manifest["chunk_size"], manifest["chunk_overlap"]) == (self.chunk_size, self.chunk_overlap):
+                return manifest
+            # Chunks made with other settings cannot be matched, so every document must be indexed again
+            warnings.warn(
+                f"Knowledge base '{self.name}' was indexed with chunk_size={manifest['chunk_size']} and "
+                f"chunk_overlap={manifest['chunk_overlap']}, not {self.chunk_size} and {self.chunk_overlap}. "
+                f"Its manifest is reset: documents not passed to the next update are dropped "
+                f"({', '.join(manifest['documents']) or 'none indexed'}).",
+                stacklevel=3
+            )
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap,
+                "model": self.model, "documents": {}}
+
+    def _save_manifest(self):
+        """Writes the manifest atomically."""
+        os.makedirs(self.path, exist_ok=True)
+        manifest_path = os.path.join(self.path, self.MANIFEST_FILE)
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
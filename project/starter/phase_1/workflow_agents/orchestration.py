@@ -0,0 +1,219 @@
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .async_utils import run_sync
+from .streaming import stream_deltas
+
+
+class WorkerDispatcher:
+    """
+    Runs the workers of an orchestrator-workers workflow concurrently, with a bounded number of
+    them calling the LLM at once and a timeout per worker.
+
+    Assignments are read as they become available, so workers can start while the orchestrator's
+    plan is still streaming in. A worker that fails or times out is reported in its result
+    without stopping the others.
+    """
+
+    def __init__(self, max_workers=4, worker_timeout=120.0):
+        """
+        Initializes the dispatcher.
+
+        Parameters:
+        max_workers (int): Workers running at once. Defaults to 4.
+        worker_timeout (float): Seconds a worker may take before its subtask is reported as timed
+            out. None waits forever.
+        """
+        self.max_workers = max_workers
+        self.worker_timeout = worker_timeout
+
+    def dispatch(self, task, assignments, on_result=None, on_delta=None):
+        """
+        Runs the workers and returns their results in subtask order.
+
+        Parameters:
+        task (str): The orchestrator's original task, passed to every worker.
+        assignments (iterable): (worker, task_info) pairs. Each worker has a
+            run(original_task, task_description) method; task_info has type and description.
+        on_result (callable): Called with each result entry as soon as its worker finishes.
+        on_delta (callable): Called with (task_info, text) for each piece of a worker's reply
+            while it is being generated.
+
+        Returns:
+        list: Result entries with type, description, result, status (ok, timeout or error) and
+        seconds.
+        """
+        # A timed-out worker cannot be interrupted, so a late one keeps its thread and finishes in
+        # the background while the pool still has threads for the rest
+        executor = ThreadPoolExecutor(max_workers=max(32, self.max_workers + 1))
+        try:
+            return run_sync(self._dispatch(task, assignments, executor, on_result, on_delta))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def run_worker(worker, task, task_info, on_delta=None):
+        """
+        Runs one worker, streaming its reply to on_delta(task_info, text) when a callback is given.
+
+        Parameters:
+        worker (object): The worker agent.
+        task (str): The orchestrator's original task.
+        task_info (dict): The subtask, with type and description.
+        on_delta (callable): Receives (task_info, text) for each piece of the reply.
+
+        Returns:
+        str: The worker's result.
+        """
+        with stream_deltas(None if on_delta is None else lambda delta: on_delta(task_info, delta)):
+            return worker.run(task, task_info["description"])
+
+    async def _dispatch(self, task, assignments, executor, on_result, on_delta):
+        """Starts a worker for each assignment as it arrives and gathers their results."""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run_one(worker, task_info):
+            async with semaphore:
+                start = time.perf_counter()
+                entry = {"type": task_info["type"], "description": task_info["description"]}
+                try:
+                    entry["result"] = await asyncio.wait_for(
+                        loop.run_in_executor(executor, self.run_worker, worker, task, task_info, on_delta),
+                        self.worker_timeout
+                    )
+                    entry["status"] = "ok"
+                except asyncio.TimeoutError:
+                    entry["result"] = f"No result: the worker timed out after {self.worker_timeout} seconds."
+                    entry["status"] = "timeout"
+                except Exception as error:
+                    entry["result"] = f"No result: the worker failed with {type(error).__name__}: {error}"
+                    entry["status"] = "error"
+                entry["seconds"] = time.perf_counter() - start
+            if on_result is not None:
+                on_result(entry)
+            return entry
+
+        jobs = []
+        iterator = iter(assignments)
+        try:
+            while True:
+                # Reading the next assignment may wait for the orchestrator's stream, so it runs in a thread
+                assignment = await loop.run_in_executor(executor, next, iterator, None)
+                if assignment is None:
+                    break
+                jobs.append(asyncio.ensure_future(run_one(*assignment)))
+        except BaseException:
+            for job in jobs:
+                job.cancel()
+            raise
+        return list(await asyncio.gather(*jobs))
+
+
+class TaskStreamParser:
+    """
+    Parses an orchestrator's plan, its <analysis> and <task> tags, in a single pass over streamed
+    text. feed returns the tasks whose closing </task> tag arrived with the chunk, so workers can
+    start while the orchestrator is still writing the rest of its plan. Tag contents may span
+    several lines or share a line with other tags, and a tag cut in half by a chunk boundary is
+    completed by the next chunk.
+    """
+
+    TAG = re.compile(r"<(/?)([A-Za-z][\w-]*)\s*>")
+
+    def __init__(self):
+        """Initializes an empty parser."""
+        self.text = ""       # Everything received so far
+        self.sections = {}   # Contents of the closed tags outside tasks, e.g. analysis
+        self._pos = 0        # Where scanning resumes; text before it is never scanned again
+        self._open = []      # (tag name, content start) of the tags not closed yet
+        self._task = None    # Fields of the task being read
+
+    @property
+    def analysis(self):
+        """str: The contents of the <analysis> tag, or an empty string until it has closed."""
+        return self.sections.get("analysis", "")
+
+    def feed(self, chunk):
+        """
+        Adds streamed text.
+
+        Parameters:
+        chunk (str): The next piece of the orchestrator's reply.
+
+        Returns:
+        list: The tasks completed by the chunk, as dictionaries with type and description.
+        """
+        self.text += chunk
+        tasks = []
+        while True:
+            start = self.text.find("<", self._pos)
+            if start == -1:
+                self._pos = len(self.text)
+                break
+            match = self.TAG.match(self.text, start)
+            if match is None:
+                if self.text.find(">", start) == -1 and len(self.text) - start < 64:
+                    # Possibly a tag cut in half by the stream: wait for the rest of it
+                    self._pos = start
+                    break
+                self._pos = start + 1
+                continue
+            self._pos = match.end()
+            name = match.group(2).lower()
+            if not match.group(1):
+                self._open.append((name, match.end()))
+                if name == "task":
+                    self._task = {}
+                continue
+            task = self._close(name, start)
+            if task is not None:
+                tasks.append(task)
+        return tasks
+
+    def close(self):
+        """
+        Ends the stream.
+
+        Returns:
+        list: A last task left unclosed by a truncated reply, if any.
+        """
+        if self._task and "description" in self._task:
+            task, self._task = self._task, None
+            return [{"type": task.get("type", "default"), "description": task["description"]}]
+        return []
+
+    def _close(self, name, end):
+        """Handles a closing tag and returns the task it completes, if any."""
+        # Unclosed inner tags are closed along with the tag that contains them
+        for depth in range(len(self._open) - 1, -1, -1):
+            if self._open[depth][0] == name:
+                break
+        else:
+            return None
+        content = self.text[self._open[depth][1]:end].strip()
+        del self._open[depth:]
+        if name == "task":
+            task, self._task = self._task, None
+            if task and "description" in task:
+                return {"type": task.get("type", "default"), "description": task["description"]}
+        elif self._task is not None and name in ("type", "description"):
+            self._task[name] = content
+        elif self._task is None and name != "tasks":
+            self.sections[name] = content
+        return None
+
+
+def parse_tasks(xml):
+    """
+    Parses the <task> blocks of a complete orchestrator plan.
+
+    Parameters:
+    xml (str): The plan.
+
+    Returns:
+    list: Task dictionaries with type and description.
+    """
+    parser = TaskStreamParser()
+    return parser.feed(xml) + parser.close()
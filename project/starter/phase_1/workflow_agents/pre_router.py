@@ -0,0 +1,155 @@
+import random
+import re
+import threading
+from .route_index import RouteIndex
+
+
+def match_route_name(answer, names):
+    """
+    Finds the route an LLM router named in its answer, tolerating quotes, punctuation, case and
+    extra words around the name.
+
+    Parameters:
+    answer (str): The LLM's answer.
+    names (list): Route names.
+
+    Returns:
+    str: The matched name, or None if the answer names no route.
+    """
+    cleaned = answer.strip().strip("'\"`.*").strip().lower()
+    for name in names:
+        if name.lower() == cleaned:
+            return name
+    # Otherwise the longest name mentioned, so "Pricing Strategist Agent" is not taken for "Pricing Agent"
+    mentioned = [name for name in names
+                 if re.search(r"(?<!\w)" + re.escape(name.lower()) + r"(?!\w)", answer.lower())]
+    return max(mentioned, key=len) if mentioned else None
+
+
+class EmbeddingPreRouter:
+    """
+    Routes prompts by scoring them against the embeddings of the route descriptions, and asks an
+    LLM router only when the decision is close: when the best two routes score within margin of
+    each other. Descriptions are embedded once, so the common case costs one embedding lookup
+    instead of a chat completion round trip.
+
+    A sample of the fast decisions (audit_rate) can be checked against the LLM as well, and
+    report() shows how often the two agree, as a confusion matrix of embedding choice against
+    LLM choice.
+    """
+
+    def __init__(self, embed, llm_route, margin=0.05, audit_rate=0.0, seed=None):
+        """
+        Initializes the router without routes.
+
+        Parameters:
+        embed (callable): Returns the embedding vector of a text, ideally from an embedding cache.
+        llm_route (callable): Called with the prompt and the route dictionaries; returns the LLM's
+            answer naming a route.
+        margin (float): Minimum lead in cosine similarity of the best route over the second best
+            for the embedding decision to be taken without the LLM. Defaults to 0.05.
+        audit_rate (float): Share of the embedding decisions also sent to the LLM, only to
+            measure agreement. Defaults to 0.
+        seed (int): Seed of the audit sampling.
+        """
+        self.embed = embed
+        self.llm_route = llm_route
+        self.margin = margin
+        self.audit_rate = audit_rate
+        self.route_index = RouteIndex(embed)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_report()
+
+    @property
+    def routes(self):
+        """list: The route dictionaries, each with at least "name" and "description"."""
+        return self.route_index.routes
+
+    def set_routes(self, routes):
+        """
+        Replaces the routes, embedding only new or changed descriptions.
+
+        Parameters:
+        routes (list): Route dictionaries with "name" and "description" keys, plus anything the
+            caller needs back from route(), e.g. the agent object.
+        """
+        self.route_index.set_routes(routes)
+
+    def route(self, prompt):
+        """
+        Picks the route for a prompt.
+
+        Parameters:
+        prompt (str): The prompt to route.
+
+        Returns:
+        dict: route (the chosen route dictionary), path ("embedding" or "llm"), scores (by route
+        name), lead (of the best route over the second) and llm_choice (the route the LLM
+        picked, if it was asked).
+        """
+        if not self.routes:
+            raise ValueError("The router has no routes.")
+        ranked = self.route_index.rank(self.embed(prompt))
+        best = ranked[0][0]
+        lead = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else float("inf")
+        decision = {"scores": {route["name"]: score for route, score in ranked}, "lead": lead,
+                    "llm_choice": None}
+        fast = lead >= self.margin
+        with self._lock:
+            audit = fast and self.audit_rate > 0 and self._random.random() < self.audit_rate
+        asked = not fast or audit
+        if asked:
+            decision["llm_choice"] = self._ask_llm(prompt)
+        if fast or decision["llm_choice"] is None:
+            # An LLM answer naming no route falls back to the embedding choice
+            decision["route"], decision["path"] = best, "embedding"
+        else:
+            decision["route"] = next(r for r in self.routes if r["name"] == decision["llm_choice"])
+            decision["path"] = "llm"
+        self._record(best["name"], decision, fast, asked)
+        return decision
+
+    def report(self):
+        """
+        Reports how prompts were routed since the last reset.
+
+        Returns:
+        dict: Decisions, embedding_path and llm_path counts, embedding_path_rate, audited (fast
+        decisions checked against the LLM), compared (prompts for which both the embeddings and
+        the LLM chose), agreement (share of those on which they agreed, None if none were
+        compared) and confusion (counts by embedding choice, then by LLM choice; "(no route)"
+        when the LLM's answer named none).
+        """
+        with self._lock:
+            report = dict(self._counts)
+            report["confusion"] = {name: dict(row) for name, row in self._confusion.items()}
+        report["embedding_path_rate"] = report["embedding_path"] / report["decisions"] if report["decisions"] else 0.0
+        report["agreement"] = report["agreed"] / report["compared"] if report["compared"] else None
+        return report
+
+    def reset_report(self):
+        """Forgets the routing decisions counted so far."""
+        with self._lock:
+            self._counts = {"decisions": 0, "embedding_path": 0, "llm_path": 0, "audited": 0,
+                            "compared": 0, "agreed": 0}
+            self._confusion = {}
+
+    def _ask_llm(self, prompt):
+        """Asks the LLM router, returning the route name it picked or None if it named none."""
+        answer = self.llm_route(prompt, self.routes)
+        return match_route_name(answer or "", [route["name"] for route in self.routes])
+
+    def _record(self, embedding_choice, decision, fast, asked):
+        """Counts a decision for the report."""
+        with self._lock:
+            self._counts["decisions"] += 1
+            self._counts["embedding_path" if decision["path"] == "embedding" else "llm_path"] += 1
+            if not asked:
+                return
+            self._counts["audited"] += 1 if fast else 0
+            llm_choice = decision["llm_choice"] or "(no route)"
+            row = self._confusion.setdefault(embedding_choice, {})
+            row[llm_choice] = row.get(llm_choice, 0) + 1
+            self._counts["compared"] += 1
+            self._counts["agreed"] += 1 if llm_choice == embedding_choice else 0
@@ -0,0 +1,295 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .async_utils import run_sync
+from .instrumentation import tags
+from .step_cache import step_fingerprint
+from .streaming import stream_deltas
+
+
+def heading_section(heading):
+    """
+    Returns an extractor for PromptChain inputs that takes one markdown section of a step's
+    output, e.g. "# PRODUCT ALLOCATION", as soon as the heading after it starts streaming in.
+    If the output has no such heading, the whole output is used once it is complete.
+
+    Parameters:
+    heading (str): Heading text, matched case-insensitively at the start of a heading line.
+
+    Returns:
+    callable: Extractor taking (text so far, whether the text is complete).
+    """
+    heading_line = re.compile(r"^#+\s*" + re.escape(heading) + r".*$", re.IGNORECASE | re.MULTILINE)
+
+    def extract(text, complete):
+        match = heading_line.search(text)
+        if match is None:
+            return text if complete else None
+        end = text.find("\n#", match.end())
+        if end < 0:
+            return text[match.end():].strip() if complete else None
+        return text[match.end():end].strip()
+    return extract
+
+
+class PromptChain:
+    """
+    Runs a prompt chain as a graph of steps, each declared with the inputs it really needs, so
+    steps that do not depend on each other run concurrently instead of one after another.
+
+    An input can also be taken from part of an upstream step's output, e.g. one section of it:
+    the upstream step is then streamed, and the downstream step starts as soon as that part has
+    been generated rather than when the whole output is complete. Many chain inputs can flow
+    through the chain at once with run_many.
+
+    With a StepCache, step outputs are saved as they complete and reused by later runs whose
+    step template and inputs are unchanged, so a failed or edited chain resumes from its
+    checkpoints and recomputes only the invalidated steps.
+    """
+
+    def __init__(self, input_name="input", max_workers=16, step_cache=None):
+        """
+        Initializes an empty chain.
+
+        Parameters:
+        input_name (str): Name under which steps refer to the chain's input. Defaults to "input".
+        max_workers (int): Threads shared by the sync steps of all runs. Defaults to 16.
+        step_cache (StepCache): Saves and reuses step outputs. None computes every step on every run.
+        """
+        self.input_name = input_name
+        self.max_workers = max_workers
+        self.step_cache = step_cache
+        self.steps = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def add_step(self, name, func, inputs=None, template=None):
+        """
+        Adds a step. Steps can only use the chain input and steps added before them.
+
+        Parameters:
+        name (str): Step name, also the key of its output.
+        func (callable): Sync or async function called with the step's inputs, in order, and
+            returning the step's output (a string when downstream steps take part of it).
+        inputs (list): Sources of the inputs. Each is the name of a step (or the chain input),
+            or a (step name, extractor) pair taking part of that step's output as it streams in.
+            The extractor is called with (text so far, whether the text is complete) and returns
+            the input, or None while it is not available yet. Defaults to the chain input.
+        template (str): The step's prompt template, part of the key its output is saved under in
+            the step cache. Defaults to the source code of func, so editing the function's prompt
+            invalidates the saved outputs.
+
+        Returns:
+        PromptChain: The chain, for chaining.
+        """
+        if name in self.steps or name == self.input_name:
+            raise ValueError(f"Step name {name!r} is already used.")
+        sources = []
+        for source in inputs if inputs is not None else [self.input_name]:
+            upstream, extract = source if isinstance(source, tuple) else (source, None)
+            if upstream != self.input_name and upstream not in self.steps:
+                raise ValueError(f"Step {name!r} uses unknown step {upstream!r}.")
+            if extract is not None and upstream == self.input_name:
+                raise ValueError("Only step outputs can be taken in part.")
+            sources.append((upstream, extract))
+        self.steps[name] = {"func": func, "inputs": sources,
+                            "template": template if template is not None else step_fingerprint(func)}
+        return self
+
+    def run(self, value, on_delta=None):
+        """
+        Runs the chain on one input.
+
+        Parameters:
+        value (object): The chain input.
+        on_delta (callable): Called with (step name, text) as the steps' outputs are generated.
+
+        Returns:
+        dict: Step outputs keyed by step name.
+        """
+        return run_sync(self.arun(value, on_delta))
+
+    async def arun(self, value, on_delta=None):
+        """
+        Async variant of run.
+
+        Parameters:
+        value (object): The chain input.
+        on_delta (callable): Called with (step name, text) as the steps' outputs are generated.
+
+        Returns:
+        dict: Step outputs keyed by step name.
+        """
+        loop = asyncio.get_running_loop()
+        outputs = {self.input_name: loop.create_future()}
+        outputs[self.input_name].set_result(value)
+        # Downstream inputs taken from part of a step's output, as (extractor, future) per step
+        watchers = {name: [] for name in self.steps}
+        step_inputs = {}
+        for name, step in self.steps.items():
+            step_inputs[name] = []
+            for upstream, extract in step["inputs"]:
+                if extract is None:
+                    step_inputs[name].append(upstream)
+                else:
+                    future = loop.create_future()
+                    watchers[upstream].append((extract, future))
+                    step_inputs[name].append(future)
+
+        async def execute(name):
+            args = []
+            for source in step_inputs[name]:
+                args.append(await (outputs[source] if isinstance(source, str) else source))
+            step_watchers = watchers[name]
+            key = None
+            if self.step_cache is not None:
+                key = self.step_cache.key(name, self.steps[name]["template"], args)
+                found, result = self.step_cache.get(key)
+                if found:
+                    saved = result if isinstance(result, str) else str(result)
+                    if on_delta is not None:
+                        on_delta(name, saved)
+                    _resolve(step_watchers, saved, True)
+                    return result
+            sink = None
+            if step_watchers or on_delta is not None:
+                text = [""]
+
+                def on_text(delta):
+                    text[0] += delta
+                    if on_delta is not None:
+                        on_delta(name, delta)
+                    _resolve(step_watchers, text[0], False)
+                # Deltas arrive on the thread making the request and are handled on this loop
+                sink = functools.partial(loop.call_soon_threadsafe, on_text)
+            try:
+                with tags(step=name):
+                    result = await self._call(self.steps[name]["func"], args, sink)
+            except BaseException as error:
+                for _, future in step_watchers:
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"Step {name!r} failed: {error}"))
+                raise
+            if key is not None:
+                self.step_cache.put(key, name, result)
+            _resolve(step_watchers, result if isinstance(result, str) else str(result), True)
+            return result
+
+        for name in self.steps:
+            outputs[name] = asyncio.ensure_future(execute(name))
+        tasks = [outputs[name] for name in self.steps]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            for step_watchers in watchers.values():
+                for _, future in step_watchers:
+                    if future.done() and not future.cancelled():
+                        # Consumed here so asyncio does not report it as never retrieved
+                        future.exception()
+            raise
+        return {name: outputs[name].result() for name in self.steps}
+
+    def run_many(self, values, max_concurrency=8, on_result=None):
+        """
+        Runs the chain on many inputs as a pipeline: up to max_concurrency inputs are in flight
+        at once, each at its own step, so early steps of one input overlap late steps of another.
+
+        Parameters:
+        values (iterable): Chain inputs.
+        max_concurrency (int): Maximum number of inputs in flight. Defaults to 8.
+        on_result (callable): Called with each record as soon as its input finished.
+
+        Returns:
+        list: One record per input, in input order, with the input, its outputs (or the error
+        if a step failed) and the seconds it took.
+        """
+        return run_sync(self.arun_many(values, max_concurrency, on_result))
+
+    async def arun_many(self, values, max_concurrency=8, on_result=None):
+        """
+        Async variant of run_many.
+
+        Parameters:
+        values (iterable): Chain inputs.
+        max_concurrency (int): Maximum number of inputs in flight. Defaults to 8.
+        on_result (callable): Called with each record as soon as its input finished.
+
+        Returns:
+        list: The records, see run_many.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(value):
+            async with semaphore:
+                start = time.perf_counter()
+                record = {"input": value}
+                try:
+                    record["outputs"] = await self.arun(value)
+                except Exception as error:
+                    record["error"] = f"{type(error).__name__}: {error}"
+                record["seconds"] = time.perf_counter() - start
+            if on_result is not None:
+                on_result(record)
+            return record
+
+        return list(await asyncio.gather(*(run_one(value) for value in values)))
+
+    def close(self):
+        """Releases the threads of the sync steps."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    async def _call(self, func, args, sink):
+        """Calls a step function, streaming its chat completions to sink when one is given."""
+        if inspect.iscoroutinefunction(func):
+            if sink is None:
+                return await func(*args)
+            with stream_deltas(sink):
+                return await func(*args)
+        call = functools.partial(contextvars.copy_context().run, _call_streamed, func, args, sink)
+        result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _get_executor(self):
+        """Creates the thread pool of the sync steps on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prompt-chain")
+            return self._executor
+
+
+def _call_streamed(func, args, sink):
+    """Calls a sync step function in a worker thread, inside stream_deltas when sink is given."""
+    if sink is None:
+        return func(*args)
+    with stream_deltas(sink):
+        return func(*args)
+
+
+def _resolve(watchers, text, complete):
+    """Passes a step's output so far to the extractors still waiting for their part of it."""
+    for extract, future in watchers:
+        if future.done():
+            continue
+        try:
+            part = extract(text, complete)
+        except Exception as error:
+            future.set_exception(error)
+            continue
+        if part is not None:
+            future.set_result(part)
+        elif complete:
+            future.set_exception(ValueError("The part of the output a step needs was not found."))
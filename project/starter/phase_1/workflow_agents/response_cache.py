@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from openai.types.chat import ChatCompletion
+from .embedding_cache import DEFAULT_CACHE_DIR
+from .instrumentation import get_instrumentation
+from .streaming import StreamAssembler, current_delta_sink, stream_params
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+class ResponseCache:
+    """
+    A cache of chat completions keyed by model, the full message list and the sampling parameters.
+
+    Agents call the API with temperature=0 and ask the same persona, knowledge and prompt
+    combinations on every run of a workflow, so repeated requests can be answered from the cache.
+    Only such deterministic requests are cached (see is_cacheable): a sampled request is meant to
+    return a different answer each time.
+    Lookups go to an in-memory LRU tier first and then to an optional SQLite file on disk.
+    Entries older than ttl seconds are treated as misses, and the disk tier keeps at most
+    max_disk_items entries, dropping the least recently used ones.
+    """
+
+    def __init__(self, path=None, max_memory_items=1000, max_disk_items=100000, ttl=None):
+        """
+        Initializes the cache.
+
+        Parameters:
+        path (str): SQLite file for the persistent tier. If None, only the memory tier is used.
+        max_memory_items (int): Number of responses kept in memory. Defaults to 1000.
+        max_disk_items (int): Number of responses kept on disk. None means no limit. Defaults to 100000.
+        ttl (float): Seconds a response stays valid. None means responses never expire.
+        """
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl = ttl
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, model TEXT, created REAL, last_used REAL, response TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._db.commit()
+
+    @staticmethod
+    def key(model, messages, params):
+        """
+        Computes the cache key of a chat completion request.
+
+        Parameters:
+        model (str): Model name.
+        messages (list): Chat messages.
+        params (dict): Sampling and other request parameters, such as temperature.
+
+        Returns:
+        str: Hex SHA-256 digest of the canonical JSON form of the request.
+        """
+        request = json.dumps({"model": model, "messages": messages, "params": params},
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Looks up a response.
+
+        Parameters:
+        key (str): Cache key from key().
+
+        Returns:
+        ChatCompletion: The cached response, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, response = entry
+                if self._is_fresh(created, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                self._forget(key)
+                self.expired += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT created, response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if self._is_fresh(row[0], now):
+                        response = ChatCompletion.model_validate_json(row[1])
+                        self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, row[0], response)
+                        self.disk_hits += 1
+                        return response
+                    self._forget(key)
+                    self.expired += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, key, model, response):
+        """
+        Stores a response.
+
+        Parameters:
+        key (str): Cache key from key().
+        model (str): Model name, recorded for inspection of the disk tier.
+        response (ChatCompletion): The response to store.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                 (key, model, now, now, response.model_dump_json()))
+                if self.max_disk_items is not None:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                        "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_disk_items,)
+                    )
+                self._db.commit()
+
+    def stats(self):
+        """
+        Reports cache effectiveness since the cache was created.
+
+        Returns:
+        dict: Memory hits, disk hits, misses, expired entries, total hits and the hit rate.
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hits": hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+    def clear(self):
+        """Removes every entry from both tiers and resets the statistics."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = self.expired = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _is_fresh(self, created, now):
+        """Tells whether an entry created at a given time is still within the TTL."""
+        return self.ttl is None or now - created <= self.ttl
+
+    def _remember(self, key, created, response):
+        """Adds an entry to the memory tier, evicting the least recently used one if full."""
+        self._memory[key] = (created, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        """Removes an expired entry from both tiers."""
+        self._memory.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+
+def is_cacheable(params):
+    """
+    Tells whether a chat completion request may be answered from the response cache: only
+    requests made at temperature 0, and not streamed by the caller, return the same answer
+    every time.
+
+    Parameters:
+    params (dict): Request parameters other than the model and messages.
+
+    Returns:
+    bool: True if the response may be cached and replayed.
+    """
+    return params.get("temperature") == 0 and not params.get("stream")
+
+
+def get_default_response_cache():
+    """
+    Returns the process-wide response cache, or None if response caching is not enabled.
+
+    The cache is opt-in: set the WORKFLOW_AGENTS_RESPONSE_CACHE environment variable to 1 to
+    enable it, and WORKFLOW_AGENTS_RESPONSE_CACHE_TTL to a number of seconds to expire entries.
+    Its disk tier lives next to the embedding cache in DEFAULT_CACHE_DIR.
+
+    Returns:
+    ResponseCache: The shared cache, or None.
+    """
+    global _default_cache
+    if os.getenv("WORKFLOW_AGENTS_RESPONSE_CACHE", "").lower() not in ("1", "true", "yes"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            ttl = os.getenv("WORKFLOW_AGENTS_RESPONSE_CACHE_TTL")
+            _default_cache = ResponseCache(os.path.join(DEFAULT_CACHE_DIR, "responses.sqlite"),
+                                           ttl=float(ttl) if ttl else None)
+        return _default_cache
+
+
+def cached_chat_completion(client, model, messages, cache=None, **params):
+    """
+    Creates a chat completion with any OpenAI client, going through the response cache when
+    caching is enabled and the request is made at temperature 0, and reports the call to the
+    process-wide instrumentation. This is how the lesson scripts' helpers share the agents' cache
+    and instrumentation.
+
+    Inside workflow_agents.streaming.stream_deltas the request is streamed, its text is passed on
+    as it arrives, and the assembled response is returned and cached like any other.
+
+    Parameters:
+    client (OpenAI): The client making the request on a miss.
+    model (str): Model name.
+    messages (list): Chat messages.
+    cache (ResponseCache): Cache to use. Defaults to get_default_response_cache(); False bypasses caching.
+    **params: Further request parameters, such as temperature.
+
+    Returns:
+    ChatCompletion: The response.
+    """
+    if cache is None:
+        cache = get_default_response_cache()
+    on_delta = current_delta_sink() if not params.get("stream") else None
+    assembler = None
+
+    def create():
+        nonlocal assembler
+        if on_delta is None:
+            return client.chat.completions.create(model=model, messages=messages, **params)
+        assembler = StreamAssembler(on_delta)
+        with client.chat.completions.create(model=model, messages=messages, **stream_params(params)) as stream:
+            for chunk in stream:
+                assembler.add(chunk)
+        return assembler.completion()
+
+    instrumentation = get_instrumentation()
+    start = time.perf_counter()
+    cache_hit = False
+    try:
+        if not cache or not is_cacheable(params):
+            response = create()
+        else:
+            key = cache.key(model, messages, params)
+            response = cache.get(key)
+            cache_hit = response is not None
+            if not cache_hit:
+                response = create()
+                cache.put(key, model, response)
+            elif on_delta is not None and response.choices and response.choices[0].message.content:
+                on_delta(response.choices[0].message.content)
+    except Exception as error:
+        instrumentation.record("chat", model, time.perf_counter() - start, error=error,
+                               time_to_first_token=getattr(assembler, "time_to_first_token", None))
+        raise
+    instrumentation.record("chat", model, time.perf_counter() - start, response, cache_hit=cache_hit,
+                           time_to_first_token=getattr(assembler, "time_to_first_token", None))
+    return response
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class RouteIndex:
+    """
+    Holds the embeddings of route descriptions as a normalized matrix, so a prompt is scored
+    against every route with a single matrix product.
+
+    Routes are dictionaries with at least "name" and "description" keys, as used by RoutingAgent.
+    Each description is embedded once, when its route is added.
+    """
+
+    def __init__(self, embed):
+        """
+        Initializes an empty index.
+
+        Parameters:
+        embed (callable): Returns the embedding vector of a text.
+        """
+        self.embed = embed
+        self.routes = []
+        self.matrix = None
+
+    def __len__(self):
+        return len(self.routes)
+
+    def set_routes(self, routes):
+        """
+        Replaces all routes. Routes whose description is already indexed keep their embedding;
+        only new or changed descriptions are embedded.
+
+        Parameters:
+        routes (list): Route dictionaries.
+        """
+        known = {}
+        for i, route in enumerate(self.routes):
+            known[route["description"]] = self.matrix[i]
+
+        rows = []
+        for route in routes:
+            row = known.get(route["description"])
+            rows.append(row if row is not None else self._embed_row(route["description"]))
+
+        self.routes = list(routes)
+        self.matrix = np.vstack(rows) if rows else None
+
+    def add(self, route):
+        """
+        Adds a route, replacing any existing route with the same name. Other routes are not
+        re-embedded.
+
+        Parameters:
+        route (dict): Route dictionary.
+        """
+        row = self._embed_row(route["description"])
+        index = self._find(route["name"])
+        if index is None:
+            self.routes.append(route)
+            self.matrix = row[np.newaxis, :] if self.matrix is None else np.vstack([self.matrix, row])
+        else:
+            self.routes[index] = route
+            self.matrix[index] = row
+
+    def remove(self, name):
+        """
+        Removes the route with a given name.
+
+        Parameters:
+        name (str): Name of the route.
+
+        Returns:
+        dict: The removed route.
+        """
+        index = self._find(name)
+        if index is None:
+            raise KeyError(f"No route named '{name}'")
+        route = self.routes.pop(index)
+        self.matrix = np.delete(self.matrix, index, axis=0) if self.routes else None
+        return route
+
+    def scores(self, prompt_embedding):
+        """
+        Computes the cosine similarity between a prompt and every route.
+
+        Parameters:
+        prompt_embedding (list): Embedding vector of the prompt.
+
+        Returns:
+        numpy.ndarray: One similarity score per route, in route order.
+        """
+        if self.matrix is None:
+            return np.zeros(0)
+        query = np.asarray(prompt_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return self.matrix @ (query / norm if norm else query)
+
+    def rank(self, prompt_embedding):
+        """
+        Ranks all routes by similarity to a prompt.
+
+        Parameters:
+        prompt_embedding (list): Embedding vector of the prompt.
+
+        Returns:
+        list: (route, score) pairs, best match first.
+        """
+        scores = self.scores(prompt_embedding)
+        return [(self.routes[i], float(scores[i])) for i in np.argsort(-scores)]
+
+    def _find(self, name):
+        """Returns the position of the route with a given name, or None."""
+        for i, route in enumerate(self.routes):
+            if route["name"] == name:
+                return i
+        return None
+
+    def _embed_row(self, text):
+        """Embeds a description and scales it to unit length."""
+        row = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(row)
+        return row / norm if norm else row
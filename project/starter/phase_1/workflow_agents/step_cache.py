@@ -0,0 +1,161 @@
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from .embedding_cache import DEFAULT_CACHE_DIR
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def step_fingerprint(func):
+    """
+    Identifies the prompt template of a chain step by the source code of its function, so that
+    editing the prompt (or anything else in the function) invalidates the step's saved outputs.
+
+    Parameters:
+    func (callable): The step function.
+
+    Returns:
+    str: The function's source, or its qualified name when the source is not available.
+    """
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(type(func)))}"
+
+
+class StepCache:
+    """
+    Persists the outputs of prompt chain steps in a SQLite file, keyed by the step, a hash of its
+    prompt template and its input values. A chain re-run with the same cache reuses every step
+    whose template and inputs are unchanged and recomputes only the others: after a late step
+    fails, or after editing one downstream prompt, only the affected steps call the model again.
+    """
+
+    def __init__(self, path):
+        """
+        Opens (or creates) the cache file.
+
+        Parameters:
+        path (str): SQLite file holding the step outputs.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS steps (key TEXT PRIMARY KEY, step TEXT, created REAL, output TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS steps_step ON steps (step)")
+        self._db.commit()
+
+    @staticmethod
+    def key(step, template, inputs):
+        """
+        Computes the key of a step run.
+
+        Parameters:
+        step (str): Step name.
+        template (str): The step's prompt template, e.g. from step_fingerprint.
+        inputs (list): The step's input values.
+
+        Returns:
+        str: Hex SHA-256 digest of the canonical JSON form of the step run.
+        """
+        run = json.dumps({"step": step, "template": template, "inputs": inputs},
+                         sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(run.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Looks up a step output.
+
+        Parameters:
+        key (str): Key from key().
+
+        Returns:
+        tuple: (True, output) if the output is saved, otherwise (False, None).
+        """
+        with self._lock:
+            row = self._db.execute("SELECT output FROM steps WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, json.loads(row[0])
+
+    def put(self, key, step, output):
+        """
+        Saves a step output. Outputs that are not JSON-serializable are not saved.
+
+        Parameters:
+        key (str): Key from key().
+        step (str): Step name, recorded so a step's outputs can be cleared.
+        output (object): The step's output.
+        """
+        try:
+            serialized = json.dumps(output, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?)",
+                             (key, step, time.time(), serialized))
+            self._db.commit()
+
+    def clear(self, step=None):
+        """
+        Forgets saved outputs, so they are computed again on the next run.
+
+        Parameters:
+        step (str): Step whose outputs are forgotten. None forgets every step.
+        """
+        with self._lock:
+            if step is None:
+                self._db.execute("DELETE FROM steps")
+            else:
+                self._db.execute("DELETE FROM steps WHERE step = ?", (step,))
+            self._db.commit()
+
+    def stats(self):
+        """
+        Reports how many step runs were reused since the cache was opened.
+
+        Returns:
+        dict: Hits, misses and the hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        """Closes the cache file."""
+        with self._lock:
+            self._db.close()
+
+
+def get_default_step_cache():
+    """
+    Returns the process-wide step cache, or None if step caching is not enabled.
+
+    The cache is opt-in: set the WORKFLOW_AGENTS_STEP_CACHE environment variable to 1 to enable
+    it. Its file lives next to the embedding cache in DEFAULT_CACHE_DIR.
+
+    Returns:
+    StepCache: The shared cache, or None.
+    """
+    global _default_cache
+    if os.getenv("WORKFLOW_AGENTS_STEP_CACHE", "").lower() not in ("1", "true", "yes"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = StepCache(os.path.join(DEFAULT_CACHE_DIR, "chain_steps.sqlite"))
+        return _default_cache
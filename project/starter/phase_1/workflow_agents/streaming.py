@@ -0,0 +1,208 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from openai.types.chat import ChatCompletion
+from .async_utils import call_function
+
+# Callable receiving the text deltas of the chat completions made in the current context
+_delta_sink = contextvars.ContextVar("workflow_agents_delta_sink", default=None)
+
+# Marks the end of a response in the queues of iter_response and aiter_response
+_END = object()
+
+
+@contextmanager
+def stream_deltas(on_delta):
+    """
+    Context manager that streams every chat completion made inside it: the response is requested
+    with stream=True and each piece of text is passed to on_delta as soon as it arrives. Callers
+    still receive the complete ChatCompletion, so agent code does not change, and a response
+    answered from the response cache is passed to on_delta in one piece.
+
+    on_delta is called from the thread making the request (for agents, the client provider's
+    event loop thread), so it should be quick and thread-safe.
+
+    Parameters:
+    on_delta (callable): Receives each text delta. None turns streaming off inside the block.
+    """
+    token = _delta_sink.set(on_delta)
+    try:
+        yield
+    finally:
+        _delta_sink.reset(token)
+
+
+def current_delta_sink():
+    """
+    Returns the delta callback in effect.
+
+    Returns:
+    callable: The callback set by stream_deltas, or None when responses are not streamed.
+    """
+    return _delta_sink.get()
+
+
+def iter_response(call, *args):
+    """
+    Calls a function that makes chat completions, e.g. an agent's respond method, and yields the
+    text of its responses as it is generated. This is how the agents' respond_stream methods work.
+
+    If the call made no streamed request (for example the agent does not use the client provider),
+    its result is yielded in one piece once it returns.
+
+    Parameters:
+    call (callable): The function to call. It runs in a background thread.
+    *args: Positional arguments for the function.
+
+    Returns:
+    generator: Text deltas. The generator's return value is the call's result.
+    """
+    deltas = queue.Queue()
+    outcome = {}
+
+    def produce():
+        try:
+            with stream_deltas(deltas.put):
+                outcome["result"] = call(*args)
+        except BaseException as error:
+            outcome["error"] = error
+        finally:
+            deltas.put(_END)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(produce,),
+                     name="response-stream", daemon=True).start()
+    streamed = False
+    while True:
+        delta = deltas.get()
+        if delta is _END:
+            break
+        streamed = True
+        yield delta
+    if "error" in outcome:
+        raise outcome["error"]
+    if not streamed and isinstance(outcome["result"], str):
+        yield outcome["result"]
+    return outcome["result"]
+
+
+async def aiter_response(call, *args):
+    """
+    Async variant of iter_response, for use with async for.
+
+    Parameters:
+    call (callable): Sync or async function to call, e.g. an agent's arespond method.
+    *args: Positional arguments for the function.
+
+    Returns:
+    async generator: Text deltas.
+    """
+    loop = asyncio.get_running_loop()
+    deltas = asyncio.Queue()
+
+    def on_delta(delta):
+        # Deltas arrive on the provider's event loop thread
+        loop.call_soon_threadsafe(deltas.put_nowait, delta)
+
+    async def produce():
+        try:
+            with stream_deltas(on_delta):
+                return await call_function(call, *args)
+        finally:
+            loop.call_soon_threadsafe(deltas.put_nowait, _END)
+
+    task = asyncio.ensure_future(produce())
+    streamed = False
+    try:
+        while True:
+            delta = await deltas.get()
+            if delta is _END:
+                break
+            streamed = True
+            yield delta
+        result = await task
+    finally:
+        task.cancel()
+    if not streamed and isinstance(result, str):
+        yield result
+
+
+class StreamAssembler:
+    """
+    Collects the chunks of a streamed chat completion into the ChatCompletion a non-streamed
+    request would have returned, and times the first token.
+    """
+
+    def __init__(self, on_delta):
+        """
+        Initializes the assembler. Time to first token is measured from its creation.
+
+        Parameters:
+        on_delta (callable): Receives the text delta of each chunk.
+        """
+        self.on_delta = on_delta
+        self.start = time.perf_counter()
+        self.time_to_first_token = None
+        self._first = None
+        self._parts = {}
+        self._finish_reasons = {}
+        self._usage = None
+
+    def add(self, chunk):
+        """
+        Adds one chunk and passes its text to on_delta.
+
+        Parameters:
+        chunk (ChatCompletionChunk): A chunk of the stream.
+        """
+        if self._first is None:
+            self._first = chunk
+        if chunk.usage is not None:
+            self._usage = chunk.usage
+        for choice in chunk.choices:
+            if choice.finish_reason is not None:
+                self._finish_reasons[choice.index] = choice.finish_reason
+            text = choice.delta.content if choice.delta is not None else None
+            if text:
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - self.start
+                self._parts.setdefault(choice.index, []).append(text)
+                if choice.index == 0:
+                    self.on_delta(text)
+
+    def completion(self):
+        """
+        Builds the complete response.
+
+        Returns:
+        ChatCompletion: The assembled response, with the usage reported by the stream if any.
+        """
+        first = self._first
+        indexes = sorted(set(self._parts) | set(self._finish_reasons)) or [0]
+        return ChatCompletion.model_validate({
+            "id": first.id if first is not None else "",
+            "object": "chat.completion",
+            "created": first.created if first is not None else int(time.time()),
+            "model": first.model if first is not None else "",
+            "choices": [{"index": index,
+                         "finish_reason": self._finish_reasons.get(index, "stop"),
+                         "message": {"role": "assistant", "content": "".join(self._parts.get(index, []))}}
+                        for index in indexes],
+            "usage": self._usage.model_dump() if self._usage is not None else None
+        })
+
+
+def stream_params(params):
+    """
+    Returns request parameters asking for a stream that ends with the token usage.
+
+    Parameters:
+    params (dict): The caller's request parameters.
+
+    Returns:
+    dict: The parameters with stream and stream_options set.
+    """
+    return {**params, "stream": True,
+            "stream_options": params.get("stream_options") or {"include_usage": True}}
@@ -0,0 +1,328 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from .ann_index import IVFIndex
+
+# Marks a store whose ANN index was looked for and found missing or stale
+_NO_ANN_INDEX = object()
+
+
+class VectorStore:
+    """
+    A persistent store of embedding vectors and the text chunks they were computed from.
+
+    A store is a directory holding three files:
+    - vectors.f32: a contiguous row-major float32 matrix with one unit-length row per chunk
+    - chunks.jsonl: one JSON record per row with the chunk text and its character offsets
+    - meta.json: the number of rows, the embedding dimension and the embedding model
+
+    The vector matrix is memory-mapped on load, so opening a store does not copy or parse it.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    CHUNKS_FILE = "chunks.jsonl"
+    META_FILE = "meta.json"
+
+    def __init__(self, path):
+        """
+        Opens an existing store. Files are read lazily on first access.
+
+        Parameters:
+        path (str): Directory of the store.
+        """
+        self.path = path
+        self._meta = None
+        self._vectors = None
+        self._normalized = None
+        self._chunks = None
+        self._ann_index = None
+
+    @property
+    def meta(self):
+        """dict: Store metadata (count, dimension, model)."""
+        if self._meta is None:
+            with open(os.path.join(self.path, self.META_FILE), encoding='utf-8') as f:
+                self._meta = json.load(f)
+        return self._meta
+
+    @property
+    def vectors(self):
+        """numpy.ndarray: Read-only (count, dimension) float32 matrix mapped from disk."""
+        if self._vectors is None:
+            count, dimension = self.meta["count"], self.meta["dimension"]
+            if count == 0:
+                self._vectors = np.zeros((0, dimension), dtype=np.float32)
+            else:
+                self._vectors = np.memmap(os.path.join(self.path, self.VECTORS_FILE),
+                                          dtype=np.float32, mode='r', shape=(count, dimension))
+        return self._vectors
+
+    @property
+    def normalized_vectors(self):
+        """
+        numpy.ndarray: The vector matrix with unit-length rows.
+
+        Stores written by VectorStoreWriter are normalized on disk, so this is the mapped matrix
+        itself. Older stores are normalized in memory once and the result is kept.
+        """
+        if self._normalized is None:
+            if self.meta.get("normalized"):
+                self._normalized = self.vectors
+            else:
+                self._normalized = _normalize_rows(np.asarray(self.vectors, dtype=np.float32))
+        return self._normalized
+
+    @property
+    def ann_index(self):
+        """IVFIndex: The approximate nearest-neighbour index saved with the store, or None."""
+        if self._ann_index is None:
+            # A missing or stale index is remembered too, so searches do not look for it again
+            self._ann_index = _NO_ANN_INDEX
+            index_path = os.path.join(self.path, IVFIndex.FILE_NAME)
+            if os.path.exists(index_path):
+                index = IVFIndex.load(index_path)
+                if index.count == len(self):
+                    self._ann_index = index
+        return None if self._ann_index is _NO_ANN_INDEX else self._ann_index
+
+    def build_ann_index(self, n_lists=None, n_probe=8, n_iter=10):
+        """
+        Builds an IVF approximate nearest-neighbour index over the store and saves it next to
+        the vectors. Once built, search uses it unless an exact search is requested.
+
+        Parameters:
+        n_lists (int): Number of clusters. Defaults to the square root of the number of rows.
+        n_probe (int): Clusters scanned per query; higher means better recall and slower queries.
+        n_iter (int): Number of k-means iterations.
+
+        Returns:
+        IVFIndex: The built index.
+        """
+        index = IVFIndex(n_lists=n_lists, n_probe=n_probe, n_iter=n_iter).build(self.normalized_vectors)
+        index.save(os.path.join(self.path, IVFIndex.FILE_NAME))
+        self._ann_index = index
+        return index
+
+    def search(self, query_vectors, top_k=1, exact=False, n_probe=None):
+        """
+        Finds the rows most similar to one or more query vectors by cosine similarity.
+
+        Without an ANN index (or with exact=True), all queries are scored in a single matrix
+        product against the pre-normalized matrix, and only the top_k rows per query are sorted.
+        With an ANN index, only the rows in the closest clusters are scored.
+
+        Parameters:
+        query_vectors (list): A single embedding vector or a list of embedding vectors.
+        top_k (int): Number of rows to return per query.
+        exact (bool): Ignore the ANN index and scan every row. Defaults to False.
+        n_probe (int): Clusters scanned per query by the ANN index. Defaults to the index setting.
+
+        Returns:
+        tuple: (indices, scores) arrays of shape (queries, top_k), best match first. When a
+        single vector is given, both arrays are one-dimensional. An empty store returns arrays
+        with no matches.
+        """
+        if top_k < 1:
+            raise ValueError(f"top_k must be at least 1, got {top_k}.")
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = _normalize_rows(np.atleast_2d(queries))
+
+        matrix = self.normalized_vectors
+        if len(matrix) == 0:
+            # An empty store (written with no chunks, so of dimension 0) matches nothing
+            indices = np.empty((len(queries), 0), dtype=np.int64)
+            top_scores = np.empty((len(queries), 0), dtype=np.float32)
+            return (indices[0], top_scores[0]) if single else (indices, top_scores)
+        top_k = min(top_k, len(matrix))
+        if not exact and self.ann_index is not None:
+            indices, top_scores = self.ann_index.search(matrix, queries, top_k, n_probe)
+            return (indices[0], top_scores[0]) if single else (indices, top_scores)
+
+        scores = queries @ matrix.T
+        if top_k < scores.shape[1]:
+            candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        indices = np.take_along_axis(candidates, order, axis=1)
+        top_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        if single:
+            return indices[0], top_scores[0]
+        return indices, top_scores
+
+    @property
+    def chunks(self):
+        """list: Chunk records (chunk_id, text, start_char, end_char), one per vector row."""
+        if self._chunks is None:
+            with open(os.path.join(self.path, self.CHUNKS_FILE), encoding='utf-8') as f:
+                self._chunks = [json.loads(line) for line in f if line.strip()]
+        return self._chunks
+
+    def __len__(self):
+        return self.meta["count"]
+
+    @classmethod
+    def exists(cls, path):
+        """
+        Checks whether a complete store exists at a path.
+
+        Parameters:
+        path (str): Directory of the store.
+
+        Returns:
+        bool: True if the store metadata has been written.
+        """
+        return os.path.exists(os.path.join(path, cls.META_FILE))
+
+    @classmethod
+    def writer(cls, path, model=None):
+        """
+        Opens a writer that builds a new store at a path, replacing any existing one.
+
+        Parameters:
+        path (str): Directory of the store.
+        model (str): Name of the embedding model, recorded in the metadata.
+
+        Returns:
+        VectorStoreWriter: Context manager used to append vectors and chunks.
+        """
+        return VectorStoreWriter(path, model)
+
+    @classmethod
+    def write(cls, path, embeddings, chunks, model=None):
+        """
+        Writes a complete store in one call.
+
+        Parameters:
+        path (str): Directory of the store.
+        embeddings (list): Embedding vectors, one per chunk.
+        chunks (list): Chunk dictionaries with at least a "text" key.
+        model (str): Name of the embedding model.
+
+        Returns:
+        VectorStore: The newly written store.
+        """
+        with cls.writer(path, model) as writer:
+            writer.add(embeddings, chunks)
+        return cls(path)
+
+    @classmethod
+    def from_csv(cls, csv_path, path, model=None, batch_size=1024):
+        """
+        Imports an embeddings CSV written by earlier versions of RAGKnowledgePromptAgent.
+
+        The CSV holds a "text" column and an "embeddings" column of stringified lists. It is
+        read in batches so large files never have to fit in memory.
+
+        Parameters:
+        csv_path (str): Path of the embeddings CSV file.
+        path (str): Directory of the store to create.
+        model (str): Name of the embedding model.
+        batch_size (int): Number of rows converted per batch.
+
+        Returns:
+        VectorStore: The imported store.
+        """
+        with cls.writer(path, model) as writer:
+            for df in pd.read_csv(csv_path, encoding='utf-8', chunksize=batch_size):
+                embeddings = [json.loads(value) for value in df['embeddings']]
+                chunks = []
+                for row in df.to_dict('records'):
+                    chunks.append({
+                        "text": row['text'],
+                        "start_char": _optional_int(row.get('start_char')),
+                        "end_char": _optional_int(row.get('end_char')),
+                    })
+                writer.add(embeddings, chunks)
+        return cls(path)
+
+
+class VectorStoreWriter:
+    """
+    Appends vectors and chunks to a new store. The metadata file is written last, on close,
+    so a store interrupted mid-write is never mistaken for a complete one.
+    """
+
+    # Chunk keys kept in the sidecar when present, in addition to the text and offsets
+    OPTIONAL_FIELDS = ("doc_id", "fingerprint")
+
+    def __init__(self, path, model=None):
+        self.path = path
+        self.model = model
+        self.count = 0
+        self.dimension = None
+        os.makedirs(path, exist_ok=True)
+        for stale in (VectorStore.META_FILE, IVFIndex.FILE_NAME):
+            if os.path.exists(os.path.join(path, stale)):
+                os.remove(os.path.join(path, stale))
+        self._vectors_file = open(os.path.join(path, VectorStore.VECTORS_FILE), 'wb')
+        self._chunks_file = open(os.path.join(path, VectorStore.CHUNKS_FILE), 'w', encoding='utf-8')
+
+    def add(self, embeddings, chunks):
+        """
+        Appends a batch of vectors and their chunks.
+
+        Parameters:
+        embeddings (list): Embedding vectors, one per chunk.
+        chunks (list): Chunk dictionaries with at least a "text" key.
+        """
+        if len(embeddings) != len(chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(chunks)} chunks.")
+        if not chunks:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = matrix.shape[1]
+        elif matrix.shape[1] != self.dimension:
+            raise ValueError(f"Expected embeddings of dimension {self.dimension}, got {matrix.shape[1]}.")
+
+        self._vectors_file.write(np.ascontiguousarray(_normalize_rows(matrix)).tobytes())
+        for chunk in chunks:
+            record = {
+                "chunk_id": self.count,
+                "text": chunk["text"],
+                "start_char": chunk.get("start_char"),
+                "end_char": chunk.get("end_char"),
+            }
+            for field in self.OPTIONAL_FIELDS:
+                if chunk.get(field) is not None:
+                    record[field] = chunk[field]
+            self._chunks_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.count += 1
+
+    def close(self):
+        """Flushes the data files and writes the metadata that marks the store complete."""
+        self._vectors_file.close()
+        self._chunks_file.close()
+        meta = {"count": self.count, "dimension": self.dimension or 0, "model": self.model, "normalized": True}
+        with open(os.path.join(self.path, VectorStore.META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._vectors_file.close()
+            self._chunks_file.close()
+        return False
+
+
+def _normalize_rows(matrix):
+    """Scales each row of a matrix to unit length, leaving all-zero rows unchanged."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _optional_int(value):
+    """Converts a CSV cell to int, mapping missing values to None."""
+    if value is None or pd.isna(value):
+        return None
+    return int(value)
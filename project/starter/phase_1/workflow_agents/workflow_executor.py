@@ -0,0 +1,154 @@
+import asyncio
+import time
+from .async_utils import call_function, run_sync
+from .instrumentation import tags
+
+
+def build_step_graph(steps, role_of=None, role_dependencies=None):
+    """
+    Turns the steps extracted by an ActionPlanningAgent into a dependency graph.
+
+    Without role information, every step depends on the step before it, which reproduces the
+    one-after-another workflow. With role_of and role_dependencies, a step depends only on the
+    earlier steps whose role it needs. For example {"Program Manager": ["Product Manager"]} makes
+    feature steps wait for the user story steps, while steps whose roles do not depend on each
+    other run concurrently.
+
+    Parameters:
+    steps (list): Step prompts, in plan order.
+    role_of (callable): Returns the role (e.g. the routing agent's route name) of a step prompt.
+    role_dependencies (dict): Roles each role depends on, keyed by role.
+
+    Returns:
+    list: Step dictionaries with id, prompt, role and depends_on (list of step ids).
+    """
+    graph = []
+    for i, prompt in enumerate(steps):
+        role = role_of(prompt) if role_of is not None else None
+        if role_dependencies is None:
+            depends_on = [i - 1] if i > 0 else []
+        else:
+            needed = role_dependencies.get(role, ())
+            depends_on = [step["id"] for step in graph if step["role"] in needed]
+        graph.append({"id": i, "prompt": prompt, "role": role, "depends_on": depends_on})
+    return graph
+
+
+def compose_prompt(step, upstream):
+    """
+    Default prompt for a step: the step itself followed by the results of the steps it depends on.
+
+    Parameters:
+    step (dict): The step to run.
+    upstream (list): Completed steps this step depends on, with their result.
+
+    Returns:
+    str: The prompt sent to the step's agent.
+    """
+    if not upstream:
+        return step["prompt"]
+    context = "\n\n".join(f"Result of the step '{u['prompt']}':\n{u['result']}" for u in upstream)
+    return f"{step['prompt']}\n\nUse the results of these earlier workflow steps:\n\n{context}"
+
+
+class WorkflowExecutor:
+    """
+    Runs a step graph with a bounded number of steps in flight. Each step starts as soon as the
+    steps it depends on have finished, and receives only their results, so the wall time of the
+    workflow is the latency of its critical path rather than the sum of all steps.
+    """
+
+    def __init__(self, run_step, max_workers=4, prompt_builder=compose_prompt):
+        """
+        Initializes the executor.
+
+        Parameters:
+        run_step (callable): Sync or async function that takes a prompt and returns the step's
+            result, e.g. a RoutingAgent's route or aroute method.
+        max_workers (int): Maximum number of steps running at once. Defaults to 4.
+        prompt_builder (callable): Builds a step's prompt from the step and its upstream
+            results. Defaults to compose_prompt.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        self.run_step = run_step
+        self.max_workers = max_workers
+        self.prompt_builder = prompt_builder
+
+    def run(self, steps):
+        """
+        Runs the workflow and waits for every step.
+
+        Parameters:
+        steps (list): Step dictionaries from build_step_graph.
+
+        Returns:
+        list: The steps in plan order, each with its result and start and end times in seconds
+        from the start of the workflow.
+        """
+        return run_sync(self.arun(steps))
+
+    async def arun(self, steps):
+        """
+        Async variant of run.
+
+        Parameters:
+        steps (list): Step dictionaries from build_step_graph.
+
+        Returns:
+        list: The completed steps, see run.
+        """
+        order = _topological_order(steps)
+        semaphore = asyncio.Semaphore(self.max_workers)
+        by_id = {step["id"]: dict(step) for step in steps}
+        tasks = {}
+        workflow_start = time.perf_counter()
+
+        async def execute(step):
+            upstream = [await tasks[dep] for dep in step["depends_on"]]
+            async with semaphore:
+                step["started"] = time.perf_counter() - workflow_start
+                # Calls made for this step are tagged with it in the instrumentation records
+                with tags(step=step["prompt"], step_id=step["id"]):
+                    step["result"] = await call_function(self.run_step, self.prompt_builder(step, upstream))
+                step["finished"] = time.perf_counter() - workflow_start
+            return step
+
+        for step_id in order:
+            tasks[step_id] = asyncio.ensure_future(execute(by_id[step_id]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return [by_id[step["id"]] for step in steps]
+
+
+def _topological_order(steps):
+    """Orders step ids so that every step comes after its dependencies, rejecting cycles."""
+    ids = [step["id"] for step in steps]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Step ids must be unique.")
+    dependencies = {step["id"]: list(step["depends_on"]) for step in steps}
+    for step_id, depends_on in dependencies.items():
+        for dep in depends_on:
+            if dep not in dependencies:
+                raise ValueError(f"Step {step_id} depends on unknown step {dep}.")
+
+    order, state = [], {}
+
+    def visit(step_id, path):
+        if state.get(step_id) == "done":
+            return
+        if state.get(step_id) == "visiting":
+            raise ValueError(f"Steps {path} form a dependency cycle.")
+        state[step_id] = "visiting"
+        for dep in dependencies[step_id]:
+            visit(dep, path + [dep])
+        state[step_id] = "done"
+        order.append(step_id)
+
+    for step_id in ids:
+        visit(step_id, [step_id])
+    return order
@@ -99,9 +99,12 @@ print(f"Task to complete in this workflow, workflow prompt = {workflow_prompt}")
 print("\nDefining workflow steps from the workflow prompt")
 # TODO: 12 - Implement the workflow.
 #   1. Use the 'action_planning_agent' to extract steps from the 'workflow_prompt'.
-#   2. Initialize an empty list to store 'completed_steps'.
-#   3. Loop through the extracted workflow steps:
-#      a. For each step, use the 'routing_agent' to route the step to the appropriate support function.
-#      b. Append the result to 'completed_steps'.
-#      c. Print information about the step being executed and its result.
-#   4. After the loop, print the final output of the workflow (the last completed step).
\ No newline at end of file
+#   2. Turn the steps into a dependency graph with build_step_graph (from workflow_agents.workflow_executor):
+#      - role_of: a function returning the name of the route a step belongs to, e.g.
+#        lambda step: routing_agent.route_scores(step)[0][0]
+#      - role_dependencies: the roles whose results each role needs, e.g.
+#        {"Program Manager": ["Product Manager"], "Development Engineer": ["Product Manager"]}
+#   3. Run the graph with WorkflowExecutor(routing_agent.route, max_workers=4).run(step_graph).
+#      Independent steps run concurrently, and each step receives only the results of the steps it depends on.
+#   4. Collect the results into a list called 'completed_steps' and print information about each step and its result.
+#   5. Print the final output of the workflow (the last completed step).